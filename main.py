@@ -1,11 +1,6 @@
-import sys, re
+import sys
 from src.pipeline import run_pipeline
-
-# helper function to slugify text (to transform title to output filename)
-def _slugify(text, max_length=50):
-    s = (text or "").strip().lower() # strip and lowercase
-    s = re.sub(r"[^a-z0-9]+", "-", s).strip("-") # non-alphanumerics to hyphens, trim stray hyphens
-    return s[:max_length] or "merged_article" # cap length, fallback if empty
+from src.render import slugify
 
 # helper function to prompt user for input (input either url or title)????????????????????????
 def prompt_user():
@@ -17,14 +12,18 @@ def prompt_user():
         "url1": url1,
         "url2": url2,
         "title_out": title_out,
-        "outfile": _slugify(title_out) + ".html" # derive filename from title (e.g. "Giant Tortoise" -> giant-tortoise.html)
+        "outfile": slugify(title_out) + ".html" # derive filename from title (e.g. "Giant Tortoise" -> giant-tortoise.html)
     }
 
 def main():
     try:
         config  = prompt_user()
-        out = run_pipeline(config)
-        print("Pipeline completed successfully!", out)
+        # checkpoint every run; after a crash, `python main.py --resume` with the same inputs picks up where it stopped
+        config["checkpoint"] = True
+        config["resume"] = "--resume" in sys.argv[1:]
+        config["site"] = "--site" in sys.argv[1:] # also record the merge for the static site (python -m src.site)
+        stats = run_pipeline(config)
+        print("Pipeline completed successfully! (" + str(round(stats["spans"]["total"]["seconds"], 1)) + "s)")
         print("You can open the output file from the 'output' folder.")
     except Exception as e:
         print("\nError:", e)
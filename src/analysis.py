@@ -1,32 +1,157 @@
 # imports
+import os, time, atexit, threading, contextvars, multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import torch
 from src import similarity
 from src import nli
+from src import metrics
+from src import profiling
 from src.merge import pair_sections
+from src.translate import split_sentences
 
 AGREE_THRESHOLD = 0.5 # cosine threshold above which two paragraphs are treated as the same point ("candidate" pair, before NLI relabels it)
 
+# analysis modes: "paragraph" = one NLI verdict per matched paragraph pair (default);
+# "sentence" = verdict from the best-matching sentence pairs inside each matched paragraph pair
+# (long paragraphs get past the cross-encoder's truncation, and a single conflicting fact is not
+# drowned out by the rest of the paragraph)
+ANALYSIS_MODES = ("paragraph", "sentence")
+SENTENCE_TOP_K = 2 # per sentence, how many of the other paragraph's sentences are checked with NLI
+SENTENCE_MATCH_THRESHOLD = 0.5 # sentence pairs below this cosine are never sent to NLI
+
+# analysis tiers, cheapest first: "fast" = embeddings only (every candidate pair counts as shared,
+# no NLI); "balanced" = NLI on each section's BALANCED_NLI_PAIRS best-scoring candidates only (the
+# rest count as shared); "full" = bidirectional NLI on every candidate pair
+TIERS = ("fast", "balanced", "full")
+BALANCED_NLI_PAIRS = 3
+
+# deadline mode: once this share of the time budget is spent, sections drop one tier; past the
+# deadline, the remaining sections run at "fast"
+DEGRADE_AT = 0.5
+
+# section pools for analyze_articles(workers > 1): "thread" shares the loaded models (torch
+# releases the GIL during inference); "process" sidesteps the GIL for the Python-side work too,
+# at the cost of one model copy per worker process. The process pool is created on first use and
+# kept for the life of the process, so its workers load torch and the models once, not per run
+EXECUTORS = ("thread", "process")
+
+_process_pools = {} # worker count -> ProcessPoolExecutor
+_process_pools_lock = threading.Lock()
+
+def _sentence_verdicts(candidates):
+    """
+    Sentence-level NLI for matched paragraph pairs: every sentence of every pair is embedded in
+    one batch, a masked top-k over one similarity matrix picks the sentence pairs worth checking
+    (only within the same paragraph pair), and all of them go to NLI in one batched call.
+    Input:
+        candidates (list[tuple[str, str]]): translated texts of the matched paragraph pairs
+    Output:
+        list[tuple[str, list[dict]]]: per candidate, its verdict ("contradiction", "entailment",
+            "neutral") and the evidence behind it: the non-neutral sentence pairs, each
+            {"a1", "a2", "score", "label"}, contradictions first
+    """
+    if not candidates:
+        return []
+
+    # segment; owner[k] = which candidate sentence k belongs to
+    sents1 = [split_sentences(t) or [t] for t, _ in candidates]
+    sents2 = [split_sentences(t) or [t] for _, t in candidates]
+    flat1 = [s for sentences in sents1 for s in sentences]
+    flat2 = [s for sentences in sents2 for s in sentences]
+    owner1 = torch.tensor([c for c, sentences in enumerate(sents1) for _ in sentences])
+    owner2 = torch.tensor([c for c, sentences in enumerate(sents2) for _ in sentences])
+
+    # one embedding batch for both sides, one similarity matrix; pairs across candidates are masked out
+    vectors = similarity.embed(flat1 + flat2)
+    sim = similarity.cos_sim(vectors[:len(flat1)], vectors[len(flat1):])
+    sim = sim.masked_fill(owner1[:, None] != owner2[None, :], -1.0)
+
+    # top-k in both directions (each a1 sentence's best a2 sentences and vice versa), above the threshold
+    selected = torch.zeros_like(sim, dtype=torch.bool)
+    k = min(SENTENCE_TOP_K, sim.shape[1])
+    selected.scatter_(1, sim.topk(k, dim=1).indices, True)
+    k = min(SENTENCE_TOP_K, sim.shape[0])
+    selected.scatter_(0, sim.topk(k, dim=0).indices, True)
+    selected &= sim >= SENTENCE_MATCH_THRESHOLD
+    rows, cols = selected.nonzero(as_tuple=True)
+    sentence_pairs = list(zip(rows.tolist(), cols.tolist()))
+
+    # a candidate with no close sentence pair is still judged, as a whole paragraph pair
+    covered = set(int(owner1[i]) for i, _ in sentence_pairs)
+    whole = [c for c in range(len(candidates)) if c not in covered]
+
+    # everything (both directions) in one NLI call
+    nli_pairs = []
+    for i, j in sentence_pairs:
+        nli_pairs += [(flat1[i], flat2[j]), (flat2[j], flat1[i])]
+    for c in whole:
+        nli_pairs += [candidates[c], candidates[c][::-1]]
+    labels = nli.classify_pairs(nli_pairs)
+
+    per_candidate = [[] for _ in candidates] # sentence-pair labels per candidate
+    evidence = [[] for _ in candidates]
+    for n, (i, j) in enumerate(sentence_pairs):
+        label = nli.fold_labels(labels[2 * n:2 * n + 2])
+        c = int(owner1[i])
+        per_candidate[c].append(label)
+        if label != "neutral":
+            evidence[c].append({"a1": flat1[i], "a2": flat2[j], "score": round(float(sim[i][j]), 3), "label": label})
+    offset = 2 * len(sentence_pairs)
+    for n, c in enumerate(whole):
+        per_candidate[c].append(nli.fold_labels(labels[offset + 2 * n:offset + 2 * n + 2]))
+
+    return [
+        (nli.fold_labels(per_candidate[c]),
+         sorted(evidence[c], key=lambda e: (e["label"] != "contradiction", -e["score"])))
+        for c in range(len(candidates))
+    ]
+
+# bidirectional NLI verdict of a paragraph pair, from the verdict store when it has one
+def _paragraph_verdict(text1, text2, verdicts=None):
+    label = verdicts.get(text1, text2) if verdicts is not None else None
+    if label is None:
+        label = nli.classify_bidirectional(text1, text2)
+        if verdicts is not None:
+            verdicts.put(text1, text2, label)
+    return label
+
 # analyse a single (aligned) section: which paragraphs agree, contradict, are merely
 # related (neutral), or are unique to each article
-def _analyse_section(list1, list2):
+def _analyse_section(list1, list2, mode="paragraph", vectors1=None, vectors2=None, verdicts=None, translate=None,
+                     tier="full"):
     """
     Input:
         list1, list2 (list[dict]): paragraph records from the two articles' matched section
+        mode (str): "paragraph" or "sentence" (see ANALYSIS_MODES)
+        vectors1, vectors2 (optional): the paragraphs' embeddings, if already computed
+                                       (see similarity.embed_articles); embedded here otherwise
+        verdicts (optional): index.VerdictStore; paragraph pairs judged in earlier merges reuse
+                             their stored verdict instead of running NLI (paragraph mode)
+        translate (callable, optional): records -> their English text, called with just the
+                                        candidate pairs' records (NLI needs English); defaults to
+                                        each record's "translated" text
+        tier (str): "fast", "balanced" or "full" (see TIERS)
     Output:
         dict: {"agree": [...], "contradict": [...], "neutral": [...],
-               "unique_a1": [...], "unique_a2": [...]}
+               "unique_a1": [...], "unique_a2": [...], "tier": tier}
                each pair record in agree/contradict/neutral is {"a1", "a2", "score"}
+               (plus "evidence", the deciding sentence pairs, in sentence mode)
     """
     # section present in only one article -> everything there is unique
     if not list1:
-        return {"agree": [], "contradict": [], "neutral": [], "unique_a1": [], "unique_a2": list(list2)}
+        return {"agree": [], "contradict": [], "neutral": [], "unique_a1": [], "unique_a2": list(list2), "tier": tier}
     if not list2:
-        return {"agree": [], "contradict": [], "neutral": [], "unique_a1": list(list1), "unique_a2": []}
+        return {"agree": [], "contradict": [], "neutral": [], "unique_a1": list(list1), "unique_a2": [], "tier": tier}
 
-    # cross-article cosine similarity matrix (embeds each side's translated text)
-    sim = similarity.similarity_matrix(
-        [r["translated"] for r in list1],
-        [r["translated"] for r in list2]
-    )
+    # cross-article cosine similarity matrix (embeds each side's translated text, unless already embedded)
+    if vectors1 is not None and vectors2 is not None:
+        sim = similarity.cos_sim(vectors1, vectors2)
+    else:
+        sim = similarity.similarity_matrix(
+            [r["translated"] for r in list1],
+            [r["translated"] for r in list2]
+        )
 
     # best counterpart in each direction
     best_j_for_i = sim.argmax(dim=1) # for each a1 paragraph, index of its best a2 paragraph
@@ -35,47 +160,202 @@ def _analyse_section(list1, list2):
     # mutual best matches above the threshold are "candidate" pairs -> NLI relabels each
     # one as agree (entailment), contradict, or neutral (related but not a shared claim);
     # everything else stays unique to its article
+    candidates = []
+    for i in range(len(list1)):
+        j = int(best_j_for_i[i])
+        if int(best_i_for_j[j]) == i and float(sim[i][j]) >= AGREE_THRESHOLD:
+            candidates.append((i, j))
+
+    # the tier decides which candidates NLI checks; unchecked ones count as shared (similarity alone)
+    if tier == "fast":
+        checked = []
+    elif tier == "balanced":
+        checked = sorted(candidates, key=lambda c: float(sim[c[0]][c[1]]), reverse=True)[:BALANCED_NLI_PAIRS]
+    else:
+        checked = candidates
+
+    # English text of the checked candidates only (translated on demand when analysing untranslated text)
+    if translate is not None and checked:
+        english1 = translate([list1[i] for i, _ in checked])
+        english2 = translate([list2[j] for _, j in checked])
+    else:
+        english1 = [list1[i]["translated"] for i, _ in checked]
+        english2 = [list2[j]["translated"] for _, j in checked]
+
+    if mode == "sentence":
+        results = _sentence_verdicts(list(zip(english1, english2)))
+    else:
+        results = [(_paragraph_verdict(text1, text2, verdicts), None) for text1, text2 in zip(english1, english2)]
+    labels = dict(zip(checked, results))
+
     agree = []
     contradict = []
     neutral = []
     matched_i = set()
     matched_j = set()
-    for i in range(len(list1)):
-        j = int(best_j_for_i[i])
-        if int(best_i_for_j[j]) == i and float(sim[i][j]) >= AGREE_THRESHOLD:
-            matched_i.add(i)
-            matched_j.add(j)
-            pair = {"a1": list1[i], "a2": list2[j], "score": round(float(sim[i][j]), 3)}
-            label = nli.classify_bidirectional(list1[i]["translated"], list2[j]["translated"])
-            if label == "contradiction":
-                contradict.append(pair)
-            elif label == "entailment":
-                agree.append(pair)
-            else:
-                neutral.append(pair)
+    for i, j in candidates:
+        label, evidence = labels.get((i, j), ("entailment", None))
+        matched_i.add(i)
+        matched_j.add(j)
+        pair = {"a1": list1[i], "a2": list2[j], "score": round(float(sim[i][j]), 3)}
+        if evidence is not None:
+            pair["evidence"] = evidence
+        if label == "contradiction":
+            contradict.append(pair)
+        elif label == "entailment":
+            agree.append(pair)
+        else:
+            neutral.append(pair)
 
     # paragraphs that didn't get a mutual match are unique to their article
     unique_a1 = [list1[i] for i in range(len(list1)) if i not in matched_i]
     unique_a2 = [list2[j] for j in range(len(list2)) if j not in matched_j]
     return {"agree": agree, "contradict": contradict, "neutral": neutral,
-            "unique_a1": unique_a1, "unique_a2": unique_a2}
+            "unique_a1": unique_a1, "unique_a2": unique_a2, "tier": tier}
+
+# function: tier_at(tier: str, deadline: float | None, budget: float | None) -> str
+# the tier a section starting now gets: the requested one, one lower once DEGRADE_AT of the budget
+# is spent, "fast" past the deadline (deadline is a time.time() timestamp, budget its length in seconds)
+def tier_at(tier, deadline, budget):
+    if deadline is None:
+        return tier
+    left = deadline - time.time()
+    if left <= 0:
+        return "fast"
+    if left < budget * (1 - DEGRADE_AT):
+        return TIERS[max(0, TIERS.index(tier) - 1)]
+    return tier
+
+# one section job: the tier is picked when the section starts, not when it was queued
+def _run_section(args, tier, deadline=None, budget=None, verdicts=None, translate=None):
+    return _analyse_section(*args, verdicts=verdicts, translate=translate, tier=tier_at(tier, deadline, budget))
+
+# process pool initialiser: each worker gets its share of the cores (see runtime.default_settings)
+def _init_worker(workers):
+    os.environ["WIKIMERGE_WORKERS"] = str(workers)
+
+# function: _process_pool(workers: int) -> ProcessPoolExecutor  (shared by every run asking for this many workers)
+def _process_pool(workers):
+    with _process_pools_lock:
+        pool = _process_pools.get(workers)
+        if pool is None:
+            # spawn, not fork: forking a process whose torch thread pools are already running can deadlock
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(workers,))
+            _process_pools[workers] = pool
+        return pool
+
+# stop the worker processes (at exit, or to drop a pool whose worker died)
+def _shutdown_process_pools(workers=None):
+    with _process_pools_lock:
+        pools = [_process_pools.pop(w) for w in list(_process_pools) if workers is None or w == workers]
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+atexit.register(_shutdown_process_pools)
 
 # main: per-section agree / unique-per-language analysis of two translated articles
-def analyze_articles(a1, a2):
+def analyze_articles(a1, a2, pairs=None, mode="paragraph", embeddings=None, verdicts=None, workers=1, executor="thread",
+                     translate=None, tier="full", budget=None, deadline=None, checkpoint=None):
     """
     Input:
         a1, a2 (dict): translated articles (section -> list of paragraph records),
                        as produced by translate_article (BEFORE merging, so dedup
                        hasn't removed the overlapping paragraphs we want to find)
+        pairs (list, optional): section pairing from pair_sections(a1, a2), if the caller
+                                already computed it (computed here otherwise)
+        mode (str): "paragraph" (default) or "sentence" (see ANALYSIS_MODES)
+        embeddings (tuple, optional): (vectors1, vectors2) from similarity.embed_articles([a1, a2]),
+                                      reused instead of embedding each section again
+        verdicts (optional): index.VerdictStore of earlier NLI verdicts (see _analyse_section)
+        workers (int): sections analysed in parallel (1 = one after another)
+        executor (str): "thread" or "process" pool for workers > 1 (see EXECUTORS); worker
+                        processes load their own models (once: the pool is kept for later
+                        runs), don't use verdicts, and their model calls are not counted in
+                        the run's metrics
+        translate (callable, optional): on-demand English text for NLI (see _analyse_section);
+                                        thread pool / serial only
+        tier (str): "fast", "balanced" or "full" (default; see TIERS)
+        budget (float, optional): seconds the analysis may take; sections then run by priority
+                                  (Lead, then largest first) and later ones degrade (see tier_at).
+                                  Each section records the tier it actually got under "tier"
+        deadline (float, optional): time.time() by which the run should be done, when its clock started
+                                    before this call (e.g. a pipeline run's fetch and translate count
+                                    against it); budget is then the deadline's full length. Without
+                                    it, the budget starts now
+        checkpoint (optional): checkpoint.RunCheckpoint; sections it already holds are not analysed
+                               again, and each new section is saved to it as soon as it finishes
     Output:
-        dict: section title -> {"agree": [...], "unique_a1": [...], "unique_a2": [...]}
+        dict: section title -> {"agree": [...], "unique_a1": [...], "unique_a2": [...], "tier": ...}
     """
-    analysis = {}
-    for title, a1_key, a2_key in pair_sections(a1, a2):
+    if mode not in ANALYSIS_MODES:
+        raise ValueError("Unknown analysis mode: " + str(mode) + " (expected one of " + ", ".join(ANALYSIS_MODES) + ")")
+    if executor not in EXECUTORS:
+        raise ValueError("Unknown executor: " + str(executor) + " (expected one of " + ", ".join(EXECUTORS) + ")")
+    if tier not in TIERS:
+        raise ValueError("Unknown analysis tier: " + str(tier) + " (expected one of " + ", ".join(TIERS) + ")")
+    if translate is not None and executor == "process" and workers > 1:
+        raise ValueError("On-demand translation needs the thread executor (the translator can't be shared with worker processes)")
+    if pairs is None:
+        pairs = pair_sections(a1, a2, embeddings)
+    jobs = []
+    for title, a1_key, a2_key in pairs:
         list1 = a1.get(a1_key, []) if a1_key else []
         list2 = a2.get(a2_key, []) if a2_key else []
-        analysis[title] = _analyse_section(list1, list2)
-    return analysis
+        vectors1 = embeddings[0].get(a1_key) if embeddings is not None and a1_key else None
+        vectors2 = embeddings[1].get(a2_key) if embeddings is not None and a2_key else None
+        jobs.append((title, (list1, list2, mode, vectors1, vectors2)))
+
+    if deadline is None and budget is not None:
+        deadline = time.time() + budget
+    elif deadline is not None and budget is None:
+        raise ValueError("A deadline needs its budget (the deadline's length in seconds)")
+
+    # Lead first (what a reader sees first), then the largest sections (their similarity matrix and
+    # NLI calls dominate: started early they don't stretch a pool's makespan, and under a deadline
+    # they get the better tier); results are keyed back into pair order below
+    by_priority = sorted(jobs, key=lambda job: (job[0] != "Lead", -(len(job[1][0]) * len(job[1][1]) + len(job[1][0]) + len(job[1][1]))))
+
+    # sections a resumed run already analysed
+    done = {}
+    if checkpoint is not None:
+        for title, _ in jobs:
+            result = checkpoint.section(title)
+            if result is not None:
+                done[title] = result
+        metrics.incr("checkpoint_sections_reused", len(done))
+    jobs_left = [job for job in jobs if job[0] not in done]
+    by_priority = [job for job in by_priority if job[0] not in done]
+
+    def finished(title, result):
+        if checkpoint is not None:
+            checkpoint.save_section(title, result)
+        return result
+
+    if workers <= 1 or len(jobs_left) <= 1:
+        if deadline is None:
+            results = {title: finished(title, _analyse_section(*args, verdicts=verdicts, translate=translate, tier=tier))
+                       for title, args in jobs_left}
+        else:
+            results = {title: finished(title, _run_section(args, tier, deadline, budget, verdicts, translate))
+                       for title, args in by_priority}
+    elif executor == "thread":
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # each task runs in a copy of this context, so its model calls land in this run's metrics/profile
+            futures = {pool.submit(contextvars.copy_context().run, profiling.thread_task, _run_section, args, tier,
+                                   deadline, budget, verdicts, translate): title
+                       for title, args in by_priority}
+            results = {futures[future]: finished(futures[future], future.result()) for future in as_completed(futures)}
+    else:
+        pool = _process_pool(workers)
+        try:
+            futures = {pool.submit(_run_section, args, tier, deadline, budget): title for title, args in by_priority}
+            results = {futures[future]: finished(futures[future], future.result()) for future in as_completed(futures)}
+        except BrokenProcessPool:
+            _shutdown_process_pools(workers) # a worker died (e.g. out of memory): the next run gets a fresh pool
+            raise
+    results.update(done)
+    return {title: results[title] for title, _ in jobs}
 
 # testing (run from project root: python -m src.analysis)
 if __name__ == "__main__":
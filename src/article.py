@@ -1,12 +1,35 @@
 # imports
-import wikipediaapi
+import re, requests, wikipediaapi
 from urllib.parse import urlparse, unquote
+from concurrent.futures import ThreadPoolExecutor
+from src import metrics
+
+# identifies us to the Wikimedia APIs (required by their user-agent policy)
+USER_AGENT = "Wikimerge/0.1 (https://github.com/cramroc/wikimerge)"
+
+# the MediaWiki action API caps titles per query at 50 for normal clients
+MAX_TITLES_PER_QUERY = 50
+
+# fetch backends for get_article: "wikipediaapi" (the wikipediaapi package: an existence check and
+# the extract as separate requests) or "api" (fetch_article: one query for everything)
+FETCH_BACKENDS = ("wikipediaapi", "api")
+
+# pages fetched at once by fetch_articles (be polite to the API: a handful, not hundreds)
+MAX_PARALLEL_FETCHES = 4
+
+# section heading line in a plain-text extract ("== History ==", "=== Early years ===")
+_HEADING = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+
+# bad input to a merge (an invalid URL, a missing article, an unknown setting): unlike a network or
+# API failure, the same input fails the same way every time. A ValueError, so callers catching that still work
+class InvalidInput(ValueError):
+    pass
 
 # function: url_check(url: str) -> None
 def url_check(url):
     # check url is a string and looks like url
     if not isinstance(url, str) or "://" not in url:
-        raise ValueError("Expected a full Wikipedia article URL: http(s)://...")
+        raise InvalidInput("Expected a full Wikipedia article URL: http(s)://...")
 
     # parse url
     p = urlparse(url)
@@ -14,14 +37,14 @@ def url_check(url):
     # make checks on parsed url
     ## scheme must be http(s)
     if p.scheme not in ("http", "https"):
-        raise ValueError("Scheme must be http or https")
+        raise InvalidInput("Scheme must be http or https")
     ## host must be "wikipedia.org" or a subdomain (dot-boundary check, so "evilwikipedia.org" is rejected; p.hostname strips any port and lowercases)
     host = p.hostname
     if host != "wikipedia.org" and not (host or "").endswith(".wikipedia.org"):
-        raise ValueError("Host must be wikipedia.org or a subdomain")
+        raise InvalidInput("Host must be wikipedia.org or a subdomain")
     ## path must begin with "/wiki/"
     if not p.path.startswith("/wiki/"):
-        raise ValueError("Path must begin with /wiki/")
+        raise InvalidInput("Path must begin with /wiki/")
 
 # function: url_to_title(url: str) -> str
 def url_to_title(url):
@@ -37,7 +60,7 @@ def url_to_title(url):
     segments = [seg for seg in path.split("/") if seg]
     ## check there is a title segment
     if len(segments) < 2:
-        raise ValueError("URL does not contain an article title")
+        raise InvalidInput("URL does not contain an article title")
     ## unquote the title segment (last segment)
     title = unquote(segments[-1])
     ## replace "_" with whitespaces and strip
@@ -55,38 +78,154 @@ def url_to_lang(url):
     
     # edge cases
     if parsed_url.netloc.startswith("www."):
-        raise ValueError("URL should not contain 'www.' prefix")
+        raise InvalidInput("URL should not contain 'www.' prefix")
     elif parsed_url.netloc.count('.') < 2:
-        raise ValueError("URL does not contain a valid subdomain for language code")
+        raise InvalidInput("URL does not contain a valid subdomain for language code")
     # return the first part of the netloc (subdomain) as the language code
     lang_code = parsed_url.netloc.split('.')[0]
     return lang_code.lower() # return in lowercase for for wikipedia-api
 
-# function: get_article(lang: str, title: str) -> dict[str, list[dict]]  (each dict: {"heading", "text"})
-def get_article(lang, title):
+# function: api_url(lang: str) -> str
+def api_url(lang):
+    return "https://" + lang + ".wikipedia.org/w/api.php"
+
+# function: get_revision_ids(lang: str, titles: list[str]) -> dict[str, int | None]
+# latest revision id of each title (None if the page doesn't exist), in one request per 50 titles.
+# Redirects and title normalisation are followed, but the result stays keyed by the title asked for.
+def get_revision_ids(lang, titles):
+    out = {}
+    titles = [t.strip() for t in titles]
+    for pos in range(0, len(titles), MAX_TITLES_PER_QUERY):
+        chunk = titles[pos:pos + MAX_TITLES_PER_QUERY]
+        params = {
+            "action": "query", "prop": "info", "redirects": 1,
+            "titles": "|".join(chunk), "format": "json", "formatversion": 2
+        }
+        metrics.incr("wikipedia_requests")
+        try:
+            response = requests.get(api_url(lang), params=params, headers={"User-Agent": USER_AGENT}, timeout=30)
+            response.raise_for_status()
+            data = response.json()["query"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise RuntimeError("Error querying Wikipedia revision ids: " + str(e))
+
+        # follow title normalisation ("foo" -> "Foo") and then redirects, to the final page title
+        renamed = {n["from"]: n["to"] for n in data.get("normalized", [])}
+        renamed_redirects = {r["from"]: r["to"] for r in data.get("redirects", [])}
+        revids = {p["title"]: p.get("lastrevid") for p in data.get("pages", []) if not p.get("missing")}
+        for title in chunk:
+            final = renamed.get(title, title)
+            final = renamed_redirects.get(final, final)
+            out[title] = revids.get(final)
+    return out
+
+# function: split_paragraphs(text: str) -> list[str]
+def split_paragraphs(text):
+    # split text by blank lines into blocks
+    blocks = text.split("\n\n")
+    # clean up each block and store in paragraphs list
+    paragraphs = []
+    for b in blocks:
+        b = b.strip()
+        if b:
+            paragraphs.append(b.replace("\n", " "))
+    # return list of clean paragraphs
+    return paragraphs
+
+# function: sections_from_extract(text: str) -> dict[str, list[dict]]
+# rebuild get_article's structure from a plain-text extract with "== Heading ==" lines: the lead,
+# then each top-level section with its subsections' prose flattened in, tagged with the deepest
+# subsection heading it sits under (the section's own prose gets heading None)
+def sections_from_extract(text):
+    out = {}
+    matches = list(_HEADING.finditer(text))
+    lead_text = [{"heading": None, "text": p} for p in split_paragraphs(text[:matches[0].start()] if matches else text)]
+    if lead_text:
+        out["Lead"] = lead_text
+    current = None # top-level section the following prose belongs to
+    for n, m in enumerate(matches):
+        level, heading = len(m.group(1)), m.group(2)
+        body = text[m.end():matches[n + 1].start() if n + 1 < len(matches) else len(text)]
+        if level == 2 or current is None:
+            current = heading
+            heading = None
+        paragraphs = [{"heading": heading, "text": p} for p in split_paragraphs(body)]
+        if paragraphs:
+            out.setdefault(current, []).extend(paragraphs)
+    return out
+
+# function: fetch_article(lang: str, title: str) -> dict
+# the whole article in one request (MediaWiki query: plain-text extract with section headings,
+# latest revision id and external links, gzip-compressed). Only a very long list of external links
+# takes continuation requests.
+# Output: {"title" (after redirects), "revid", "references" (external link URLs), "sections" (as get_article)}
+def fetch_article(lang, title):
+    title = title.strip()
+    params = {
+        "action": "query", "prop": "extracts|info|extlinks", "explaintext": 1, "exsectionformat": "wiki",
+        "ellimit": "max", "redirects": 1, "titles": title, "format": "json", "formatversion": 2
+    }
+    headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"}
+    extract = None
+    revid = None
+    references = []
+    while True:
+        metrics.incr("wikipedia_requests")
+        try:
+            response = requests.get(api_url(lang), params=params, headers=headers, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise RuntimeError("Error fetching Wikipedia article: " + str(e))
+        pages = data.get("query", {}).get("pages", [])
+        if not pages or pages[0].get("missing") or pages[0].get("invalid"):
+            raise InvalidInput("Article not found: " + title)
+        page = pages[0]
+        if page.get("extract") is not None:
+            extract = page["extract"]
+        revid = page.get("lastrevid", revid)
+        references.extend(link["url"] for link in page.get("extlinks", []))
+        if "continue" not in data:
+            break
+        params.update(data["continue"]) # more external links to page through
+    metrics.incr("wikipedia_pages_fetched")
+    return {"title": page["title"], "revid": revid, "references": references,
+            "sections": sections_from_extract(extract or "")}
+
+# function: fetch_articles(lang: str, titles: list[str], revids: dict | None) -> dict[str, dict | None]
+# several articles of one edition: missing pages are found with one batched revision-id query
+# (get_revision_ids, or its result passed in as revids by a caller that already asked), the rest
+# are fetched MAX_PARALLEL_FETCHES at a time. Keyed by the title asked for; None for a page that
+# doesn't exist.
+def fetch_articles(lang, titles, revids=None):
+    if revids is None:
+        revids = get_revision_ids(lang, titles)
+    existing = [t for t, revid in revids.items() if revid is not None]
+    out = {t: None for t in revids}
+    if existing:
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_FETCHES, len(existing))) as pool:
+            for t, article in zip(existing, pool.map(lambda t: fetch_article(lang, t), existing)):
+                out[t] = article
+    return out
+
+# function: get_article(lang: str, title: str, backend: str) -> dict[str, list[dict]]  (each dict: {"heading", "text"})
+def get_article(lang, title, backend="wikipediaapi"):
+    if backend == "api":
+        return fetch_article(lang, title)["sections"]
+    if backend != "wikipediaapi":
+        raise InvalidInput("Unknown fetch backend: " + str(backend) + " (expected one of " + ", ".join(FETCH_BACKENDS) + ")")
+
     # instantiate wikipedia api
-    wiki = wikipediaapi.Wikipedia(user_agent="Wikimerge/0.1 (https://github.com/cramroc/wikimerge)",
+    wiki = wikipediaapi.Wikipedia(user_agent=USER_AGENT,
                                   language=lang,
                                   extract_format=wikipediaapi.ExtractFormat.WIKI)
     
     # define page & make sure it exists
     title = title.strip()
     page = wiki.page(title)
+    metrics.incr("wikipedia_pages_fetched")
     if not page.exists():
-        raise ValueError("Article not found: " + title)
-    
-    # helper function: split_paragraphs(text: str) -> list[str]
-    def split_paragraphs(text):
-        # split text by blank lines into blocks
-        blocks = text.split("\n\n")
-        # clean up each block and store in paragraphs list
-        paragraphs = []
-        for b in blocks:
-            b = b.strip()
-            if b:
-                paragraphs.append(b.replace("\n", " "))
-        # return list of clean paragraphs
-        return paragraphs
+        raise InvalidInput("Article not found: " + title)
 
     # helper function: collect_paragraphs(section, heading=None) -> list[dict]
     # Gather a section's own paragraphs AND all its subsections' (flattened, in reading order).
@@ -0,0 +1,107 @@
+# cross-request dynamic batching for model inference in a long-running process.
+# Concurrent merges each call similarity.embed / nli.classify_pairs with a handful of
+# inputs; a DynamicBatcher sits in front of the model, gathers requests from all callers
+# for up to max_wait_ms (or until max_batch items are waiting), runs them through the
+# model as one batch on its own thread, and hands every caller back its own slice.
+# Off by default (a single CLI merge gains nothing from waiting); see enable().
+
+# imports
+import time, queue, threading
+
+DEFAULT_MAX_BATCH = 64 # items per model call (a single oversized request still runs whole)
+DEFAULT_MAX_WAIT_MS = 5.0 # how long the first request in a batch waits for company
+
+# one caller's submission, completed by the batcher thread
+class _Request:
+    def __init__(self, items):
+        self.items = items
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class DynamicBatcher:
+    def __init__(self, fn, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, name="batcher"):
+        """
+        Input:
+            fn (callable): list of items -> sequence (list or array) of one result per item, in order
+            max_batch (int): stop gathering once this many items are waiting
+            max_wait_ms (float): stop gathering this long after the batch's first request arrived
+            name (str): name of the worker thread (shows up in profilers / thread dumps)
+        """
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0 # model calls made (for tests / metrics)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items):
+        """
+        Input:
+            items (list): this caller's inputs
+        Output:
+            the slice of fn's output belonging to these items (blocks until the batch ran);
+            re-raises whatever fn raised for the batch
+        """
+        if not items:
+            return []
+        request = _Request(list(items))
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _gather(self):
+        batch = [self._queue.get()] # block until there is any work at all
+        size = len(batch[0].items)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._gather()
+            items = [item for request in batch for item in request.items]
+            try:
+                results = self.fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError("Batched call returned " + str(len(results)) + " results for " + str(len(items)) + " items")
+            except BaseException as e:
+                # anything fn raises (or a misaligned result) fails this batch's callers, never the thread:
+                # a dead batcher would leave every later caller waiting forever
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+            self.batches += 1
+            # hand each caller back its own slice, in submission order
+            start = 0
+            for request in batch:
+                end = start + len(request.items)
+                request.result = results[start:end]
+                start = end
+                request.done.set()
+
+# route similarity.embed and nli.classify_pairs through shared batchers (idempotent settings change:
+# calling it again replaces the batchers with ones using the new limits)
+def enable(max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    from src import similarity, nli # imported here: those modules read their _batcher at call time
+    similarity._batcher = DynamicBatcher(similarity._encode, max_batch, max_wait_ms, name="embed-batcher")
+    nli._batcher = DynamicBatcher(nli._predict, max_batch, max_wait_ms, name="nli-batcher")
+
+# back to direct, per-call inference (idle batcher threads are daemons and simply stay parked)
+def disable():
+    from src import similarity, nli
+    similarity._batcher = None
+    nli._batcher = None
@@ -0,0 +1,292 @@
+# benchmark harness for the merge pipeline: deterministic synthetic articles, a local
+# DeepL stand-in with configurable latency, and (optionally) stubbed models, so each
+# stage can be timed on its own and compared against a stored baseline.
+# run from project root: python -m src.bench --help
+
+# imports
+import os, sys, json, time, random, hashlib, argparse, contextlib
+import numpy as np
+from src import translate, similarity, nli, analysis, render
+from src.merge import pair_sections
+
+# benchmark files (per machine, so they live outside the source tree's tracked files)
+BENCH_DIR = os.path.join(render.BASE_DIR, "bench")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# a p50 more than this fraction slower than the baseline counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# stages timed on every repeat, in pipeline order
+STAGES = ["translate_article", "pair_sections", "_analyse_section", "render_html"]
+
+# small fixed vocabulary for synthetic text (deterministic given the seed)
+WORDS = (
+    "the city river population history museum bridge century empire trade climate "
+    "species island mountain language culture war treaty capital region coast forest "
+    "railway harbour festival university church castle market village valley desert"
+).split()
+
+# -- synthetic data -------------------------------------------------------------
+
+def _sentence(rng):
+    n = rng.randint(6, 16)
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+def _paragraph(rng):
+    return " ".join(_sentence(rng) for _ in range(rng.randint(2, 5)))
+
+# function: _unique(title: str, taken: dict, s: int) -> str
+# random titles can repeat; a repeat gets the section number appended so no section overwrites another
+def _unique(title, taken, s):
+    return title if title not in taken else title + " " + str(s)
+
+def synthetic_articles(n_sections, n_paragraphs, seed=0, overlap=0.5):
+    """
+    Build two deterministic fetched-style articles (section -> list of {"heading", "text"}).
+    Input:
+        n_sections (int): sections per article, including the Lead
+        n_paragraphs (int): paragraphs per section
+        seed (int): same seed -> byte-identical articles
+        overlap (float): fraction of paragraphs (and section titles) the second article
+                         shares with the first, so alignment and NLI have real candidates
+    Output:
+        tuple(dict, dict): (a1, a2)
+    """
+    rng = random.Random(seed)
+    a1, a2 = {}, {}
+    for s in range(n_sections):
+        title1 = "Lead" if s == 0 else "Section " + " ".join(rng.choice(WORDS) for _ in range(2))
+        title2 = title1 if s == 0 or rng.random() < overlap else "Section " + " ".join(rng.choice(WORDS) for _ in range(2))
+        p1, p2 = [], []
+        for _ in range(n_paragraphs):
+            text = _paragraph(rng)
+            p1.append({"heading": None, "text": text})
+            p2.append({"heading": None, "text": text if rng.random() < overlap else _paragraph(rng)})
+        a1[_unique(title1, a1, s)] = p1
+        a2[_unique(title2, a2, s)] = p2
+    return a1, a2
+
+# -- stubbed services -------------------------------------------------------------
+
+# stand-in for a requests.Response: only the bits translate.py actually reads
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+    def json(self):
+        return self._payload
+
+# local DeepL stand-in: replaces translate.requests.post, sleeps `latency` seconds per
+# request (a round trip), and "translates" by prefixing each text with "EN:"
+class FakeDeepL:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0 # number of round trips made
+        self.chars = 0 # characters sent
+    def __call__(self, endpoint, data=None, headers=None, **kwargs):
+        texts = data["text"] if isinstance(data["text"], list) else [data["text"]]
+        self.requests += 1
+        self.chars += sum(len(t) for t in texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(200, {"translations": [{"text": "EN:" + t} for t in texts]})
+
+# stand-in embedding model: hashed bag-of-words vectors, so identical or word-sharing
+# texts get similar vectors (enough for alignment to find candidates) at near-zero cost
+class StubEmbedder:
+    def __init__(self, dim=384):
+        self.dim = dim
+    def encode(self, texts, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in t.lower().split():
+                out[i, int(hashlib.md5(w.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+# stand-in NLI cross-encoder: a deterministic pseudo-random logit row per pair
+class StubCrossEncoder:
+    def predict(self, pairs, **kwargs):
+        rows = []
+        for a, b in pairs:
+            seed = int(hashlib.md5((a + "\x00" + b).encode("utf-8")).hexdigest()[:8], 16)
+            rows.append(np.random.default_rng(seed).random(len(nli.NLI_LABELS)))
+        return np.array(rows, dtype=np.float32)
+
+# function: install_stubs(deepl: FakeDeepL, stub_models: bool) -> None
+# patches module attributes in place (the benchmark runs in its own process, so nothing is restored)
+def install_stubs(deepl, stub_models=True):
+    os.environ.setdefault("DEEPL_API_KEY", "bench-key-not-real")
+    translate.requests.post = deepl
+    # never read or write the real cache/translations.json: every repeat starts cold
+    translate.DeepLTranslator._load_cache = lambda self: {}
+    translate.DeepLTranslator.save_cache = lambda self: None
+    if stub_models:
+        embedder, cross_encoder = StubEmbedder(), StubCrossEncoder()
+        similarity.get_model = lambda *args, **kwargs: embedder
+        nli.get_model = lambda *args, **kwargs: cross_encoder
+
+# -- measurement ------------------------------------------------------------------
+
+# the process's peak resident set size so far (VmHWM) in MB (None where /proc is unavailable, e.g. macOS)
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+# function: _reset_peak_rss() -> bool
+# start VmHWM over from the current resident set size (Linux 4.0+); False where that isn't possible
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+# times one stage and records the highest resident memory of the process while it ran (the peak
+# over the repeats): memory a stage allocates and frees again still shows
+@contextlib.contextmanager
+def _measure(stage, timings, rss):
+    reset = _reset_peak_rss()
+    start = time.perf_counter()
+    yield
+    timings[stage].append(time.perf_counter() - start)
+    peak = _peak_rss_mb() if reset else None
+    if peak is not None:
+        rss[stage] = max(rss.get(stage, 0.0), peak)
+
+# linear-interpolated percentile of a non-empty list (q in [0, 100])
+def _percentile(values, q):
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+def _run_once(a1, a2, timings, items, rss):
+    translator = translate.DeepLTranslator()
+
+    with _measure("translate_article", timings, rss):
+        t1 = translate.translate_article(a1, "es", translator)
+        t2 = translate.translate_article(a2, "fr", translator)
+    items["translate_article"] += sum(len(p) for p in a1.values()) + sum(len(p) for p in a2.values())
+
+    with _measure("pair_sections", timings, rss):
+        pairs = pair_sections(t1, t2)
+    items["pair_sections"] += len(pairs)
+
+    result = {}
+    for title, k1, k2 in pairs:
+        list1 = t1.get(k1, []) if k1 else []
+        list2 = t2.get(k2, []) if k2 else []
+        with _measure("_analyse_section", timings, rss):
+            result[title] = analysis._analyse_section(list1, list2)
+        items["_analyse_section"] += len(list1) + len(list2)
+
+    with _measure("render_html", timings, rss):
+        render.render_html("Benchmark", result, os.path.join(render.OUTPUT_DIR, "bench", "bench.html"), "ES", "FR")
+    items["render_html"] += 1
+
+def run_benchmark(sizes, repeats=5, seed=0):
+    """
+    Input:
+        sizes (list[tuple[int, int]]): (n_sections, n_paragraphs) article shapes to run
+        repeats (int): timed runs per shape (after one untimed warm-up run)
+        seed (int): seed for the synthetic articles
+    Output:
+        dict: "<sections>x<paragraphs>" -> stage -> {"calls", "p50_ms", "p95_ms", "p99_ms",
+              "throughput_per_s", "peak_rss_mb"}; throughput counts paragraphs for
+              translate/_analyse_section, section pairs for pair_sections and pages for render;
+              peak_rss_mb is the process's highest resident memory during any call of the stage
+              (None where the peak can't be reset, e.g. off Linux)
+    """
+    report = {}
+    for n_sections, n_paragraphs in sizes:
+        a1, a2 = synthetic_articles(n_sections, n_paragraphs, seed=seed)
+        _run_once(a1, a2, {s: [] for s in STAGES}, {s: 0 for s in STAGES}, {}) # warm-up (model load, template compile)
+
+        timings = {s: [] for s in STAGES}
+        items = {s: 0 for s in STAGES}
+        rss = {}
+        for _ in range(repeats):
+            _run_once(a1, a2, timings, items, rss)
+
+        shape = {}
+        for s in STAGES:
+            total = sum(timings[s])
+            shape[s] = {
+                "calls": len(timings[s]),
+                "p50_ms": round(_percentile(timings[s], 50) * 1000, 3),
+                "p95_ms": round(_percentile(timings[s], 95) * 1000, 3),
+                "p99_ms": round(_percentile(timings[s], 99) * 1000, 3),
+                "throughput_per_s": round(items[s] / total, 1) if total else None,
+                "peak_rss_mb": round(rss[s], 1) if s in rss else None
+            }
+        report[str(n_sections) + "x" + str(n_paragraphs)] = shape
+    return report
+
+# function: compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> list[str]
+# one message per stage whose p50 got slower than baseline * (1 + tolerance); empty list = no regressions
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for shape, stages in report.items():
+        for stage, stats in stages.items():
+            old = baseline.get(shape, {}).get(stage)
+            if not old or not old.get("p50_ms"):
+                continue # new shape/stage: nothing to compare against
+            if stats["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+                regressions.append(
+                    shape + " " + stage + ": p50 " + str(stats["p50_ms"]) + " ms vs baseline " + str(old["p50_ms"]) + " ms"
+                )
+    return regressions
+
+def _parse_sizes(text):
+    sizes = []
+    for part in text.split(","):
+        sections, paragraphs = part.lower().split("x")
+        sizes.append((int(sections), int(paragraphs)))
+    return sizes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Wikimerge pipeline stages on synthetic articles.")
+    parser.add_argument("--sizes", default="5x4,20x10", help="comma-separated <sections>x<paragraphs> shapes")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated DeepL round-trip latency")
+    parser.add_argument("--real-models", action="store_true", help="load the real embedding/NLI models instead of stubs")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if any stage regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    install_stubs(FakeDeepL(args.latency_ms / 1000.0), stub_models=not args.real_models)
+    report = run_benchmark(_parse_sizes(args.sizes), repeats=args.repeats, seed=args.seed)
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Saved baseline to " + args.baseline)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print("No baseline at " + args.baseline + "; run with --save-baseline first")
+            return 1
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print("REGRESSION " + r)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
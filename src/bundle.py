@@ -0,0 +1,107 @@
+# local model bundle: the embedding, multilingual embedding and NLI models exported once into
+# a directory of plain model folders with safetensors weights, so later cold starts load them
+# from disk without touching the Hugging Face hub (no network checks; production hosts have no
+# outbound network). safetensors files are memory-mapped when loaded, so processes on the same
+# host read the weights through the shared page cache instead of each deserialising a copy.
+#   cache/models/bundle.json          {"version", "models": {hub name: {"path", "files"}}}
+#   cache/models/<hub name, / -> -->  what model.save() writes (config, tokenizer, *.safetensors)
+# The bundle is used whenever its manifest exists (WIKIMERGE_MODEL_BUNDLE points elsewhere);
+# a model missing from it is still loaded from the hub.
+# run from project root: python -m src.bundle export
+
+# imports
+import os, argparse
+from src.storage import atomic_write_json, read_json
+
+BUNDLE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "models")
+BUNDLE_ENV = "WIKIMERGE_MODEL_BUNDLE"
+
+# bumped whenever the bundle layout changes (a bundle of another version is refused, not misread)
+BUNDLE_VERSION = 1
+
+# function: bundle_dir() -> str
+def bundle_dir():
+    return os.getenv(BUNDLE_ENV) or BUNDLE_DIR
+
+# function: manifest(root: str) -> dict | None   (None: no bundle there)
+def manifest(root=None):
+    root = root or bundle_dir()
+    data = read_json(os.path.join(root, "bundle.json"))
+    if data is not None and data.get("version") != BUNDLE_VERSION:
+        raise RuntimeError("Model bundle at " + root + " has version " + str(data.get("version")) +
+                           " (expected " + str(BUNDLE_VERSION) + "); export it again")
+    return data
+
+# function: resolve(name: str, root: str) -> str
+# what to hand SentenceTransformer / CrossEncoder: the bundled folder if the bundle has this
+# model, else the hub name unchanged
+def resolve(name, root=None):
+    root = root or bundle_dir()
+    data = manifest(root)
+    if data is None or name not in data["models"]:
+        return name
+    path = os.path.join(root, data["models"][name]["path"])
+    for filename, size in data["models"][name]["files"].items():
+        full = os.path.join(path, filename)
+        if not os.path.exists(full) or os.path.getsize(full) != size:
+            # a half-copied bundle would otherwise fail deep inside transformers (or load garbage)
+            raise RuntimeError("Model bundle is incomplete: " + full + " is missing or truncated; export it again")
+    return path
+
+# the models a bundle holds: hub name -> class that loads (and saves) it
+def _bundled_models():
+    from sentence_transformers import SentenceTransformer, CrossEncoder
+    from src import similarity, nli
+    return {
+        similarity.EMBED_MODEL: SentenceTransformer,
+        similarity.MULTILINGUAL_EMBED_MODEL: SentenceTransformer,
+        nli.NLI_MODEL: CrossEncoder
+    }
+
+def export_bundle(root=None, loaders=None):
+    """
+    Download (or take from the hub cache) each model and save it into the bundle.
+    Input:
+        root (str, optional): bundle directory (default: bundle_dir())
+        loaders (dict, optional): hub name -> class with a .save(path, safe_serialization=True);
+                                  defaults to the embedding, multilingual and NLI models
+    Output:
+        dict: the written manifest
+    """
+    root = root or bundle_dir()
+    loaders = loaders if loaders is not None else _bundled_models()
+    entries = {}
+    for name, loader in loaders.items():
+        folder = name.replace("/", "--")
+        path = os.path.join(root, folder)
+        loader(name).save(path, safe_serialization=True)
+        files = {}
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                files[os.path.relpath(full, path)] = os.path.getsize(full)
+        if not any(f.endswith(".safetensors") for f in files):
+            raise RuntimeError("Exported " + name + " without safetensors weights (sentence-transformers too old?)")
+        entries[name] = {"path": folder, "files": files}
+    data = {"version": BUNDLE_VERSION, "models": entries}
+    atomic_write_json(os.path.join(root, "bundle.json"), data) # written last: a crashed export leaves no manifest
+    return data
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the models into a local bundle for offline loading.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    commands = [sub.add_parser("export", help="save every model into the bundle directory"),
+                sub.add_parser("check", help="list the bundled models and verify their files")]
+    for command in commands: # on each command, so it goes after it: python -m src.bundle check --dir X
+        command.add_argument("--dir", default=None, help="bundle directory (default: " + BUNDLE_DIR + ")")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        data = export_bundle(args.dir)
+        print("Exported " + ", ".join(data["models"]) + " to " + (args.dir or bundle_dir()))
+    else:
+        data = manifest(args.dir)
+        if data is None:
+            print("No model bundle at " + (args.dir or bundle_dir()))
+        for name in (data or {}).get("models", {}):
+            print(name + " -> " + resolve(name, args.dir))
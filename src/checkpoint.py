@@ -0,0 +1,89 @@
+# crash-safe checkpoints of a pipeline run, so a run that dies mid-analysis (DeepL error, OOM,
+# pre-emption) resumes where it stopped instead of starting over. One folder per run id under
+# cache/checkpoints/:
+#   run.json                  {"run_id", "fingerprint"} (what the run was started with)
+#   <stage>.json              a finished stage's output: fetch, translate, pair
+#   embeddings.npz            the paragraph embeddings (embed_paragraphs stage)
+#   sections/<sha1>.json      one analysed section: {"title", "result"}, written as it finishes
+# Every file is written atomically (temp file + rename), so a crash leaves either the old state or
+# the complete new file. A resumed run checks the fingerprint (URLs, models, thresholds, options)
+# and refuses a checkpoint written for another run. The folder is removed once the run completes.
+
+# imports
+import os, hashlib, shutil, tempfile
+import numpy as np
+from src.storage import atomic_write_json, read_json
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "checkpoints")
+
+class RunCheckpoint:
+    def __init__(self, run_id, fingerprint, root=CHECKPOINT_DIR, resume=False):
+        """
+        Input:
+            run_id (str): folder name of this run's checkpoint
+            fingerprint (str): identifies what the run computes (e.g. a result_cache.result_key)
+            root (str): parent folder of all checkpoints
+            resume (bool): reuse what an earlier run with this id saved; otherwise any earlier
+                           checkpoint under this id is discarded
+        """
+        if not run_id or os.sep in run_id or run_id in (".", ".."):
+            raise ValueError("Invalid run id: " + repr(run_id))
+        self.run_id = run_id
+        self.path = os.path.join(root, run_id)
+        meta = read_json(os.path.join(self.path, "run.json"))
+        if resume and meta is not None and meta.get("fingerprint") != fingerprint:
+            raise ValueError("Checkpoint " + run_id + " was written for another run (different URLs or settings)")
+        if not resume or meta is None:
+            self.clear()
+            atomic_write_json(os.path.join(self.path, "run.json"), {"run_id": run_id, "fingerprint": fingerprint})
+
+    # function: load(stage: str) -> data | None   (None: stage not finished yet)
+    def load(self, stage):
+        return read_json(os.path.join(self.path, stage + ".json"))
+
+    def save(self, stage, data):
+        atomic_write_json(os.path.join(self.path, stage + ".json"), data)
+
+    # function: load_embeddings() -> tuple[dict[str, np.ndarray], ...] | None
+    def load_embeddings(self):
+        path = os.path.join(self.path, "embeddings.npz")
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            out = []
+            for i in range(int(data["articles"])):
+                sections = data["sections" + str(i)]
+                out.append({str(s): data[str(i) + ":" + str(n)] for n, s in enumerate(sections)})
+        return tuple(out)
+
+    # embeddings: per article, section -> (n_paragraphs, dim) array (similarity.embed_articles)
+    def save_embeddings(self, embeddings):
+        arrays = {"articles": np.array(len(embeddings))}
+        for i, by_section in enumerate(embeddings):
+            arrays["sections" + str(i)] = np.array(list(by_section), dtype=str)
+            for n, vectors in enumerate(by_section.values()):
+                arrays[str(i) + ":" + str(n)] = np.asarray(vectors)
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp-", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, os.path.join(self.path, "embeddings.npz"))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _section_path(self, title):
+        return os.path.join(self.path, "sections", hashlib.sha1(title.encode("utf-8")).hexdigest() + ".json")
+
+    # function: section(title: str) -> dict | None   (an analysed section's buckets, if saved)
+    def section(self, title):
+        data = read_json(self._section_path(title))
+        return data["result"] if data is not None and data.get("title") == title else None
+
+    def save_section(self, title, result):
+        atomic_write_json(self._section_path(title), {"title": title, "result": result})
+
+    # drop the whole checkpoint (the run finished, or a fresh run reuses the id)
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,118 @@
+# imports
+import os, json
+import numpy as np
+
+# analysis buckets in a fixed order: the "label" column stores each row's index into this list
+LABELS = ["agree", "contradict", "neutral", "unique_a1", "unique_a2"]
+
+# bumped whenever the on-disk column layout changes, so loaders can refuse stale exports
+EXPORT_VERSION = 1
+
+# one .npy file per column (plain .npy rather than .npz, because only .npy can be memory-mapped by np.load)
+#   section: int32 index into strings["sections"]
+#   label:   int8 index into LABELS
+#   a1_idx:  int32 paragraph id (its "idx" within the a1 section), -1 if the row has no a1 paragraph
+#   a2_idx:  int32 paragraph id within the a2 section, -1 if the row has no a2 paragraph
+#   score:   float32 cosine score of the pair, NaN for unique rows
+COLUMNS = {"section": np.int32, "label": np.int8, "a1_idx": np.int32, "a2_idx": np.int32, "score": np.float32}
+
+# the string table: everything non-numeric the columns point into
+STRINGS_FILE = "strings.json"
+
+# function: export_dir_for(html_path: str) -> str
+# exports sit next to the rendered page: output/giant-tortoise.html -> output/giant-tortoise.columns/
+def export_dir_for(html_path):
+    return os.path.splitext(html_path)[0] + ".columns"
+
+# flatten the nested analysis dict into one row per pair / unique paragraph
+def _rows(analysis):
+    rows = {name: [] for name in COLUMNS}
+    for s, (title, info) in enumerate(analysis.items()):
+        for label_id, label in enumerate(LABELS):
+            for item in info.get(label, []):
+                if label.startswith("unique"):
+                    # unique rows carry one paragraph record, on the side the bucket is named after
+                    a1 = item if label == "unique_a1" else None
+                    a2 = item if label == "unique_a2" else None
+                    score = float("nan")
+                else:
+                    a1, a2, score = item["a1"], item["a2"], item["score"]
+                rows["section"].append(s)
+                rows["label"].append(label_id)
+                rows["a1_idx"].append(a1.get("idx", -1) if a1 is not None else -1)
+                rows["a2_idx"].append(a2.get("idx", -1) if a2 is not None else -1)
+                rows["score"].append(score)
+    return rows
+
+def export_analysis(analysis, outdir, title="", lang1="", lang2=""):
+    """
+    Write an analysis in compact columnar form, so downstream consumers can aggregate
+    many merges without re-parsing HTML or re-running the models.
+    Input:
+        analysis (dict): section title -> buckets, as produced by analyze_articles
+        outdir (str): directory to write into (created if missing; existing columns are overwritten)
+        title, lang1, lang2 (str): stored in the string table for reference
+    Output:
+        str: outdir
+    """
+    os.makedirs(outdir, exist_ok=True)
+    rows = _rows(analysis)
+    for name, dtype in COLUMNS.items():
+        np.save(os.path.join(outdir, name + ".npy"), np.asarray(rows[name], dtype=dtype))
+
+    strings = {
+        "version": EXPORT_VERSION,
+        "title": title,
+        "lang1": lang1,
+        "lang2": lang2,
+        "labels": LABELS,
+        "sections": list(analysis.keys())
+    }
+    with open(os.path.join(outdir, STRINGS_FILE), "w", encoding="utf-8") as f:
+        json.dump(strings, f, ensure_ascii=False)
+    return outdir
+
+def load_analysis(outdir, mmap=True):
+    """
+    Input:
+        outdir (str): a directory written by export_analysis
+        mmap (bool): memory-map the columns (read-only) instead of reading them into RAM
+    Output:
+        dict: column name -> np.ndarray, plus "strings" -> the string table dict
+    """
+    with open(os.path.join(outdir, STRINGS_FILE), "r", encoding="utf-8") as f:
+        strings = json.load(f)
+    if strings.get("version") != EXPORT_VERSION:
+        raise ValueError("Unsupported export version in " + outdir + ": " + str(strings.get("version")))
+
+    out = {"strings": strings}
+    for name in COLUMNS:
+        out[name] = np.load(os.path.join(outdir, name + ".npy"), mmap_mode="r" if mmap else None)
+    return out
+
+# function: label_counts(outdirs: list[str]) -> dict[str, int]
+# total number of rows per bucket across many exports (only the label column is touched)
+def label_counts(outdirs):
+    totals = np.zeros(len(LABELS), dtype=np.int64)
+    for d in outdirs:
+        labels = np.load(os.path.join(d, "label.npy"), mmap_mode="r")
+        totals += np.bincount(labels, minlength=len(LABELS))
+    return {label: int(n) for label, n in zip(LABELS, totals)}
+
+# testing (run from project root: python -m src.export)
+if __name__ == "__main__":
+    demo_analysis = {
+        "Lead": {
+            "agree": [{"a1": {"lang": "ES", "idx": 0}, "a2": {"lang": "FR", "idx": 1}, "score": 0.91}],
+            "contradict": [],
+            "neutral": [],
+            "unique_a1": [{"lang": "ES", "idx": 1}],
+            "unique_a2": []
+        }
+    }
+    path = export_analysis(demo_analysis, os.path.join("output", "demo.columns"), "Demo", "ES", "FR")
+    data = load_analysis(path)
+    print("Sections:", data["strings"]["sections"])
+    print("Labels:", [LABELS[i] for i in data["label"]])
+    print("Scores:", list(data["score"]))
+    print("Counts:", label_counts([path]))
@@ -0,0 +1,349 @@
+# persistent paragraph embedding index across every merge run with it enabled, under cache/index/:
+#   vectors.f32   all paragraph vectors, unit length, float32, appended row by row (memory-mapped for search)
+#   meta.jsonl    one line per row: {"merge", "section", "lang", "text"} (the translated paragraph)
+#   index.json    header: {"version", "model", "dim", "count", "meta_bytes", "merges"}; meta_bytes is
+#                 where meta.jsonl's committed rows end, merges maps a merge id to its live row
+#                 range [start, end) plus what it was built from (revision ids, output page)
+#   vectors.i8 + scales.f32, vectors.bits
+#                 the same rows as int8 and binary sign codes (see quantize.py): search can scan
+#                 these (4x / 32x fewer bytes) and re-rank only the candidates with vectors.f32
+# Rows are only ever appended: re-indexing a merge appends its new rows and points its range at
+# them, and search skips rows outside their merge's live range. The header is written last and
+# atomically, so a crash mid-append leaves rows past "count" that the next append truncates.
+# Writers take an exclusive lock on cache/index/.lock (fcntl.flock), so appends from several
+# processes (job workers, analysis process pools) never interleave their rows. A merge already
+# indexed from the same revisions and settings is not appended again (has_merge).
+# Also holds the NLI verdict store (verdicts.json): bidirectional verdicts of paragraph pairs
+# already judged, so identical pairs in later merges skip the cross-encoder.
+# run from project root: python -m src.index search "the bridge was completed in 1932"
+
+# imports
+import os, json, hashlib, threading, argparse
+from contextlib import contextmanager
+import numpy as np
+from src import similarity, nli, quantize
+from src.storage import atomic_write_json, read_json
+
+try:
+    import fcntl # unix only: inter-process file lock
+except ImportError:
+    fcntl = None
+
+INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "index")
+
+# bumped whenever the on-disk layout changes (an index of another version is refused, not misread)
+INDEX_VERSION = 1
+
+# rows scored per block during search (bounds memory for large indexes; pages come from the memmap)
+SEARCH_BLOCK_ROWS = 65536
+
+_write_lock = threading.Lock() # merges running concurrently in one process (server.py) append one at a time
+
+# function: merge_id(lang1: str, title1: str, lang2: str, title2: str) -> str
+def merge_id(lang1, title1, lang2, title2):
+    return lang1 + ":" + title1.strip() + "|" + lang2 + ":" + title2.strip()
+
+# exclusive write access to the index folder: one thread of this process (_write_lock), one process
+# on this host (flock on root/.lock; where fcntl is missing, only the threads of one process are serialised)
+@contextmanager
+def _locked(root):
+    with _write_lock:
+        os.makedirs(root, exist_ok=True)
+        with open(os.path.join(root, ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX) # released when the file is closed
+            yield
+
+class ParagraphIndex:
+    def __init__(self, root=INDEX_DIR):
+        self.root = root
+        self.vectors_path = os.path.join(root, "vectors.f32")
+        self.meta_path = os.path.join(root, "meta.jsonl")
+        self.header_path = os.path.join(root, "index.json")
+        self.codes_path = os.path.join(root, "vectors.i8")
+        self.scales_path = os.path.join(root, "scales.f32")
+        self.bits_path = os.path.join(root, "vectors.bits")
+        self._meta = None # meta rows, loaded on first search
+
+    def header(self):
+        header = read_json(self.header_path)
+        if header is None:
+            return {"version": INDEX_VERSION, "model": similarity.EMBED_MODEL, "dim": None, "count": 0, "meta_bytes": 0, "merges": {}}
+        if header.get("version") != INDEX_VERSION or header.get("model") != similarity.EMBED_MODEL:
+            # vectors from another model (or layout) are not comparable with new queries
+            raise RuntimeError("Index at " + self.root + " was built with " + str(header.get("model")) +
+                               " (version " + str(header.get("version")) + "); delete it to rebuild")
+        return header
+
+    # whether merge is indexed from exactly this info (same revisions, settings, page): re-adding it
+    # would only append a copy of the same rows
+    def has_merge(self, merge, info):
+        entry = self.header()["merges"].get(merge)
+        return entry is not None and entry["info"] == info
+
+    # function: add_merge(merge: str, records: list[dict], vectors: np.ndarray, info: dict) -> int
+    # records: paragraph records with "section", "lang", "translated"; vectors: one row per record.
+    # info (revision ids, output page, ...) is stored with the merge; returns the number of rows added
+    def add_merge(self, merge, records, vectors, info=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(records) != len(vectors):
+            raise ValueError("Need one vector per record (" + str(len(records)) + " records, " + str(len(vectors)) + " vectors)")
+        if len(records):
+            # unit length, so search is a plain dot product
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with _locked(self.root):
+            header = self.header() # read under the lock: another process may have appended since
+            if len(records) and header["dim"] is not None and vectors.shape[1] != header["dim"]:
+                raise ValueError("Vector dimension " + str(vectors.shape[1]) + " does not match the index (" + str(header["dim"]) + ")")
+            start = header["count"]
+            meta_bytes = self._meta_end(header)
+            self._truncate(start, header["dim"], meta_bytes)
+            self._sync_codes(header)
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            if len(records):
+                self._append_codes(vectors)
+            lines = "".join(json.dumps({"merge": merge, "section": r["section"], "lang": r["lang"], "text": r["translated"]},
+                                       ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+            with open(self.meta_path, "ab") as f:
+                f.write(lines)
+            if len(records):
+                header["dim"] = int(vectors.shape[1])
+            header["count"] = start + len(records)
+            header["meta_bytes"] = meta_bytes + len(lines)
+            header["merges"][merge] = {"start": start, "end": start + len(records), "info": info or {}}
+            atomic_write_json(self.header_path, header)
+            self._meta = None
+        return len(records)
+
+    # int8 and binary codes of unit-length rows, appended next to the float32 ones; scales go
+    # last, so the rows in scales.f32 are the ones all three code files hold
+    def _append_codes(self, vectors):
+        codes, scales = quantize.quantize_int8(vectors)
+        with open(self.codes_path, "ab") as f:
+            f.write(codes.tobytes())
+        with open(self.bits_path, "ab") as f:
+            f.write(quantize.binary_codes(vectors).tobytes())
+        with open(self.scales_path, "ab") as f:
+            f.write(scales.tobytes())
+
+    # (path, bytes per row) of the binary row files
+    def _row_files(self, dim):
+        dim = dim or 0
+        return {"vectors": (self.vectors_path, dim * 4), "codes": (self.codes_path, dim),
+                "bits": (self.bits_path, (dim + 7) // 8), "scales": (self.scales_path, 4)}
+
+    # cut the given row files down to count rows
+    def _truncate_rows(self, files, count):
+        for path, row_bytes in files:
+            if os.path.exists(path) and os.path.getsize(path) > count * row_bytes:
+                with open(path, "r+b") as f:
+                    f.truncate(count * row_bytes)
+
+    # byte offset in meta.jsonl where the committed rows end; a header written before meta_bytes
+    # existed gets it counted once here (and stored by the next append)
+    def _meta_end(self, header):
+        if "meta_bytes" in header:
+            return header["meta_bytes"]
+        end = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "rb") as f:
+                for _, line in zip(range(header["count"]), f):
+                    end += len(line)
+        return end
+
+    # drop whatever a crashed append left past the last committed row
+    def _truncate(self, count, dim, meta_bytes):
+        if dim is not None or count == 0: # nothing committed yet: everything on disk is left over
+            self._truncate_rows(self._row_files(dim).values(), count)
+        if os.path.exists(self.meta_path) and os.path.getsize(self.meta_path) > meta_bytes:
+            with open(self.meta_path, "r+b") as f:
+                f.truncate(meta_bytes)
+
+    # function: vectors() -> np.ndarray  (count, dim) read-only memory map (empty array if nothing indexed)
+    def vectors(self, header=None):
+        header = header or self.header()
+        if not header["count"]:
+            return np.zeros((0, header["dim"] or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(header["count"], header["dim"]))
+
+    # encode the rows the code files are missing (an index written before they existed); caller holds _locked(root)
+    def _sync_codes(self, header):
+        count, dim = header["count"], header["dim"]
+        have = os.path.getsize(self.scales_path) // 4 if os.path.exists(self.scales_path) else 0
+        if have >= count:
+            return
+        files = self._row_files(dim)
+        self._truncate_rows([files["codes"], files["bits"], files["scales"]], have) # the code files move together
+        vectors = self.vectors(header)
+        for start in range(have, count, SEARCH_BLOCK_ROWS):
+            self._append_codes(np.asarray(vectors[start:min(count, start + SEARCH_BLOCK_ROWS)]))
+
+    # function: codes() -> dict  {"int8": (codes, scales), "binary": bits} read-only memory maps.
+    # An index written before the codes existed gets them encoded from vectors.f32 on first use
+    def codes(self, header=None):
+        header = header or self.header()
+        count, dim = header["count"], header["dim"]
+        if not count:
+            return {"int8": (np.zeros((0, dim or 0), dtype=np.int8), np.zeros(0, dtype=np.float32)),
+                    "binary": np.zeros((0, ((dim or 0) + 7) // 8), dtype=np.uint8)}
+        if not os.path.exists(self.scales_path) or os.path.getsize(self.scales_path) // 4 < count:
+            with _locked(self.root):
+                self._sync_codes(header)
+        return {
+            "int8": (np.memmap(self.codes_path, dtype=np.int8, mode="r", shape=(count, dim)),
+                     np.memmap(self.scales_path, dtype=np.float32, mode="r", shape=(count,))),
+            "binary": np.memmap(self.bits_path, dtype=np.uint8, mode="r", shape=(count, (dim + 7) // 8))
+        }
+
+    def _meta_rows(self, count):
+        if self._meta is None or len(self._meta) < count:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self._meta = [json.loads(line) for _, line in zip(range(count), f)]
+        return self._meta
+
+    def search(self, queries, k=10, exclude_merge=None, method="exact"):
+        """
+        Cosine top-k over every live row, block by block over the memory maps.
+        Input:
+            queries (array-like): (n, dim) query vectors (need not be unit length)
+            k (int): hits per query
+            exclude_merge (str, optional): leave this merge's own rows out
+            method (str): "exact" scans the float32 vectors; "int8" / "binary" scan the compact
+                          codes for k * oversample candidates and re-rank those exactly
+                          (see quantize.QUANTIZE_METHODS), so the scores are exact either way
+        Output:
+            list[list[dict]]: per query, up to k hits {"merge", "section", "lang", "text", "score"},
+                              best first
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        if method not in quantize.QUANTIZE_METHODS:
+            raise ValueError("Unknown search method: " + str(method) + " (expected one of " + ", ".join(quantize.QUANTIZE_METHODS) + ")")
+        header = self.header()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not header["count"] or not len(queries):
+            return [[] for _ in range(len(queries))]
+        queries = quantize.normalise(queries)
+        matrix = self.vectors(header)
+        meta = self._meta_rows(header["count"])
+
+        # rows still live (not superseded by a re-index, not excluded)
+        live = np.zeros(header["count"], dtype=bool)
+        for merge, entry in header["merges"].items():
+            if merge != exclude_merge:
+                live[entry["start"]:entry["end"]] = True
+
+        if method == "exact":
+            best_rows, best_scores = self._scan(queries, header["count"], live, k,
+                                                lambda start, stop: queries @ np.asarray(matrix[start:stop]).T)
+        else:
+            codes = self.codes(header)
+            if method == "int8":
+                int8, scales = codes["int8"]
+                candidates, _ = self._scan(queries, header["count"], live, k * quantize.INT8_OVERSAMPLE,
+                                           lambda start, stop: quantize.int8_scores(queries, np.asarray(int8[start:stop]), scales[start:stop]))
+            else:
+                query_bits = quantize.binary_codes(queries)
+                candidates, _ = self._scan(queries, header["count"], live, k * quantize.BINARY_OVERSAMPLE,
+                                           lambda start, stop: -quantize.hamming(query_bits, np.asarray(codes["binary"][start:stop])).astype(np.float32))
+            # dead rows can only be candidates when there were fewer than needed live ones
+            candidates = [rows[live[rows]] for rows in candidates]
+            best_rows, best_scores = quantize.rerank(queries, matrix, candidates, k)
+
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            hits = []
+            for row, score in zip(rows, scores):
+                if not np.isfinite(score):
+                    continue
+                hit = dict(meta[int(row)])
+                hit["score"] = round(float(score), 3)
+                hits.append(hit)
+            results.append(hits)
+        return results
+
+    # running top-`keep` over blocks of rows: score_block(start, stop) -> (n_queries, stop - start)
+    # scores (higher is better); returns per query the kept rows and scores, best first
+    def _scan(self, queries, count, live, keep, score_block):
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            stop = min(count, start + SEARCH_BLOCK_ROWS)
+            scores = np.asarray(score_block(start, stop), dtype=np.float32)
+            scores[:, ~live[start:stop]] = -np.inf
+            # merge this block's scores with the best so far
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop), (len(queries), stop - start))], axis=1)
+            top = quantize.top_k(scores, keep)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        return best_rows, best_scores
+
+# NLI verdicts of paragraph pairs already judged (bidirectional, so the pair's order doesn't matter)
+# Saving re-reads the file under the index's lock and adds this store's new verdicts, so runs
+# saving at the same time (job workers, the server's merges) keep each other's.
+class VerdictStore:
+    def __init__(self, root=INDEX_DIR):
+        self.root = root
+        self.path = os.path.join(root, "verdicts.json")
+        self.verdicts = read_json(self.path, {})
+        self._lock = threading.Lock()
+        self._new = {} # verdicts put since the last save
+
+    def _key(self, text_a, text_b):
+        a, b = sorted([text_a, text_b])
+        return hashlib.sha256((nli.NLI_MODEL + "\0" + a + "\0" + b).encode("utf-8")).hexdigest()
+
+    def get(self, text_a, text_b):
+        return self.verdicts.get(self._key(text_a, text_b))
+
+    def put(self, text_a, text_b, label):
+        with self._lock:
+            key = self._key(text_a, text_b)
+            self.verdicts[key] = label
+            self._new[key] = label
+
+    def save(self):
+        with self._lock:
+            new, self._new = self._new, {}
+        if not new:
+            return
+        with _locked(self.root):
+            verdicts = read_json(self.path, {}) # what other runs saved since this store was loaded
+            verdicts.update(new)
+            atomic_write_json(self.path, verdicts)
+        with self._lock:
+            self.verdicts.update(verdicts)
+            self.verdicts.update(self._new) # put while saving: still in _new for the next save
+
+# function: index_analysis(index: ParagraphIndex, merge: str, a1: dict, a2: dict, embeddings: tuple, info: dict) -> int
+# add both translated articles' paragraphs (with their embeddings, from similarity.embed_articles)
+def index_analysis(index, merge, a1, a2, embeddings, info=None):
+    records = []
+    vectors = []
+    for article, by_section in zip((a1, a2), embeddings):
+        for section, paragraphs in article.items():
+            for r, v in zip(paragraphs, by_section.get(section, [])):
+                records.append({"section": section, "lang": r["lang"], "translated": r["translated"]})
+                vectors.append(v)
+    return index.add_merge(merge, records, np.asarray(vectors, dtype=np.float32), info)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the paragraph index of earlier merges.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search_parser = sub.add_parser("search", help="which merges contain this claim")
+    search_parser.add_argument("claim")
+    search_parser.add_argument("-k", type=int, default=10)
+    search_parser.add_argument("--method", choices=quantize.QUANTIZE_METHODS, default="exact",
+                               help="scan the float vectors, or the int8 / binary codes and re-rank")
+    sub.add_parser("stats", help="rows and merges in the index")
+    args = parser.parse_args()
+
+    paragraph_index = ParagraphIndex()
+    if args.command == "stats":
+        header = paragraph_index.header()
+        print(str(header["count"]) + " rows, " + str(len(header["merges"])) + " merges, model " + header["model"])
+    else:
+        for hit in paragraph_index.search(similarity.embed([args.claim]), k=args.k, method=args.method)[0]:
+            print("%.3f  %s  [%s] %s" % (hit["score"], hit["merge"], hit["section"], hit["text"][:100]))
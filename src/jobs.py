@@ -0,0 +1,312 @@
+# merge job queue: run_pipeline configs submitted to a broker and pulled by any number of worker
+# processes. Throughput scales with the workers.
+#   job id       derived from the run config (URL pair, output, settings): submitting the same
+#                merge twice gives the same job instead of a second run
+#   lease        a claimed job is invisible to other workers until its lease runs out; a running
+#                worker keeps extending it (heartbeat). A worker that crashes stops doing so, and
+#                once the lease expires the job is handed to the next worker that asks
+#   retries      a failed or abandoned job is queued again (after RETRY_DELAY_SECONDS per attempt
+#                so far) until max_attempts; bad input (article.InvalidInput, e.g. an unknown article)
+#                fails at once, since retrying won't fix it
+# Broker is the interface; SQLiteBroker keeps the queue in one SQLite file in WAL mode, which
+# needs shared memory between its users: the workers must all run on the host that has the file
+# (WAL doesn't work over a network filesystem). Workers on several machines need another backend,
+# which only has to implement Broker's methods.
+# run from project root:
+#   python -m src.jobs submit https://es.wikipedia.org/wiki/Gato https://fr.wikipedia.org/wiki/Chat "Cat (Merged)"
+#   python -m src.jobs work --processes 4
+#   python -m src.jobs status
+
+# imports
+import os, sys, abc, json, time, uuid, socket, hashlib, sqlite3, threading, argparse, multiprocessing
+from src.article import InvalidInput
+from src.translate import LazyTranslator
+
+JOBS_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "jobs.sqlite")
+LEASE_SECONDS = 300 # how long a claimed job stays invisible without a heartbeat
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 30
+POLL_SECONDS = 2.0 # idle workers ask for work this often
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+# function: job_id(config: dict) -> str
+# the same merge (URLs, output and every setting) always gets the same id
+def job_id(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+
+# function: worker_name() -> str  (unique per process: host, pid and a random suffix)
+def worker_name():
+    return socket.gethostname() + ":" + str(os.getpid()) + ":" + uuid.uuid4().hex[:6]
+
+# the interface every broker implements; jobs are dicts {"id", "config", "state", "attempts",
+# "max_attempts", "worker", "lease_until", "result", "error"}
+class Broker(abc.ABC):
+    # queue a job (or return the existing one's id); force re-queues a finished or failed job
+    @abc.abstractmethod
+    def submit(self, config, force=False):
+        ...
+
+    # function: claim(worker: str, lease_seconds: float) -> dict | None  (the next job, leased to worker)
+    @abc.abstractmethod
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        ...
+
+    # extend the lease; False if the job is no longer this worker's (its lease expired and it was re-claimed)
+    @abc.abstractmethod
+    def heartbeat(self, job, worker, lease_seconds=LEASE_SECONDS):
+        ...
+
+    @abc.abstractmethod
+    def complete(self, job, worker, result):
+        ...
+
+    # record a failure: queued again while attempts remain (and retry is True), else failed
+    @abc.abstractmethod
+    def fail(self, job, worker, error, retry=True):
+        ...
+
+    # function: get(job: str) -> dict | None
+    @abc.abstractmethod
+    def get(self, job):
+        ...
+
+    # function: counts() -> dict[str, int]  (jobs per state)
+    @abc.abstractmethod
+    def counts(self):
+        ...
+
+class SQLiteBroker(Broker):
+    def __init__(self, path=JOBS_DB, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL") # readers (status) don't block the workers' writes; local disk only
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, config TEXT NOT NULL, state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,
+                worker TEXT, lease_until REAL, available_at REAL NOT NULL,
+                result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, available_at)")
+
+    # one connection per call: safe from any thread or process; the writes that pick or change
+    # a job run inside BEGIN IMMEDIATE, so two workers can never claim the same job
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Connection(db)
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["config"] = json.loads(job["config"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        del job["available_at"], job["created"], job["updated"]
+        return job
+
+    def submit(self, config, force=False):
+        job = job_id(config)
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT OR IGNORE INTO jobs (id, config, state, max_attempts, available_at, created, updated) "
+                       "VALUES (?, ?, 'queued', ?, ?, ?, ?)", (job, json.dumps(config), self.max_attempts, now, now, now))
+            if force:
+                db.execute("UPDATE jobs SET state = 'queued', attempts = 0, worker = NULL, lease_until = NULL, "
+                           "available_at = ?, error = NULL, updated = ? WHERE id = ? AND state IN ('done', 'failed')",
+                           (now, now, job))
+            db.execute("COMMIT")
+        return job
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            # abandoned jobs (lease ran out) that used up their attempts fail instead of running again
+            db.execute("UPDATE jobs SET state = 'failed', error = 'lease expired on the last attempt (worker lost)', "
+                       "worker = NULL, updated = ? WHERE state = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                       (now, now))
+            row = db.execute("SELECT id FROM jobs WHERE (state = 'queued' AND available_at <= ?) "
+                             "OR (state = 'running' AND lease_until < ?) ORDER BY created LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE jobs SET state = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                       "updated = ? WHERE id = ?", (worker, now + lease_seconds, now, row["id"]))
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            db.execute("COMMIT")
+        return self._row(job)
+
+    def heartbeat(self, job, worker, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        with self._connect() as db:
+            changed = db.execute("UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                                 (now + lease_seconds, now, job, worker)).rowcount
+        return changed == 1
+
+    def complete(self, job, worker, result):
+        now = time.time()
+        with self._connect() as db:
+            changed = db.execute("UPDATE jobs SET state = 'done', result = ?, error = NULL, lease_until = NULL, updated = ? "
+                                 "WHERE id = ? AND worker = ? AND state = 'running'",
+                                 (json.dumps(result), now, job, worker)).rowcount
+        return changed == 1
+
+    def fail(self, job, worker, error, retry=True):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND state = 'running'",
+                             (job, worker)).fetchone()
+            if row is None: # lease lost: the job is someone else's now
+                db.execute("COMMIT")
+                return False
+            if retry and row["attempts"] < row["max_attempts"]:
+                db.execute("UPDATE jobs SET state = 'queued', worker = NULL, lease_until = NULL, available_at = ?, "
+                           "error = ?, updated = ? WHERE id = ?", (now + self.retry_delay * row["attempts"], error, now, job))
+            else:
+                db.execute("UPDATE jobs SET state = 'failed', lease_until = NULL, error = ?, updated = ? WHERE id = ?",
+                           (error, now, job))
+            db.execute("COMMIT")
+        return True
+
+    def get(self, job):
+        with self._connect() as db:
+            return self._row(db.execute("SELECT * FROM jobs WHERE id = ?", (job,)).fetchone())
+
+    def counts(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+# sqlite3's own context manager only ends a transaction; this one also closes the connection
+class _Connection:
+    def __init__(self, db):
+        self.db = db
+    def __enter__(self):
+        return self.db
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+        self.db.close()
+
+# keeps extending a job's lease while the pipeline runs (on its own thread)
+class _Heartbeat(threading.Thread):
+    def __init__(self, broker, job, worker, lease_seconds):
+        super().__init__(daemon=True)
+        self.broker, self.job, self.worker, self.lease_seconds = broker, job, worker, lease_seconds
+        self.stopped = threading.Event()
+        self.lost = False # the lease expired anyway (e.g. the process was suspended) and another worker took over
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            if not self.broker.heartbeat(self.job, self.worker, self.lease_seconds):
+                self.lost = True
+                return
+
+def run_worker(broker, worker=None, lease_seconds=LEASE_SECONDS, poll_seconds=POLL_SECONDS, max_jobs=None,
+               stop_when_idle=False, run=None):
+    """
+    Pull jobs from the broker and run them, one at a time, until stopped. A job whose lease runs
+    out while it runs (see _Heartbeat) is stopped at its next stage and left to the worker that
+    took it over: it is neither completed nor failed here, nor counted.
+    Input:
+        broker (Broker): where the jobs come from
+        worker (str, optional): this worker's name (default: worker_name())
+        lease_seconds, poll_seconds (float): see LEASE_SECONDS, POLL_SECONDS
+        max_jobs (int, optional): stop after this many jobs
+        stop_when_idle (bool): stop as soon as the queue has nothing ready
+        run (callable, optional): (config, translator, cancelled=...) -> metrics; defaults to
+                                  pipeline.run_pipeline
+    Output:
+        int: jobs this worker finished (done or failed)
+    """
+    if run is None:
+        from src.pipeline import run_pipeline # heavy import (torch, models), only in processes that run jobs
+        run = run_pipeline
+    worker = worker or worker_name()
+    translators = {} # one per backend setup, reused across jobs so its cache stays warm (as in server.py)
+    finished = 0
+    while max_jobs is None or finished < max_jobs:
+        job = broker.claim(worker, lease_seconds)
+        if job is None:
+            if stop_when_idle:
+                break
+            time.sleep(poll_seconds)
+            continue
+        config = job["config"]
+        backend = (config.get("translation_backend", "deepl"), bool(config.get("sentence_memory")))
+        heartbeat = _Heartbeat(broker, job["id"], worker, lease_seconds)
+        heartbeat.start()
+        try:
+            if backend not in translators:
+                translators[backend] = LazyTranslator(*backend) # built on first use: English-only jobs need no key
+            # the run stops at its next stage once the lease is lost: the job's new owner writes the same outfile
+            result = run(config, translators[backend], cancelled=lambda: heartbeat.lost)
+        except Exception as e:
+            if not heartbeat.lost:
+                if isinstance(e, InvalidInput): # bad input: the same config fails the same way every time
+                    broker.fail(job["id"], worker, str(e), retry=False)
+                else:
+                    broker.fail(job["id"], worker, type(e).__name__ + ": " + str(e))
+        else:
+            if not heartbeat.lost and not broker.complete(job["id"], worker, result):
+                heartbeat.lost = True # expired after the last heartbeat and already claimed again
+        finally:
+            heartbeat.stopped.set()
+        if heartbeat.lost:
+            print("Lost the lease on job " + job["id"] + " to another worker: dropped its run here", file=sys.stderr)
+            continue # the job is the other worker's to finish
+        finished += 1
+    return finished
+
+# worker process entry point (spawned: each process loads its own models)
+def _worker_process(path, workers, lease_seconds):
+    os.environ["WIKIMERGE_WORKERS"] = str(workers) # split the cores between the worker processes
+    run_worker(SQLiteBroker(path), lease_seconds=lease_seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue merges and run them on worker processes.")
+    parser.add_argument("--db", default=JOBS_DB, help="SQLite queue file (default: " + JOBS_DB + ")")
+    sub = parser.add_subparsers(dest="command", required=True)
+    submit_parser = sub.add_parser("submit", help="queue a merge")
+    submit_parser.add_argument("url1")
+    submit_parser.add_argument("url2")
+    submit_parser.add_argument("title_out")
+    submit_parser.add_argument("--config", default="{}", help="extra run_pipeline settings as JSON")
+    submit_parser.add_argument("--force", action="store_true", help="run it again even if it already finished")
+    work_parser = sub.add_parser("work", help="run worker processes until interrupted")
+    work_parser.add_argument("--processes", type=int, default=1)
+    work_parser.add_argument("--lease", type=float, default=LEASE_SECONDS)
+    status_parser = sub.add_parser("status", help="jobs per state, or one job")
+    status_parser.add_argument("job", nargs="?")
+    args = parser.parse_args()
+
+    queue = SQLiteBroker(args.db)
+    if args.command == "submit":
+        from src.render import slugify
+        job_config = {"url1": args.url1, "url2": args.url2, "title_out": args.title_out,
+                      "outfile": slugify(args.title_out) + ".html"}
+        job_config.update(json.loads(args.config))
+        print(queue.submit(job_config, force=args.force))
+    elif args.command == "work":
+        if args.processes <= 1:
+            run_worker(queue, lease_seconds=args.lease)
+        else:
+            # spawn, not fork: see analysis.analyze_articles
+            context = multiprocessing.get_context("spawn")
+            processes = [context.Process(target=_worker_process, args=(args.db, args.processes, args.lease))
+                         for _ in range(args.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+    elif args.job:
+        print(json.dumps(queue.get(args.job), indent=2))
+    else:
+        print(json.dumps(queue.counts()))
@@ -0,0 +1,79 @@
+# local, offline translation backend: MarianMT (Helsinki-NLP opus-mt) models run batched
+# on this machine's CPU through transformers (already installed with sentence-transformers).
+# No API key, no network after the first model download, no quota -- meant for bulk offline
+# runs; DeepL (translate.DeepLTranslator) stays the better choice for quality-sensitive pages.
+
+# imports
+from src import metrics, runtime, models
+from src.translate import Translator, split_with_separators, join_sentences
+
+# one model per language pair, e.g. Helsinki-NLP/opus-mt-es-en
+LOCAL_MODEL_TEMPLATE = "Helsinki-NLP/opus-mt-{src}-{tgt}"
+
+# many-to-English model for source languages without a dedicated pair model
+FALLBACK_MODEL = "Helsinki-NLP/opus-mt-mul-en"
+
+# Marian's input limit; paragraphs are translated sentence by sentence so this rarely bites
+MAX_INPUT_TOKENS = 512
+
+# function: _load_model(name: str, tgt: str) -> tuple[MarianTokenizer, MarianMTModel]
+def _load_model(name, tgt):
+    from transformers import MarianMTModel, MarianTokenizer # heavy import, only when first needed
+    runtime.apply()
+    try:
+        tokenizer = MarianTokenizer.from_pretrained(name)
+        model = MarianMTModel.from_pretrained(name)
+    except OSError:
+        # no dedicated model for this pair on the hub
+        if tgt != "en":
+            raise ValueError("No local translation model for " + name)
+        tokenizer = MarianTokenizer.from_pretrained(FALLBACK_MODEL)
+        model = MarianMTModel.from_pretrained(FALLBACK_MODEL)
+    model.eval()
+    return tokenizer, model
+
+class LocalTranslator(Translator):
+    backend = "local"
+
+    # initialiser (batch_size: sentences per generate() call; defaults to runtime's predict_batch_size)
+    def __init__(self, batch_size=None):
+        self._init_cache("translations-local.json") # kept apart from DeepL's translations
+        self.batch_size = batch_size
+
+    # registry name of a language pair's model, registered on first use (models.py loads it once,
+    # and may unload an idle pair under a memory budget)
+    def _model_name(self, source_lang, target_lang):
+        src = source_lang.lower()
+        tgt = target_lang.split("-")[0].lower() # EN-GB -> en (opus-mt models have no regional variants)
+        name = LOCAL_MODEL_TEMPLATE.format(src=src, tgt=tgt)
+        models.register(name, lambda: _load_model(name, tgt), metric="local_translation_model_load_seconds")
+        return name
+
+    def _translate_missing(self, texts, source_lang, target_lang):
+        import torch
+        name = self._model_name(source_lang, target_lang)
+        batch_size = self.batch_size or runtime.settings()["predict_batch_size"]
+
+        # sentences are Marian's unit (and keep inputs under its token limit); each unique
+        # sentence is translated once, shortest first so every batch pads to similar lengths
+        split = [split_with_separators(t) for t in texts]
+        unique = sorted({sentence for sentences, _ in split for sentence in sentences}, key=len)
+        metrics.incr("local_translation_sentences", len(unique))
+
+        translated = {}
+        with models.in_use(name): # not unloaded mid-run
+            tokenizer, model = models.get(name)
+            for pos in range(0, len(unique), batch_size):
+                chunk = unique[pos:pos + batch_size]
+                inputs = tokenizer(chunk, return_tensors="pt", padding=True, truncation=True, max_length=MAX_INPUT_TOKENS)
+                with torch.inference_mode(), metrics.span("local_translation"):
+                    generated = model.generate(**inputs, max_new_tokens=MAX_INPUT_TOKENS)
+                translated.update(zip(chunk, tokenizer.batch_decode(generated, skip_special_tokens=True)))
+
+        return [join_sentences([translated[sentence] for sentence in sentences], separators, target_lang)
+                for sentences, separators in split]
+
+# testing (run from project root: python -m src.local_translate)
+if __name__ == "__main__":
+    translator = LocalTranslator()
+    print(translator.translate_batch(["Hola mundo. Este es un artículo de prueba."], "es", "EN-GB"))
@@ -1,6 +1,9 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
 from src import similarity
 
 SECTION_MATCH_THRESHOLD = 0.5 # cosine threshold for treating two section titles as the same section (embedding similarity; tune on real runs)
+CONTENT_WEIGHT = 0.5 # share of the section match score taken from content (vs. title) similarity, when paragraph embeddings are given
 
 # trailing "appendix" sections (in English) in canonical Wikipedia order;
 # these are pulled out of the fractional ordering and always placed last, in this order
@@ -27,13 +30,13 @@ APPENDIX_ORDER = [
 #   Output: dict title -> index into APPENDIX_ORDER of its closest canonical appendix name
 #           (that index doubles as the sort rank), or None if nothing clears the threshold
 #           (meaning "this is a normal content section, not an appendix")
-def _appendix_matches(titles):
+def _appendix_matches(titles, matrix=None):
     # nothing to classify -> empty map (also avoids calling the model with an empty list)
     if not titles:
         return {}
 
     # sim[i][k] = cosine similarity between titles[i] and APPENDIX_ORDER[k].
-    sim = similarity.similarity_matrix(titles, APPENDIX_ORDER)
+    sim = (matrix or similarity.similarity_matrix)(titles, APPENDIX_ORDER)
 
     # for each title (row i), find the column of its single most-similar appendix name
     best_idx = sim.argmax(dim=1) # best_idx[i] = index k of the best appendix match for titles[i]
@@ -48,11 +51,39 @@ def _appendix_matches(titles):
         for i, title in enumerate(titles)
     }
 
-def pair_sections(a1, a2):
+# mean-pooled, unit-length content vector per section
+#   Input:  vectors (dict section -> (n_paragraphs, dim) array), sections (list[str])
+#   Output: (n_sections, dim) array, and a bool mask of which sections have any paragraphs
+#           (None, None if no section has any)
+def _pooled(vectors, sections):
+    dim = next((v.shape[1] for v in vectors.values() if len(v)), None)
+    if dim is None:
+        return None, None
+    pooled = np.zeros((len(sections), dim))
+    has_content = np.zeros(len(sections), dtype=bool)
+    for i, section in enumerate(sections):
+        v = vectors.get(section)
+        if v is not None and len(v):
+            v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+            mean = v.mean(axis=0)
+            pooled[i] = mean / max(np.linalg.norm(mean), 1e-12)
+            has_content[i] = True
+    return pooled, has_content
+
+def pair_sections(a1, a2, embeddings=None, matrix=None):
     """
-    Pair up sections across two articles by title similarity (shared by merge and analysis).
+    Pair up sections across two articles by title similarity (shared by merge and analysis),
+    blended with content similarity when paragraph embeddings are given.
     Input:
         a1, a2 (dict): articles (section -> list of paragraph records)
+        embeddings (tuple, optional): (vectors1, vectors2) from similarity.embed_articles([a1, a2]);
+                                      when given, each section pair scores
+                                      (1 - CONTENT_WEIGHT) * title cosine + CONTENT_WEIGHT * cosine of the
+                                      sections' mean-pooled paragraph vectors, so sections whose
+                                      translated titles differ ("Biology" / "Characteristics") still
+                                      pair up when they say the same things
+        matrix (callable, optional): title similarity function, default similarity.similarity_matrix
+                                     (similarity.multilingual_similarity_matrix for untranslated titles)
     Output:
         list of (title, a1_key, a2_key): content sections ordered by their average
         fractional position in the source articles, then appendix sections (See also,
@@ -63,19 +94,27 @@ def pair_sections(a1, a2):
     a1_sections = [s for s in a1.keys() if s != "Lead"]
     a2_sections = [s for s in a2.keys() if s != "Lead"]
 
-    # --- match sections across the two articles by title similarity using MUTUAL best match
+    # --- match sections across the two articles by title (+ content) similarity: one-to-one
+    # assignment maximising the total score, then pairs below the threshold are dropped
 
     a2_to_a1 = {a2_sec: None for a2_sec in a2_sections} # a2 section title -> the a1 title it pairs with (None = unmatched)
     if a1_sections and a2_sections: # similarity_matrix needs both sides non-empty
-        sim = similarity.similarity_matrix(a1_sections, a2_sections)
-        best_j_for_i = sim.argmax(dim=1) # best_j_for_i[i] = index of the a2 section most similar to a1 section i
-        best_i_for_j = sim.argmax(dim=0) # best_i_for_j[j] = index of the a1 section most similar to a2 section j
-        for i in range(len(a1_sections)):
-            j = int(best_j_for_i[i]) # a1 section i's favourite a2 section is j
-            # pair them only if a2 section j's favourite is also a1 section i (mutual)
-            # AND if the similarity is high enough
-            if int(best_i_for_j[j]) == i and float(sim[i][j]) >= SECTION_MATCH_THRESHOLD:
-                a2_to_a1[a2_sections[j]] = a1_sections[i]
+        score = np.asarray((matrix or similarity.similarity_matrix)(a1_sections, a2_sections), dtype=float)
+
+        # blend in content similarity where both sections have paragraphs (title only otherwise)
+        if embeddings is not None:
+            pooled1, has1 = _pooled(embeddings[0], a1_sections)
+            pooled2, has2 = _pooled(embeddings[1], a2_sections)
+            if pooled1 is not None and pooled2 is not None:
+                content = pooled1 @ pooled2.T
+                both = has1[:, None] & has2[None, :]
+                score = np.where(both, (1 - CONTENT_WEIGHT) * score + CONTENT_WEIGHT * content, score)
+
+        # unlike a mutual-best rule, a section whose favourite is taken still gets its next best partner
+        rows, cols = linear_sum_assignment(score, maximize=True)
+        for i, j in zip(rows, cols):
+            if score[i, j] >= SECTION_MATCH_THRESHOLD:
+                a2_to_a1[a2_sections[int(j)]] = a1_sections[int(i)]
 
     # invert the mapping so we can look up "which a2 section did this a1 section pair with?" directly
     a1_to_a2 = {a1_sec: a2_sec for a2_sec, a1_sec in a2_to_a1.items() if a1_sec is not None}
@@ -88,10 +127,19 @@ def pair_sections(a1, a2):
     # every a1 section, tagged with the a2 section it matched (or None if it matched nothing)
     for a1_sec in a1_sections:
         pairs.append((a1_sec, a1_sec, a1_to_a2.get(a1_sec)))
-    # a2 sections that matched no a1 section appear on their own (a1_key = None)
+    # a2 sections that matched no a1 section appear on their own (a1_key = None). The analysis,
+    # checkpoints and render key sections by title, so one whose title an a1 section already uses
+    # (a1 "History" paired with a2 "Historical background", a2 "History" left over) gets " (2)",
+    # " (3)", ... like translate_article does, instead of overwriting it
+    taken = {title for title, _, _ in pairs}
     for a2_sec in a2_sections:
         if a2_to_a1[a2_sec] is None:
-            pairs.append((a2_sec, None, a2_sec))
+            title, n = a2_sec, 1
+            while title in taken:
+                n += 1
+                title = a2_sec + " (" + str(n) + ")"
+            taken.add(title)
+            pairs.append((title, None, a2_sec))
 
     # --- ordering: content by fractional position, appendices pinned last
     a1_index = {title: i for i, title in enumerate(a1.keys())} # section title -> its absolute position in a1
@@ -106,7 +154,7 @@ def pair_sections(a1, a2):
         return sum(fracs) / len(fracs) # average across the editions that have this section
 
     # find sections which are appendices
-    appendix_matches = _appendix_matches([p[0] for p in pairs]) # title -> canonical appendix rank, or None
+    appendix_matches = _appendix_matches([p[0] for p in pairs], matrix) # title -> canonical appendix rank, or None
     
     # split into content vs appendix sections, then sort each group
     content = [p for p in pairs if appendix_matches[p[0]] is None]
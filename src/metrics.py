@@ -0,0 +1,112 @@
+# per-run instrumentation: stage spans, counters (API requests, characters sent, cache
+# hits/misses, texts embedded, NLI pairs) and one-off values (model load times).
+# Instrumented code calls the module-level span/incr/set_value helpers, which record into
+# whichever Metrics is active for the current context (see collect) and are no-ops otherwise,
+# so the stages stay usable on their own without threading a metrics object through every call.
+
+# imports
+import json, time, threading, contextvars
+from contextlib import contextmanager
+
+# collects one run's measurements (thread-safe: sections may be analysed on worker threads)
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {} # stage name -> {"count": int, "seconds": float}
+        self.counters = {} # counter name -> int
+        self.values = {} # value name -> float (last write wins)
+
+    # time a block of work under a stage name (repeated spans of the same name accumulate)
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                s = self.spans.setdefault(name, {"count": 0, "seconds": 0.0})
+                s["count"] += 1
+                s["seconds"] += elapsed
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_value(self, name, value):
+        with self._lock:
+            self.values[name] = value
+
+    # plain-dict snapshot (what run_pipeline returns), with the derived cache hit ratio
+    def as_dict(self):
+        with self._lock:
+            spans = {k: {"count": v["count"], "seconds": round(v["seconds"], 6)} for k, v in self.spans.items()}
+            counters = dict(self.counters)
+            values = dict(self.values)
+        lookups = counters.get("translation_cache_hits", 0) + counters.get("translation_cache_misses", 0)
+        if lookups:
+            values["translation_cache_hit_ratio"] = round(counters.get("translation_cache_hits", 0) / lookups, 4)
+        return {"spans": spans, "counters": counters, "values": values}
+
+# the Metrics active for the current context (None -> the helpers below do nothing)
+_current = contextvars.ContextVar("wikimerge_metrics", default=None)
+
+# make a fresh Metrics active for the duration of the block
+@contextmanager
+def collect():
+    metrics = Metrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+# function: current() -> Metrics | None
+def current():
+    return _current.get()
+
+@contextmanager
+def span(name):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.span(name):
+        yield
+
+def incr(name, n=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.incr(name, n)
+
+def set_value(name, value):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.set_value(name, value)
+
+# function: to_prometheus(metrics: dict, prefix: str) -> str
+# Prometheus text exposition format for a metrics dict (as returned by Metrics.as_dict)
+def to_prometheus(metrics, prefix="wikimerge_"):
+    lines = [
+        "# TYPE " + prefix + "stage_seconds gauge",
+        "# TYPE " + prefix + "stage_count gauge"
+    ]
+    for stage, s in metrics["spans"].items():
+        lines.append(prefix + 'stage_seconds{stage="' + stage + '"} ' + repr(s["seconds"]))
+        lines.append(prefix + 'stage_count{stage="' + stage + '"} ' + str(s["count"]))
+    for name, n in metrics["counters"].items():
+        lines.append("# TYPE " + prefix + name + "_total counter")
+        lines.append(prefix + name + "_total " + str(n))
+    for name, v in metrics["values"].items():
+        lines.append("# TYPE " + prefix + name + " gauge")
+        lines.append(prefix + name + " " + repr(v))
+    return "\n".join(lines) + "\n"
+
+# function: dump(metrics: dict, path: str) -> None
+# ".prom"/".txt" -> Prometheus text, anything else -> JSON
+def dump(metrics, path):
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith((".prom", ".txt")):
+            f.write(to_prometheus(metrics))
+        else:
+            json.dump(metrics, f, indent=2)
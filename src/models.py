@@ -0,0 +1,162 @@
+# process-wide registry of loaded models (embedding, NLI, local translation). Replaces the
+# unguarded module-level singletons: each model is loaded at most once even when several
+# threads ask for it at the same moment, and a memory budget (WIKIMERGE_MODEL_MEMORY_MB) unloads
+# the least recently used models that no thread is currently running.
+#   register(name, loader)      how to load a model (nothing is loaded yet)
+#   get(name)                   the model, loaded on first use
+#   in_use(name)                context manager around inference: a model in use is never unloaded
+#   stats()                     per model: loaded?, load seconds, resident bytes, loads, users
+# Forked worker processes start with fresh locks and no users (see _after_fork); spawned ones
+# start empty and load what they need.
+
+# imports
+import os, time, threading
+from contextlib import contextmanager
+from src import metrics
+
+# memory budget for all loaded models together (unset = no limit)
+MEMORY_BUDGET_ENV = "WIKIMERGE_MODEL_MEMORY_MB"
+
+# function: model_bytes(model) -> int
+# resident size of a model's weights: torch parameters and buffers, found on the model itself,
+# on its .model (CrossEncoder) or on the members of a (tokenizer, model) tuple; 0 if none
+def model_bytes(model):
+    if isinstance(model, (tuple, list)):
+        return sum(model_bytes(m) for m in model)
+    module = model if hasattr(model, "parameters") else getattr(model, "model", None)
+    if module is None or not hasattr(module, "parameters"):
+        return 0
+    tensors = list(module.parameters()) + (list(module.buffers()) if hasattr(module, "buffers") else [])
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+def _budget_from_env():
+    value = os.getenv(MEMORY_BUDGET_ENV)
+    return int(float(value) * 1024 * 1024) if value else None
+
+class _Entry:
+    def __init__(self, loader, metric):
+        self.loader = loader
+        self.metric = metric # metrics value name for the load time (e.g. "embed_model_load_seconds")
+        self.model = None
+        self.lock = threading.Lock() # held while loading, so concurrent first calls load once
+        self.users = 0 # threads currently running this model
+        self.last_used = 0.0
+        self.load_seconds = None
+        self.bytes = 0
+        self.loads = 0
+
+class ModelRegistry:
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes
+        self._entries = {}
+        self._lock = threading.Lock() # guards _entries and the users / last_used bookkeeping
+
+    def register(self, name, loader, metric=None):
+        """
+        Input:
+            name (str): registry key (usually the model's hub name)
+            loader (callable): () -> loaded model
+            metric (str, optional): metrics value to record the load time under
+        Re-registering a name that is already registered keeps the existing entry (and model).
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(loader, metric)
+
+    def _entry(self, name):
+        with self._lock:
+            if name not in self._entries:
+                raise ValueError("Unknown model: " + str(name))
+            return self._entries[name]
+
+    # function: get(name: str) -> model
+    def get(self, name):
+        entry = self._entry(name)
+        if entry.model is None:
+            with entry.lock:
+                if entry.model is None: # another thread may have loaded it while we waited
+                    start = time.perf_counter()
+                    model = entry.loader()
+                    entry.load_seconds = round(time.perf_counter() - start, 3)
+                    entry.bytes = model_bytes(model)
+                    entry.loads += 1
+                    entry.model = model
+                    if entry.metric:
+                        metrics.set_value(entry.metric, entry.load_seconds)
+                    self._enforce_budget(keep=name)
+        with self._lock:
+            entry.last_used = time.monotonic()
+        return entry.model
+
+    @contextmanager
+    def in_use(self, name):
+        entry = self._entry(name)
+        with self._lock:
+            entry.users += 1
+            entry.last_used = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                entry.users -= 1
+
+    # drop a model (it is loaded again on next use); refuses while a thread is running it
+    def unload(self, name):
+        entry = self._entry(name)
+        with self._lock:
+            if entry.users:
+                return False
+            entry.model = None
+            return True
+
+    # unload least recently used idle models until the loaded ones fit the budget
+    def _enforce_budget(self, keep=None):
+        if self.budget_bytes is None:
+            return
+        with self._lock:
+            loaded = [(e.last_used, name, e) for name, e in self._entries.items() if e.model is not None]
+            total = sum(e.bytes for _, _, e in loaded)
+            for _, name, e in sorted(loaded, key=lambda item: item[0]):
+                if total <= self.budget_bytes:
+                    break
+                if name == keep or e.users:
+                    continue # the model just asked for, or one mid-inference, stays
+                e.model = None
+                total -= e.bytes
+                metrics.incr("models_unloaded")
+
+    # function: stats() -> dict[str, dict]
+    def stats(self):
+        with self._lock:
+            return {
+                name: {"loaded": e.model is not None, "load_seconds": e.load_seconds, "bytes": e.bytes,
+                       "loads": e.loads, "users": e.users}
+                for name, e in self._entries.items()
+            }
+
+    # a forked child inherits the parent's locks in whatever state they were; give it fresh ones
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        for e in self._entries.values():
+            e.lock = threading.Lock()
+            e.users = 0
+
+# the process-wide registry and module-level shortcuts to it
+registry = ModelRegistry(_budget_from_env())
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry._after_fork)
+
+def register(name, loader, metric=None):
+    registry.register(name, loader, metric)
+
+def get(name):
+    return registry.get(name)
+
+def in_use(name):
+    return registry.in_use(name)
+
+def unload(name):
+    return registry.unload(name)
+
+def stats():
+    return registry.stats()
@@ -0,0 +1,154 @@
+# translation-independent analysis: sections and paragraphs are aligned on the ORIGINAL text
+# with a multilingual embedding model, so the analysis no longer waits for translation. The full
+# translation (only needed for display) runs on background threads meanwhile; NLI, an English
+# model, gets just the candidate pairs, translated on demand through the same translator (and
+# cache). Both paths share one future per text, so a paragraph is never sent twice (and billed
+# twice) when the display pass and NLI ask for it at the same time. The result has the same shape
+# as analyze_articles on translated articles.
+
+# imports
+import threading, contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+from src import similarity, metrics
+from src.merge import pair_sections
+from src.analysis import analyze_articles
+from src.translate import translate_texts, untranslated_article, is_target_language, DEEPL_MAX_TEXTS
+
+# per-text translation futures of one run: the first caller to ask for a text translates it, any
+# other caller waits for that result instead of sending the text again
+class _SharedTranslations:
+    def __init__(self, translator):
+        self.translator = translator
+        self._futures = {} # (lang, text) -> Future of its English text
+        self._lock = threading.Lock()
+
+    # function: translate(texts: list[str], lang: str) -> list[str]  (English, in order)
+    def translate(self, texts, lang):
+        lang = self.translator.normalise_lang_code(lang) # records say "ES", callers "es"
+        claimed = []
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                if (lang, text) not in self._futures:
+                    self._futures[(lang, text)] = Future()
+                    claimed.append(text)
+        metrics.incr("translation_shared_waits", len(set(texts)) - len(claimed))
+        if claimed:
+            try:
+                translated = translate_texts(claimed, lang, self.translator)
+            except BaseException as e:
+                for text in claimed:
+                    self._futures[(lang, text)].set_exception(e)
+                raise
+            for text, english in zip(claimed, translated):
+                self._futures[(lang, text)].set_result(english)
+        return [self._futures[(lang, text)].result() for text in texts]
+
+# every section title, subsection heading and paragraph of same-language articles, translated in
+# chunks (so texts NLI asks for meanwhile are not stuck behind the whole article); returns
+# original -> English (the translator's cache is saved once at the end)
+def _translate_all(articles, lang, shared):
+    texts = []
+    for article in articles:
+        texts.extend(s for s in article if s != "Lead")
+        for records in article.values():
+            for r in records:
+                texts.append(r["original"])
+                if r["heading"]:
+                    texts.append(r["heading"])
+    if is_target_language(lang, shared.translator):
+        return {t: t for t in texts}
+    texts = list(dict.fromkeys(texts))
+    try:
+        with metrics.span("translate_background"):
+            translated = []
+            for pos in range(0, len(texts), DEEPL_MAX_TEXTS):
+                translated.extend(shared.translate(texts[pos:pos + DEEPL_MAX_TEXTS], lang))
+            return dict(zip(texts, translated))
+    finally:
+        shared.translator.save_cache()
+
+# every paragraph record in an analysis, with the language of the article it came from
+def _records(analysis, lang1, lang2):
+    for buckets in analysis.values():
+        for label in ("agree", "contradict", "neutral"):
+            for pair in buckets.get(label, []):
+                yield pair["a1"], lang1
+                yield pair["a2"], lang2
+        for record in buckets.get("unique_a1", []):
+            yield record, lang1
+        for record in buckets.get("unique_a2", []):
+            yield record, lang2
+
+def analyse_original(a1, lang1, a2, lang2, translator, mode="paragraph", workers=1, verdicts=None, tier="full", budget=None,
+                     deadline=None, checkpoint=None):
+    """
+    Input:
+        a1, a2 (dict): fetched (untranslated) articles, section -> list of {"heading", "text"}
+        lang1, lang2 (str): their language codes
+        translator (Translator): used for the display translation and the on-demand NLI text
+        mode, workers, verdicts, tier, budget, deadline, checkpoint: as in analyze_articles (thread
+                                     pool only); checkpointed sections hold the original text and
+                                     get their display translation like the rest
+    Output:
+        dict: translated section title -> analysis buckets, exactly like analyze_articles on
+              translate_article's output
+    """
+    r1 = untranslated_article(a1, lang1)
+    r2 = untranslated_article(a2, lang2)
+
+    # display translation in the background (one pass per source language), in copies of this
+    # context so its API calls still count towards this run's metrics
+    shared = _SharedTranslations(translator)
+    background = ThreadPoolExecutor(max_workers=2)
+    try:
+        if lang1 == lang2:
+            futures = {lang1: background.submit(contextvars.copy_context().run, _translate_all, [r1, r2], lang1, shared)}
+        else:
+            futures = {
+                lang1: background.submit(contextvars.copy_context().run, _translate_all, [r1], lang1, shared),
+                lang2: background.submit(contextvars.copy_context().run, _translate_all, [r2], lang2, shared)
+            }
+
+        # align on the original text
+        embeddings = tuple(similarity.embed_articles([r1, r2], embed_fn=similarity.embed_multilingual))
+        pairs = pair_sections(r1, r2, embeddings, matrix=similarity.multilingual_similarity_matrix)
+
+        # NLI needs English: only the candidate pairs' paragraphs, through the shared futures (a
+        # paragraph the display pass already sent is waited for, not sent again)
+        def english(records):
+            return shared.translate([r["original"] for r in records], records[0]["lang"])
+        analysis = analyze_articles(r1, r2, pairs=pairs, mode=mode, embeddings=embeddings, verdicts=verdicts,
+                                    workers=workers, translate=english, tier=tier, budget=budget,
+                                    deadline=deadline, checkpoint=checkpoint)
+
+        with metrics.span("translate_wait"): # how long the analysis had to wait for the display translation
+            translations = {lang: future.result() for lang, future in futures.items()}
+    finally:
+        background.shutdown(wait=True)
+
+    # fill in the display text of every record the analysis holds (sections a resumed run took from
+    # its checkpoint hold copies, not r1/r2's records; a record in several pairs is filled once)
+    filled = set()
+    for record, lang in _records(analysis, lang1, lang2):
+        if id(record) in filled:
+            continue
+        filled.add(id(record))
+        mapping = translations[lang]
+        record["translated"] = mapping[record["original"]]
+        if record["heading"]:
+            record["heading"] = mapping[record["heading"]]
+
+    # section titles, translated from the language of the article each came from; titles that
+    # translate to the same string get " (2)", " (3)", ... like translate_article does
+    # (an unmatched a2 section's title may carry pair_sections' " (2)": its a2_key is the real heading)
+    source = {}
+    for title, a1_key, a2_key in pairs:
+        source.setdefault(title, (lang1, a1_key) if a1_key is not None else (lang2, a2_key))
+    out = {}
+    counts = {}
+    for title, buckets in analysis.items():
+        lang, key = source[title]
+        name = title if title == "Lead" else translations[lang][key]
+        counts[name] = counts.get(name, 0) + 1
+        out[name if counts[name] == 1 else name + " (" + str(counts[name]) + ")"] = buckets
+    return out
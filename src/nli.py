@@ -1,5 +1,6 @@
 # imports
 from sentence_transformers import CrossEncoder
+from src import metrics, profiling, runtime, models, bundle
 
 # NLI cross-encoder model (deberta-v3-xsmall: ~70 MB, CPU-friendly; no new heavy deps
 # since sentence-transformers already pulls in transformers/torch for the embeddings)
@@ -8,13 +9,42 @@ NLI_MODEL = "cross-encoder/nli-deberta-v3-xsmall"
 # model's label order (fixed by how it was trained; see the model card on HF)
 NLI_LABELS = ["contradiction", "entailment", "neutral"]
 
-# lazy singleton so the model is loaded once and reused (loading takes a few seconds)
-_model = None
+# loaded once on first use and shared by every thread (loading takes a few seconds); see models.py.
+# Comes from the local model bundle when one was exported (see bundle.py)
+def _load_model():
+    runtime.apply() # thread pools must be sized before the first model runs
+    return CrossEncoder(bundle.resolve(NLI_MODEL))
+models.register(NLI_MODEL, _load_model, metric="nli_model_load_seconds")
+
 def get_model():
-    global _model
-    if _model is None:
-        _model = CrossEncoder(NLI_MODEL)
-    return _model
+    return models.get(NLI_MODEL)
+
+# cross-request batcher in front of the model (None = call it directly); set by batching.enable()
+_batcher = None
+
+# the actual model call: list of (premise, hypothesis) -> array of logit rows
+def _predict(pairs):
+    with models.in_use(NLI_MODEL): # not unloaded mid-call
+        return get_model().predict(pairs, batch_size=runtime.settings()["predict_batch_size"])
+
+def classify_pairs(pairs):
+    """
+    Input:
+        pairs (list[tuple[str, str]]): (premise, hypothesis) pairs, run through the model
+                                       in batches of runtime's predict_batch_size
+    Output:
+        list[str]: the model's top label per pair, each one of "contradiction", "entailment", "neutral"
+    """
+    if not pairs:
+        return []
+    get_model() # outside the span, so a cold load is reported as load time, not inference time
+    metrics.incr("nli_pairs", len(pairs))
+    with metrics.span("nli"), profiling.torch_trace("nli"):
+        if _batcher is not None:
+            scores = _batcher.submit(pairs) # joins other merges' pairs into one model call
+        else:
+            scores = _predict(list(pairs))
+    return [NLI_LABELS[row.argmax()] for row in scores]
 
 def classify_pair(premise, hypothesis):
     """
@@ -23,8 +53,7 @@ def classify_pair(premise, hypothesis):
     Output:
         str: the model's top label, one of "contradiction", "entailment", "neutral"
     """
-    scores = get_model().predict([(premise, hypothesis)])[0]
-    return NLI_LABELS[scores.argmax()]
+    return classify_pairs([(premise, hypothesis)])[0]
 
 def classify_bidirectional(text_a, text_b):
     """
@@ -37,11 +66,16 @@ def classify_bidirectional(text_a, text_b):
              contradiction is worse to miss than a false one is to show), else
              "entailment" if either direction agrees, else "neutral"
     """
-    label_ab = classify_pair(text_a, text_b)
-    label_ba = classify_pair(text_b, text_a)
-    if "contradiction" in (label_ab, label_ba):
+    label_ab, label_ba = classify_pairs([(text_a, text_b), (text_b, text_a)]) # both directions in one forward pass
+    return fold_labels([label_ab, label_ba])
+
+# function: fold_labels(labels: list[str]) -> str
+# one verdict from several NLI labels (both directions of a pair, or all sentence pairs of a
+# paragraph pair): contradiction beats entailment beats neutral
+def fold_labels(labels):
+    if "contradiction" in labels:
         return "contradiction"
-    if "entailment" in (label_ab, label_ba):
+    if "entailment" in labels:
         return "entailment"
     return "neutral"
 
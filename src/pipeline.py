@@ -1,49 +1,332 @@
 
-from src.article import get_article, url_to_title, url_to_lang
-from src.translate import translate_article, DeepLTranslator
-from src.analysis import analyze_articles
-from src.render import render_html
+import os, time, contextvars
+from contextlib import contextmanager, nullcontext
+from src.article import get_article, fetch_articles, get_revision_ids, url_to_title, url_to_lang, InvalidInput, FETCH_BACKENDS
+from src.translate import translate_article, translate_articles, LazyTranslator, TRANSLATION_BACKENDS
+from src.merge import pair_sections
+from src.analysis import analyze_articles, ANALYSIS_MODES, TIERS, EXECUTORS
+from src.render import render_html, write_html, resolve_output_path
+from src.export import export_analysis, export_dir_for
+from src.result_cache import ResultCache, result_key
+from src.similarity import embed_articles
+from src.index import ParagraphIndex, VerdictStore, index_analysis, merge_id
+from src.multilingual import analyse_original
+from src.checkpoint import RunCheckpoint
+from src.site import record_page
+from src import metrics, profiling
 
-# function: run_pipeline(config: dict) -> None
-def run_pipeline(config):
+# function: run_pipeline(config: dict, translator: Translator | None, cancelled: callable | None) -> dict
+def run_pipeline(config, translator=None, cancelled=None):
     """
     config keys:
         url1
         url2
         title_out
         outfile (optional)
+        export (optional, bool): also write the analysis in columnar form (see export.py)
+                                 next to the html page, as <outfile stem>.columns/
+        metrics_out (optional, str): also dump the returned metrics to this path
+                                     (".prom"/".txt" -> Prometheus text, otherwise JSON)
+        profile_dir (optional, str): opt-in deep profiling; each stage's cProfile stats and
+                                     torch profiler traces of every embedding/NLI call go into
+                                     a timestamped run folder under this directory (see profiling.py)
+        result_cache (optional, bool, default True): answer an unchanged URL pair (same revision
+                                     ids, models, thresholds, templates) from cache/results/
+                                     instead of recomputing it (see result_cache.py)
+        translation_backend (optional, str, default "deepl"): "deepl" (DeepL API) or "local"
+                                     (offline MarianMT models, see local_translate.py)
+        sentence_memory (optional, bool): DeepL only: translate uncached paragraphs sentence by
+                                     sentence, so an edited paragraph only costs its changed
+                                     sentences (see DeepLTranslator._translate_by_sentence). Each
+                                     sentence loses its paragraph as context, so this is opt-in
+        analysis_mode (optional, str, default "paragraph"): "sentence" judges each matched
+                                     paragraph pair by its closest sentence pairs and attaches
+                                     them as evidence (see analysis.ANALYSIS_MODES)
+        section_alignment (optional, str, default "content"): "content" pairs sections by title
+                                     and mean-pooled paragraph similarity (paragraphs are embedded
+                                     once and reused by the analysis); "title" by title alone
+        index (optional, bool): add both articles' paragraph embeddings to the persistent index
+                                     under cache/index/ (searchable across merges, see index.py)
+                                     and reuse NLI verdicts of paragraph pairs judged before
+        fetch_backend (optional, str, default "api"): "api" fetches each article in one MediaWiki
+                                     request (see article.fetch_article); "wikipediaapi" uses the
+                                     wikipediaapi package
+        analysis_language (optional, str, default "translated"): "original" aligns the untranslated
+                                     text with a multilingual embedding model while the display
+                                     translation runs in the background; NLI gets just the candidate
+                                     pairs, translated on demand (see multilingual.py; not with index)
+        analysis_tier (optional, str, default "full"): "fast" (embeddings only, no NLI), "balanced"
+                                     (NLI on each section's best candidates) or "full" (see analysis.TIERS)
+        deadline (optional, float): seconds the whole run may take; the analysis then goes section
+                                     by section (Lead first, then largest) and lowers the tier as time
+                                     runs out. Each section records its tier; a degraded result is
+                                     not stored in the result cache
+        analysis_workers (optional, int, default 1): sections analysed in parallel
+        analysis_executor (optional, str, default "thread"): "thread" or "process" pool for
+                                     analysis_workers > 1 (see analysis.EXECUTORS)
+        checkpoint (optional, bool): save each finished stage (fetch, translate, embed_paragraphs,
+                                     pair) and each analysed section under cache/checkpoints/<run id>/
+                                     (see checkpoint.py); removed once the run completes. With
+                                     analysis_language "original", the fetch and the sections are
+                                     (the display translation runs alongside, through the translation cache)
+        resume (optional, bool): continue a checkpointed run that died: stages and sections its
+                                     checkpoint holds are skipped (implies checkpoint)
+        run_id (optional, str): the checkpoint's name; defaults to one derived from the URLs and
+                                     settings, so re-running the same command with resume finds it
+        site (optional, bool): record the merge as a page of the static site under cache/pages/
+                                     (kept until removed; see site.py)
 
-    Note: outfile is derived from the title via _slugify in main.py. If absent
+    translator (optional): a translator to reuse (e.g. the server's, whose in-memory cache
+    stays warm across merges); when omitted, a fresh one for translation_backend is created.
+
+    cancelled (optional): a no-argument callable checked before each stage; once it returns True
+    the run stops with RunCancelled (e.g. a job worker whose lease another worker took over).
+
+    An invalid URL, a missing article or an unknown setting raises article.InvalidInput (a ValueError).
+
+    Returns the run's metrics (see metrics.py): {"spans": stage -> {"count", "seconds"},
+    "counters": {...}, "values": {...}}.
+
+    Note: outfile is derived from the title via render.slugify in main.py. If absent
     or empty, render_html falls back to its default path (output/merged_article.html).
     """
+    profile = profiling.session(config["profile_dir"]) if config.get("profile_dir") else nullcontext()
+    token = _cancelled.set(cancelled)
+    try:
+        with metrics.collect() as m, profile as run_dir:
+            with m.span("total"):
+                _run_stages(config, translator)
+    finally:
+        _cancelled.reset(token)
+    if run_dir:
+        print("Wrote profiles to " + run_dir)
+    result = m.as_dict()
+    if config.get("metrics_out"):
+        metrics.dump(result, config["metrics_out"])
+    return result
+
+# raised before a stage of a run whose caller cancelled it (see run_pipeline)
+class RunCancelled(Exception):
+    pass
+
+_cancelled = contextvars.ContextVar("cancelled", default=None) # the current run's cancelled callable
+
+# one pipeline stage: timed as a metrics span, and cProfiled when a profiling session is active
+@contextmanager
+def _stage(name):
+    cancelled = _cancelled.get()
+    if cancelled is not None and cancelled():
+        raise RunCancelled("Run cancelled before " + name)
+    with metrics.span(name), profiling.stage(name):
+        yield
+
+# every setting with a fixed set of values, checked before any request is made: a typo is the
+# caller's input, and fails the same way every time (InvalidInput, not an error halfway through the run)
+SETTINGS = {
+    "translation_backend": TRANSLATION_BACKENDS,
+    "fetch_backend": FETCH_BACKENDS,
+    "analysis_mode": ANALYSIS_MODES,
+    "analysis_language": ("translated", "original"),
+    "section_alignment": ("content", "title"),
+    "analysis_tier": TIERS,
+    "analysis_executor": EXECUTORS
+}
+
+def _check_settings(config):
+    for name, values in SETTINGS.items():
+        if name in config and config[name] not in values:
+            raise InvalidInput("Unknown " + name.replace("_", " ") + ": " + str(config[name]) + " (expected one of " + ", ".join(values) + ")")
+    if config.get("analysis_language") == "original" and config.get("index"):
+        raise InvalidInput("The paragraph index holds English-model embeddings: use analysis_language 'translated' with index")
+
+# the pipeline itself
+def _run_stages(config, translator):
+    _check_settings(config)
+
+    # the run's deadline (if any) as a time.time() timestamp: the analysis checks it against the same
+    # clock, so whatever fetch, translate and pairing used up is no longer available to the sections
+    deadline = time.time() + float(config["deadline"]) if config.get("deadline") is not None else None
+
     # parse title and language from url
     title1 = url_to_title(config["url1"])
     lang1 = url_to_lang(config["url1"])
     title2 = url_to_title(config["url2"])
     lang2 = url_to_lang(config["url2"])
+    outfile = resolve_output_path(config.get("outfile", ""))
 
-    # fetch raw articles
-    a1_orig = get_article(lang1, title1)
-    a2_orig = get_article(lang2, title2)
+    # everything besides the articles that changes the result (translations differ per
+    # backend, so the backend is part of it)
+    backend = translator.backend if translator is not None else config.get("translation_backend", "deepl")
+    options = {
+        "translation_backend": backend,
+        "analysis_mode": config.get("analysis_mode", "paragraph"),
+        "section_alignment": config.get("section_alignment", "content"),
+        "fetch_backend": config.get("fetch_backend", "api"),
+        "analysis_language": config.get("analysis_language", "translated"),
+        "analysis_tier": config.get("analysis_tier", "full")
+    }
+    sentence_memory = getattr(translator, "sentence_memory", False) if translator is not None else bool(config.get("sentence_memory"))
+    if sentence_memory:
+        options["sentence_memory"] = True # only when on, so existing cache keys stay valid
 
-    # translator
-    translator = DeepLTranslator()
+    # both articles' current revision ids (one cheap metadata request per language), before doing
+    # any real work: the result cache looks the pair up by them, and the index skips a merge it
+    # already holds from the same revisions
+    cache = ResultCache() if config.get("result_cache", True) else None
+    entry = None
+    rev1 = rev2 = None
+    revs_known = cache is not None or bool(config.get("index"))
+    if revs_known:
+        with _stage("revisions"):
+            if lang1 == lang2:
+                revs = get_revision_ids(lang1, [title1, title2])
+                rev1, rev2 = revs[title1.strip()], revs[title2.strip()]
+            else:
+                rev1 = get_revision_ids(lang1, [title1])[title1.strip()]
+                rev2 = get_revision_ids(lang2, [title2])[title2.strip()]
+    if cache is not None:
+        key = result_key((lang1, title1, rev1), (lang2, title2, rev2), options)
+        if rev1 and rev2: # a missing page has no revision: fall through so get_article reports it
+            entry = cache.get(key)
+        metrics.incr("result_cache_hits" if entry is not None else "result_cache_misses")
 
-    # translate articles
-    a1_trans = translate_article(a1_orig, lang1, translator)
-    a2_trans = translate_article(a2_orig, lang2, translator)
+    # checkpoint of this run (the same URLs and settings always get the same default run id)
+    checkpoint = None
+    if entry is None and (config.get("checkpoint") or config.get("resume")):
+        fingerprint = result_key((lang1, title1), (lang2, title2), options)
+        checkpoint = RunCheckpoint(config.get("run_id") or fingerprint[:16], fingerprint, resume=bool(config.get("resume")))
 
-    # analyse the two articles: per section, what they share vs. what each covers
-    # uniquely. this analysis IS the body now (no separate flat merge step)
-    analysis = analyze_articles(a1_trans, a2_trans)
+    if entry is not None:
+        analysis = entry["analysis"]
+    else:
+        if translator is None:
+            # built only if some article actually needs translating (an en/simple pair makes no API calls)
+            translator = LazyTranslator(backend, sentence_memory=sentence_memory)
+        analysis = _analyse(lang1, title1, lang2, title2, translator, config, deadline, checkpoint,
+                            index_info={"revisions": [rev1, rev2], "options": options, "title_out": config["title_out"]},
+                            revisions=(rev1, rev2) if revs_known else None)
 
     # render html (outfile derived from title; empty falls back to render's default path)
-    render_html(config["title_out"], analysis, config.get("outfile", ""), lang1, lang2)
+    with _stage("render"):
+        if entry is not None and entry["title_out"] == config["title_out"] and entry["outfile"] == outfile:
+            write_html(outfile, entry["html"]) # identical page: reuse the stored html as-is
+        else:
+            html = render_html(config["title_out"], analysis, outfile, lang1, lang2)
+
+    # a result degraded by the deadline is not what the next run (maybe without one) should get
+    degraded = any(info.get("tier", "full") != config.get("analysis_tier", "full") for info in analysis.values())
+    if cache is not None and entry is None and rev1 and rev2 and not degraded:
+        cache.put(key, {"analysis": analysis, "html": html, "title_out": config["title_out"], "outfile": outfile,
+                        "lang1": lang1, "lang2": lang2})
+
+    # the static site's copy: unlike the result cache, kept until taken down (and degraded runs count too)
+    if config.get("site"):
+        record_page(os.path.splitext(os.path.basename(outfile))[0], config["title_out"], analysis, lang1, lang2)
+
+    # columnar export for downstream consumers (dashboards aggregate these without re-running anything)
+    if config.get("export"):
+        with _stage("export"):
+            export_analysis(analysis, export_dir_for(outfile), config["title_out"], lang1, lang2)
+
+    # the run is complete: nothing left to resume
+    if checkpoint is not None:
+        checkpoint.clear()
 
     # print success message
     print("Wrote merged article to the output/ folder")
 
-    # return nothing
-    return None
+# a stage's output from the checkpoint if an earlier attempt of this run finished it,
+# else computed now (and saved, when checkpointing)
+def _checkpointed(checkpoint, stage, compute):
+    if checkpoint is not None:
+        data = checkpoint.load(stage)
+        if data is not None:
+            metrics.incr("checkpoint_stages_reused")
+            return data
+    data = compute()
+    if checkpoint is not None:
+        checkpoint.save(stage, data)
+    return data
+
+# function: _fetch(lang1, title1, lang2, title2, backend, revisions) -> list[dict]  [a1_orig, a2_orig]
+# revisions: (rev1, rev2) when the run already looked them up (no second existence check then)
+def _fetch(lang1, title1, lang2, title2, backend, revisions=None):
+    # two pages of the same edition: one batched existence check, both fetched at once
+    if backend == "api" and lang1 == lang2:
+        revids = {title1.strip(): revisions[0], title2.strip(): revisions[1]} if revisions is not None else None
+        fetched = fetch_articles(lang1, [title1, title2], revids)
+        for title in (title1, title2):
+            if fetched[title.strip()] is None:
+                raise InvalidInput("Article not found: " + title.strip())
+        return [fetched[title1.strip()]["sections"], fetched[title2.strip()]["sections"]]
+    return [get_article(lang1, title1, backend), get_article(lang2, title2, backend)]
+
+# function: _translate(a1_orig, lang1, a2_orig, lang2, translator) -> list[dict]  [a1_trans, a2_trans]
+def _translate(a1_orig, lang1, a2_orig, lang2, translator):
+    # English editions pass through untranslated; two articles in the same language share one pass
+    if lang1 == lang2:
+        return list(translate_articles([a1_orig, a2_orig], lang1, translator))
+    return [translate_article(a1_orig, lang1, translator), translate_article(a2_orig, lang2, translator)]
+
+# fetch, translate and analyse the two articles (everything a result cache hit skips); with a
+# checkpoint, each finished stage and section is saved, and those an earlier attempt saved are reused
+def _analyse(lang1, title1, lang2, title2, translator, config, deadline=None, checkpoint=None, index_info=None,
+             revisions=None):
+    # fetch raw articles
+    backend = config.get("fetch_backend", "api")
+    with _stage("fetch"):
+        a1_orig, a2_orig = _checkpointed(checkpoint, "fetch", lambda: _fetch(lang1, title1, lang2, title2, backend, revisions))
+
+    # the sections degrade against the run's deadline, budget being its full length (see analysis.tier_at)
+    tier = config.get("analysis_tier", "full")
+    budget = float(config["deadline"]) if deadline is not None else None
+
+    # translation off the critical path: analyse the original text, translate for display meanwhile
+    if config.get("analysis_language", "translated") == "original":
+        with _stage("analyse"):
+            return analyse_original(a1_orig, lang1, a2_orig, lang2, translator,
+                                    mode=config.get("analysis_mode", "paragraph"),
+                                    workers=config.get("analysis_workers", 1), tier=tier, budget=budget,
+                                    deadline=deadline, checkpoint=checkpoint)
+
+    # translate articles
+    with _stage("translate"):
+        a1_trans, a2_trans = _checkpointed(checkpoint, "translate", lambda: _translate(a1_orig, lang1, a2_orig, lang2, translator))
+
+    # analyse the two articles: per section, what they share vs. what each covers
+    # uniquely. this analysis IS the body now (no separate flat merge step)
+    alignment = config.get("section_alignment", "content")
+    embeddings = None
+    if alignment == "content" or config.get("index"):
+        # every paragraph of both articles in one batch; reused for section pairing, the analysis and the index
+        with _stage("embed_paragraphs"):
+            embeddings = checkpoint.load_embeddings() if checkpoint is not None else None
+            if embeddings is None:
+                embeddings = tuple(embed_articles([a1_trans, a2_trans]))
+                if checkpoint is not None:
+                    checkpoint.save_embeddings(embeddings)
+    with _stage("pair"):
+        pairs = _checkpointed(checkpoint, "pair", lambda: pair_sections(a1_trans, a2_trans, embeddings if alignment == "content" else None))
+        pairs = [tuple(pair) for pair in pairs] # JSON hands a checkpointed pairing back as lists
+
+    verdicts = VerdictStore() if config.get("index") else None
+    try:
+        with _stage("analyse"):
+            analysis = analyze_articles(a1_trans, a2_trans, pairs=pairs, mode=config.get("analysis_mode", "paragraph"),
+                                        embeddings=embeddings, verdicts=verdicts,
+                                        workers=config.get("analysis_workers", 1),
+                                        executor=config.get("analysis_executor", "thread"),
+                                        tier=tier, budget=budget, deadline=deadline, checkpoint=checkpoint)
+    finally:
+        if verdicts is not None:
+            verdicts.save()
 
-    
\ No newline at end of file
+    if config.get("index"):
+        index = ParagraphIndex()
+        merge = merge_id(lang1, title1, lang2, title2)
+        if index.has_merge(merge, index_info or {}): # same revisions and settings: its rows are already there
+            metrics.incr("index_merges_skipped")
+        else:
+            with _stage("index"):
+                index_analysis(index, merge, a1_trans, a2_trans, embeddings, index_info or {})
+    return analysis
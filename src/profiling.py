@@ -0,0 +1,129 @@
+# opt-in deep profiling: while a session is active, every pipeline stage is run under
+# cProfile (stats dumped per stage) and every embedding/NLI inference call under the torch
+# profiler (chrome traces), all written into one run directory.
+# Outside a session, stage and torch_trace are no-ops, so the hooks cost nothing normally.
+# Only one profiler of each kind can run in a process at a time: a stage (or inference call)
+# that starts while another one is being profiled, e.g. in a concurrent server request, runs
+# unprofiled instead of failing. Work a stage hands to pool threads is included when the
+# tasks are wrapped in thread_task (see analysis.analyze_articles).
+
+# imports
+import os, io, sys, time, pstats, tempfile, cProfile, threading, contextvars
+from contextlib import contextmanager
+from src import metrics
+
+# how many functions the human-readable per-stage summary lists
+SUMMARY_LINES = 40
+
+# before 3.12 cProfile hooks only the thread that enables it (sys.setprofile), so pool threads
+# need profilers of their own; from 3.12 it uses sys.monitoring, which already sees every thread
+_PER_THREAD = sys.version_info < (3, 12)
+
+# the active run directory (None -> profiling is off)
+_run_dir = contextvars.ContextVar("wikimerge_profile_dir", default=None)
+
+# the stage being profiled in this context: {"thread": ident, "profiles": [pool threads' profilers]}
+_collector = contextvars.ContextVar("wikimerge_profile_collector", default=None)
+
+# one cProfile stage and one torch trace at a time, process-wide
+_stage_lock = threading.Lock()
+_torch_lock = threading.Lock()
+
+# per-name call counters, so repeated stages/inference calls don't overwrite each other's files;
+# keyed by folder and dropped when its session ends
+_counts = {}
+_counts_lock = threading.Lock()
+
+def _next_path(run_dir, name, ext):
+    with _counts_lock:
+        n = _counts.get((run_dir, name), 0) + 1
+        _counts[(run_dir, name)] = n
+    return os.path.join(run_dir, name + ("" if n == 1 else "-" + str(n)) + ext)
+
+# turn profiling on for the block; profiles go to a fresh timestamped folder under root (with a
+# random suffix: runs started in the same second, e.g. concurrent server requests, get their own)
+@contextmanager
+def session(root):
+    os.makedirs(root, exist_ok=True)
+    run_dir = tempfile.mkdtemp(dir=root, prefix=time.strftime("%Y%m%d-%H%M%S") + "-")
+    os.makedirs(os.path.join(run_dir, "torch"))
+    token = _run_dir.set(run_dir)
+    try:
+        yield run_dir
+    finally:
+        _run_dir.reset(token)
+        with _counts_lock:
+            for key in [key for key in _counts if key[0] == run_dir or key[0].startswith(run_dir + os.sep)]:
+                del _counts[key]
+
+# profile one pipeline stage with cProfile -> <run_dir>/<name>.prof (load with pstats/snakeviz)
+# plus <name>.txt (top functions by cumulative time)
+@contextmanager
+def stage(name):
+    run_dir = _run_dir.get()
+    if run_dir is None:
+        yield
+        return
+    if not _stage_lock.acquire(blocking=False):
+        metrics.incr("profile_stages_skipped") # another stage is being profiled
+        yield
+        return
+
+    collector = {"thread": threading.get_ident(), "profiles": []}
+    token = _collector.set(collector)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _collector.reset(token)
+        _stage_lock.release()
+        stats = pstats.Stats(profiler)
+        for thread_profiler in collector["profiles"]:
+            stats.add(thread_profiler)
+        path = _next_path(run_dir, name, ".prof")
+        stats.dump_stats(path)
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+        with open(os.path.splitext(path)[0] + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+
+# function: thread_task(fn: callable, *args) -> the result of fn(*args)
+# for pool tasks submitted inside a stage (with contextvars.copy_context().run): the task's
+# thread is profiled into that stage's stats
+def thread_task(fn, *args):
+    collector = _collector.get()
+    if collector is None or not _PER_THREAD or collector["thread"] == threading.get_ident():
+        return fn(*args)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn(*args)
+    finally:
+        profiler.disable()
+        with _counts_lock:
+            collector["profiles"].append(profiler)
+
+# trace one model inference call with the torch profiler -> <run_dir>/torch/<name>[-n].json
+# (chrome://tracing / perfetto format)
+@contextmanager
+def torch_trace(name):
+    run_dir = _run_dir.get()
+    if run_dir is None:
+        yield
+        return
+
+    if not _torch_lock.acquire(blocking=False):
+        metrics.incr("profile_traces_skipped") # another call is being traced
+        yield
+        return
+
+    from torch.profiler import profile, ProfilerActivity # torch is only needed once profiling is on
+    try:
+        with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+            yield
+        prof.export_chrome_trace(_next_path(os.path.join(run_dir, "torch"), name, ".json"))
+    finally:
+        _torch_lock.release()
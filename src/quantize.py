@@ -0,0 +1,167 @@
+# compact embedding codes and the similarity kernels that run on them (NumPy, vectorised):
+#   int8     per-vector scalar quantisation of unit vectors: one byte per dimension plus one
+#            float32 scale per vector (~4x smaller than float32); scores against a float query
+#            are within ~1% of the exact cosine
+#   binary   the sign of each dimension, 8 dimensions per byte (32x smaller); Hamming distance
+#            between sign codes tracks the angle between the vectors, good enough to pre-filter
+# Both are candidate generators: search() scans the codes for k * oversample candidates and
+# re-ranks those with the exact float vectors, so the final top-k scores are exact cosines.
+# index.ParagraphIndex keeps both codes next to its float32 vectors (see its search method).
+# run from project root: python -m src.quantize   (benchmark on synthetic vectors)
+
+# imports
+import time, argparse
+import numpy as np
+
+QUANTIZE_METHODS = ("exact", "int8", "binary")
+
+# candidates scanned per requested hit before the exact re-rank
+INT8_OVERSAMPLE = 4
+BINARY_OVERSAMPLE = 100 # sign codes are coarse: ~0.97 recall@10 on the synthetic benchmark (0.58 at 20)
+
+# bits set per byte value (fallback for NumPy without bitwise_count)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+# function: normalise(vectors: array-like) -> np.ndarray  (float32 rows of unit length)
+def normalise(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+# function: quantize_int8(vectors: array-like) -> tuple[np.ndarray, np.ndarray]
+# (codes int8 (n, dim), scales float32 (n,)); vectors are normalised first, and each row's
+# largest component maps to +-127 so no row loses range to another
+def quantize_int8(vectors):
+    vectors = normalise(vectors)
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+# function: dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray
+def dequantize_int8(codes, scales):
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+# function: int8_scores(queries: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray
+# approximate cosine (n_queries, n_codes) of unit-length float queries against int8 codes
+def int8_scores(queries, codes, scales):
+    return (queries @ codes.astype(np.float32).T) * np.asarray(scales, dtype=np.float32)[None, :]
+
+# function: binary_codes(vectors: array-like) -> np.ndarray  (uint8 (n, ceil(dim / 8)), one bit per sign)
+def binary_codes(vectors):
+    return np.packbits(np.atleast_2d(np.asarray(vectors)) > 0, axis=1)
+
+# function: hamming(query_codes: np.ndarray, codes: np.ndarray) -> np.ndarray
+# bits differing (n_queries, n_codes); one query at a time, so memory stays at one (n_codes, bytes) block
+def hamming(query_codes, codes):
+    query_codes, codes = np.ascontiguousarray(query_codes), np.ascontiguousarray(codes)
+    if hasattr(np, "bitwise_count") and codes.shape[1] % 8 == 0:
+        # 64 bits per popcount instead of 8 (384 dims: 6 words per row)
+        query_codes, codes = query_codes.view(np.uint64), codes.view(np.uint64)
+    out = np.empty((len(query_codes), len(codes)), dtype=np.int32)
+    for q, query in enumerate(query_codes):
+        diff = np.bitwise_xor(codes, query[None, :])
+        if hasattr(np, "bitwise_count"): # NumPy 2: hardware popcount
+            out[q] = np.bitwise_count(diff).sum(axis=1)
+        else:
+            out[q] = _POPCOUNT[diff].sum(axis=1)
+    return out
+
+# function: top_k(scores: np.ndarray, k: int) -> np.ndarray  (per row, the k best column indices, best first)
+def top_k(scores, k):
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((len(scores), 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+# function: rerank(queries: np.ndarray, vectors: np.ndarray, candidates: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]
+# exact cosine of each query against its candidate rows only; (rows, scores), each (n_queries, <=k), best first.
+# vectors may be a memory map: only the candidate rows are read
+def rerank(queries, vectors, candidates, k):
+    rows_out, scores_out = [], []
+    for query, rows in zip(queries, candidates):
+        rows = np.unique(rows)
+        scores = normalise(vectors[rows]) @ query if len(rows) else np.zeros(0, dtype=np.float32)
+        best = top_k(scores[None, :], k)[0]
+        rows_out.append(rows[best])
+        scores_out.append(scores[best])
+    return rows_out, scores_out
+
+def search(queries, vectors, k=10, method="int8", codes=None):
+    """
+    Top-k cosine search over an in-memory (or memory-mapped) set of vectors.
+    Input:
+        queries (array-like): (n, dim) query vectors
+        vectors (np.ndarray): (m, dim) float vectors (used for "exact" and for the re-rank)
+        k (int): hits per query
+        method (str): "exact", "int8" or "binary" (see QUANTIZE_METHODS)
+        codes (dict, optional): precomputed {"int8": (codes, scales)} / {"binary": codes} for vectors
+    Output:
+        tuple(list[np.ndarray], list[np.ndarray]): per query, the hit rows and their exact cosines
+    """
+    if method not in QUANTIZE_METHODS:
+        raise ValueError("Unknown search method: " + str(method) + " (expected one of " + ", ".join(QUANTIZE_METHODS) + ")")
+    queries = normalise(queries)
+    codes = codes or {}
+    if method == "exact":
+        scores = queries @ normalise(vectors).T
+        rows = top_k(scores, k)
+        return list(rows), list(np.take_along_axis(scores, rows, axis=1))
+    if method == "int8":
+        int8, scales = codes.get("int8") or quantize_int8(vectors)
+        candidates = top_k(int8_scores(queries, int8, scales), k * INT8_OVERSAMPLE)
+    else:
+        bits = codes.get("binary")
+        if bits is None:
+            bits = binary_codes(vectors)
+        candidates = top_k(-hamming(binary_codes(queries), bits), k * BINARY_OVERSAMPLE)
+    return rerank(queries, vectors, candidates, k)
+
+# function: synthetic_vectors(n: int, dim: int, seed: int, clusters: int) -> np.ndarray
+# clustered like real paragraph embeddings (topics), so neighbours are not all equidistant
+def synthetic_vectors(n, dim=384, seed=0, clusters=64):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return normalise(vectors)
+
+def benchmark(n=100000, dim=384, n_queries=100, k=10, seed=0):
+    """
+    Input:
+        n, dim (int): synthetic database size
+        n_queries, k (int): queries (perturbed database rows) and hits per query
+        seed (int): same seed -> same data
+    Output:
+        dict: per method {"bytes", "seconds_per_query", "recall_at_k"} (recall against exact search)
+    """
+    vectors = synthetic_vectors(n, dim, seed)
+    rng = np.random.default_rng(seed + 1)
+    queries = normalise(vectors[rng.integers(0, n, size=n_queries)] + 0.1 * rng.normal(size=(n_queries, dim)))
+    codes = {"int8": quantize_int8(vectors), "binary": binary_codes(vectors)}
+    sizes = {"exact": vectors.nbytes, "int8": codes["int8"][0].nbytes + codes["int8"][1].nbytes,
+             "binary": codes["binary"].nbytes}
+
+    report = {}
+    truth = None
+    for method in QUANTIZE_METHODS:
+        start = time.perf_counter()
+        rows, _ = search(queries, vectors, k, method, codes)
+        seconds = time.perf_counter() - start
+        if truth is None:
+            truth = rows # "exact" runs first
+        recall = np.mean([len(set(r.tolist()) & set(t.tolist())) / len(t) for r, t in zip(rows, truth)])
+        report[method] = {"bytes": int(sizes[method]), "seconds_per_query": round(seconds / n_queries, 6),
+                          "recall_at_k": round(float(recall), 3)}
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark int8 / binary embedding search on synthetic vectors.")
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    for method, row in benchmark(args.n, args.dim, args.queries, args.k).items():
+        print("%-7s %8.1f MB  %8.3f ms/query  recall@%d %.3f" % (method, row["bytes"] / 2 ** 20,
+                                                                 row["seconds_per_query"] * 1000, args.k, row["recall_at_k"]))
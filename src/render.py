@@ -1,5 +1,8 @@
-import os
+import os, re, json, hashlib, threading
+from collections import OrderedDict
 from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+from src import metrics
 
 # define paths
 THIS_DIR = os.path.dirname(__file__)
@@ -11,6 +14,23 @@ OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 # define default output file name
 DEFAULT_OUTPUT_FILE = os.path.join(OUTPUT_DIR, "merged_article.html")
 
+# version of the templates: a hash of every file in TEMPLATES_DIR, so cached renders (see
+# result_cache.py) are invalidated automatically whenever a template is edited
+def _template_version():
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(TEMPLATES_DIR)):
+        with open(os.path.join(TEMPLATES_DIR, name), "rb") as f:
+            digest.update(name.encode("utf-8") + b"\0" + f.read())
+    return digest.hexdigest()[:16]
+
+TEMPLATE_VERSION = _template_version()
+
+# helper function to slugify text (to transform title to output filename)
+def slugify(text, max_length=50):
+    s = (text or "").strip().lower() # strip and lowercase
+    s = re.sub(r"[^a-z0-9]+", "-", s).strip("-") # non-alphanumerics to hyphens, trim stray hyphens
+    return s[:max_length] or "merged_article" # cap length, fallback if empty
+
 # function to resolve outfile situations: the file must end up inside OUTPUT_DIR
 def resolve_output_path(outfile):
     # if empty: default location
@@ -37,20 +57,102 @@ def resolve_output_path(outfile):
     # a relative path is sandboxed to its bare filename inside OUTPUT_DIR (drop any dirs)
     return os.path.join(OUTPUT_DIR, os.path.basename(outfile))
 
-# function: render_html(title, analysis, outfile, lang1="", lang2="") -> None
-def render_html(title, analysis, outfile, lang1="", lang2=""):
-    # prepare jinja environment
-    env = Environment(
-        loader=FileSystemLoader(TEMPLATES_DIR),
-        autoescape=select_autoescape(["html", "xml"])
-    )
+# function: write_html(outfile: str, html: str) -> None
+# write an already rendered page (outfile is resolved into OUTPUT_DIR exactly like render_html's)
+def write_html(outfile, html):
+    outfile = resolve_output_path(outfile)
+    os.makedirs(os.path.dirname(outfile) or ".", exist_ok=True)
+    with open(outfile, "w", encoding="utf-8") as f:
+        f.write(html)
+
+# one Jinja environment per process: templates are compiled on first use and the compiled
+# template is reused by every later render (trim_blocks/lstrip_blocks keep the template's
+# indentation and tag-only lines out of the output)
+_env = None
+def get_template(name="article_template.html"):
+    global _env
+    if _env is None:
+        _env = Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR),
+            autoescape=select_autoescape(["html", "xml"]),
+            trim_blocks=True,
+            lstrip_blocks=True
+        )
+    return _env.get_template(name)
+
+# rendered sections, keyed by a hash of what they were rendered from: re-rendering a page whose
+# sections mostly didn't change (a re-merge, a site rebuild, the server refreshing a page) only
+# renders the changed ones. In memory, per process; least recently used fragments are dropped
+# once the cache holds more than max_bytes of html
+FRAGMENT_CACHE_BYTES = 64 * 1024 * 1024
+
+class FragmentCache:
+    def __init__(self, max_bytes=FRAGMENT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._fragments = OrderedDict() # key -> (html, its size in utf-8 bytes), least recently used first
+        self._lock = threading.Lock() # shared by the server's concurrent renders
+
+    # function: get(key: str) -> str | None
+    def get(self, key):
+        with self._lock:
+            entry = self._fragments.get(key)
+            if entry is None:
+                return None
+            self._fragments.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, html):
+        with self._lock:
+            if key in self._fragments:
+                return
+            size = len(html.encode("utf-8")) # bytes, not characters: most non-Latin text takes 2-3 each
+            self._fragments[key] = (html, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._fragments:
+                _, (_, dropped) = self._fragments.popitem(last=False)
+                self.bytes -= dropped
 
-    # load template file
-    template = env.get_template("article_template.html")
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self.bytes = 0
 
+fragment_cache = FragmentCache()
+
+# function: fragment_key(section_title, info, lang1, lang2) -> str
+# everything a section's html depends on: its title, analysis[title], both language tags and the templates
+def fragment_key(section_title, info, lang1="", lang2=""):
+    parts = [TEMPLATE_VERSION, section_title, info, lang1, lang2]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+# function: render_section(section_title, info, lang1="", lang2="") -> Markup (one section's html)
+def render_section(section_title, info, lang1="", lang2=""):
+    key = fragment_key(section_title, info, lang1, lang2)
+    html = fragment_cache.get(key)
+    if html is None:
+        metrics.incr("fragment_cache_misses")
+        html = get_template("section_fragment.html").render(section_title=section_title, info=info, lang1=lang1, lang2=lang2)
+        fragment_cache.put(key, html)
+    else:
+        metrics.incr("fragment_cache_hits")
+    return Markup(html) # already escaped by its own template
+
+# function: render_page(title, analysis, css_href, lang1="", lang2="") -> str
+# the page as a string (nothing written), assembled from per-section fragments; css_href is the
+# stylesheet's path relative to the page
+def render_page(title, analysis, css_href, lang1="", lang2=""):
+    sections = [render_section(section_title, info, lang1, lang2) for section_title, info in analysis.items()]
+    return get_template().render(
+        title=title,
+        sections=sections,
+        css_href=css_href
+    )
+
+# function: render_html(title, analysis, outfile, lang1="", lang2="") -> str (the html written)
+def render_html(title, analysis, outfile, lang1="", lang2=""):
     # force output into OUTPUT_DIR unless absolute path provided
     outfile = resolve_output_path(outfile)
-    os.makedirs(os.path.dirname(outfile) or ".", exist_ok=True)
 
     # compute CSS path relative to output file
     css_path = os.path.relpath(
@@ -59,17 +161,11 @@ def render_html(title, analysis, outfile, lang1="", lang2=""):
     )
 
     # render html
-    html = template.render(
-        title=title,
-        analysis=analysis,
-        css_href=css_path,
-        lang1=lang1,
-        lang2=lang2
-    )
-    
+    html = render_page(title, analysis, css_path, lang1, lang2)
+
     # write to outfile
-    with open(outfile, "w", encoding="utf-8") as f:
-        f.write(html)
+    write_html(outfile, html)
+    return html
 
 # testing
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+# top-level cache of finished merges: the analysis (and rendered html) of a URL pair,
+# keyed by everything that could change the result -- both articles' revision ids, the
+# embedding and NLI models, the matching thresholds and limits, and the template version. An unchanged
+# pair is then answered without fetching, translating, embedding or running NLI again.
+# Entries are one JSON file each under cache/results/; the least recently used ones are
+# evicted once the cache holds more than max_entries files or max_bytes on disk.
+
+# imports
+import os, json, hashlib
+from src import similarity, nli, render, merge, analysis
+from src.storage import atomic_write_json, read_json
+
+RESULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "results")
+MAX_ENTRIES = 1000
+MAX_BYTES = 500 * 1024 * 1024
+
+# function: result_key(article1: tuple, article2: tuple, options: dict | None) -> str
+# article1/article2 are (lang, title, revision id); options holds any run settings that change
+# the analysis (so two runs with different settings never share an entry)
+def result_key(article1, article2, options=None):
+    parts = {
+        "a1": list(article1),
+        "a2": list(article2),
+        "embed_model": similarity.EMBED_MODEL,
+        "multilingual_embed_model": similarity.MULTILINGUAL_EMBED_MODEL,
+        "nli_model": nli.NLI_MODEL,
+        "section_match_threshold": merge.SECTION_MATCH_THRESHOLD,
+        "content_weight": merge.CONTENT_WEIGHT,
+        "agree_threshold": analysis.AGREE_THRESHOLD,
+        "sentence_match_threshold": analysis.SENTENCE_MATCH_THRESHOLD,
+        "sentence_top_k": analysis.SENTENCE_TOP_K,
+        "balanced_nli_pairs": analysis.BALANCED_NLI_PAIRS,
+        "template_version": render.TEMPLATE_VERSION,
+        "options": options or {}
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+class ResultCache:
+    def __init__(self, root=RESULT_CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.root, key + ".json")
+
+    # function: get(key: str) -> dict | None
+    def get(self, key):
+        path = self._path(key)
+        entry = read_json(path)
+        if entry is not None:
+            try:
+                os.utime(path) # a hit makes this entry the most recently used
+            except OSError:
+                pass # evicted by another process between the read and now; the entry we read is still good
+        return entry
+
+    # function: put(key: str, entry: dict) -> None
+    def put(self, key, entry):
+        atomic_write_json(self._path(key), entry)
+        self._evict()
+
+    # drop least recently used entries until both limits hold again
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json") or name.startswith(".tmp-"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue # removed concurrently
+            files.append((st.st_mtime, st.st_size, name))
+        files.sort() # oldest access first
+        total = sum(size for _, size, _ in files)
+        while files and (len(files) > self.max_entries or total > self.max_bytes):
+            _, size, name = files.pop(0)
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+            total -= size
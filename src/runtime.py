@@ -0,0 +1,156 @@
+# CPU inference parallelism: torch intra-op/inter-op thread counts and the batch sizes
+# used for embedding (encode) and NLI (predict). Applied once, when the first model loads.
+# Settings come from, in increasing priority:
+#   1. defaults derived from the host's core count and WIKIMERGE_WORKERS (how many worker
+#      processes share the host, so they split the cores instead of oversubscribing them)
+#   2. cache/runtime.json, written by the autotune benchmark (python -m src.runtime); its thread
+#      counts only apply while WIKIMERGE_WORKERS is what it was when they were tuned
+#   3. environment variables (WIKIMERGE_TORCH_THREADS, WIKIMERGE_INTEROP_THREADS,
+#      WIKIMERGE_ENCODE_BATCH_SIZE, WIKIMERGE_PREDICT_BATCH_SIZE)
+
+# imports
+import os, json, time
+
+# autotuned settings file (per host, next to the translation cache)
+RUNTIME_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "runtime.json")
+
+# setting name -> environment variable that overrides it
+ENV_VARS = {
+    "torch_threads": "WIKIMERGE_TORCH_THREADS",
+    "interop_threads": "WIKIMERGE_INTEROP_THREADS",
+    "encode_batch_size": "WIKIMERGE_ENCODE_BATCH_SIZE",
+    "predict_batch_size": "WIKIMERGE_PREDICT_BATCH_SIZE",
+}
+
+# settings that depend on this process's share of the cores
+THREAD_SETTINGS = ("torch_threads", "interop_threads")
+
+# candidates the autotune benchmark tries
+BATCH_SIZE_CANDIDATES = [8, 16, 32, 64]
+
+_settings = None # resolved settings (cached after the first call)
+_applied = False # torch thread settings can only be applied once per process
+
+# function: worker_count() -> int  (processes sharing this host's cores, from WIKIMERGE_WORKERS)
+def worker_count():
+    return max(1, int(os.getenv("WIKIMERGE_WORKERS", "1")))
+
+# function: default_settings() -> dict
+def default_settings():
+    cores = os.cpu_count() or 1
+    workers = worker_count()
+    threads = max(1, cores // workers) # each worker gets its share of the cores
+    return {
+        "torch_threads": threads,
+        "interop_threads": 1 if threads <= 2 else 2, # the pipeline runs one op at a time; little to overlap
+        "encode_batch_size": 32, # sentence-transformers' own default
+        "predict_batch_size": 16
+    }
+
+def _load_tuned():
+    if not os.path.exists(RUNTIME_PATH):
+        return {}
+    try:
+        with open(RUNTIME_PATH, "r", encoding="utf-8") as f:
+            tuned = json.load(f)
+    except (ValueError, OSError):
+        return {} # corrupt or unreadable -> fall back to defaults, don't crash
+    # tuned for a different core count -> stale (e.g. the cache folder was copied to another box)
+    if tuned.get("cpu_count") != os.cpu_count():
+        return {}
+    # tuned for another number of worker processes -> its thread counts would oversubscribe (or
+    # underuse) this worker's share of the cores; the batch sizes still hold
+    stale = THREAD_SETTINGS if tuned.get("workers", 1) != worker_count() else ()
+    return {k: tuned[k] for k in ENV_VARS if k in tuned and k not in stale}
+
+# function: settings() -> dict
+def settings():
+    global _settings
+    if _settings is None:
+        resolved = default_settings()
+        resolved.update(_load_tuned())
+        for name, var in ENV_VARS.items():
+            if os.getenv(var):
+                resolved[name] = max(1, int(os.environ[var]))
+        _settings = resolved
+    return _settings
+
+# set torch's thread pools from settings(); called by the model loaders, safe to call repeatedly
+def apply():
+    global _applied
+    if _applied:
+        return
+    import torch # only needed once a model is about to load
+    s = settings()
+    torch.set_num_threads(s["torch_threads"])
+    try:
+        torch.set_num_interop_threads(s["interop_threads"])
+    except RuntimeError:
+        pass # inter-op pool already started (torch allows setting it only before first use); keep torch's choice
+    _applied = True
+
+def _best(timings):
+    return min(timings, key=timings.get)
+
+def autotune(n_texts=256, write=True):
+    """
+    Time the real models on synthetic input for each candidate thread count / batch size
+    and keep the fastest. Slow (loads both models), so run it once per host.
+    Input:
+        n_texts (int): synthetic sentences (and sentence pairs) per measurement
+        write (bool): save the result to RUNTIME_PATH so later runs pick it up
+    Output:
+        dict: the chosen settings
+    """
+    import torch
+    from src import similarity, nli
+    from src.bench import synthetic_articles
+
+    # synthetic but realistic-length sentences (the benchmark's generator)
+    a1, a2 = synthetic_articles(max(1, n_texts // 8), 8, seed=0)
+    texts = [p["text"] for paragraphs in a1.values() for p in paragraphs][:n_texts]
+    pairs = list(zip(texts, [p["text"] for paragraphs in a2.values() for p in paragraphs]))[:n_texts]
+    embedder = similarity.get_model()
+    cross_encoder = nli.get_model()
+
+    # thread count: powers of two up to this worker's share of the cores
+    limit = default_settings()["torch_threads"]
+    candidates = sorted({min(limit, 2 ** k) for k in range(limit.bit_length() + 1)})
+    thread_timings = {}
+    for threads in candidates:
+        torch.set_num_threads(threads)
+        start = time.perf_counter()
+        embedder.encode(texts, batch_size=32)
+        thread_timings[threads] = time.perf_counter() - start
+    threads = _best(thread_timings)
+    torch.set_num_threads(threads)
+
+    encode_timings = {}
+    predict_timings = {}
+    for batch_size in BATCH_SIZE_CANDIDATES:
+        start = time.perf_counter()
+        embedder.encode(texts, batch_size=batch_size)
+        encode_timings[batch_size] = time.perf_counter() - start
+        start = time.perf_counter()
+        cross_encoder.predict(pairs, batch_size=batch_size)
+        predict_timings[batch_size] = time.perf_counter() - start
+
+    tuned = dict(settings())
+    tuned.update({
+        "torch_threads": threads,
+        "encode_batch_size": _best(encode_timings),
+        "predict_batch_size": _best(predict_timings),
+        "cpu_count": os.cpu_count(),
+        "workers": worker_count()
+    })
+    if write:
+        os.makedirs(os.path.dirname(RUNTIME_PATH), exist_ok=True)
+        with open(RUNTIME_PATH, "w", encoding="utf-8") as f:
+            json.dump(tuned, f, indent=2)
+    return tuned
+
+# autotune (run from project root: python -m src.runtime)
+if __name__ == "__main__":
+    result = autotune()
+    print(json.dumps(result, indent=2))
+    print("Saved to " + RUNTIME_PATH)
@@ -0,0 +1,217 @@
+# local HTTP merge service: one long-lived process that keeps the embedding/NLI models and
+# the translation cache warm, so a merge is a request to a warm process instead of a cold
+# `python main.py` start.
+#   POST /merge   body {"url1", "url2", "title_out", and optionally "export", "site", "analysis_mode",
+#                 "analysis_tier", "deadline" (seconds)} -> {"outfile", "metrics"}
+#   GET  /health  -> {"status", "running", "queued", "models"} (models: models.stats(), per loaded model)
+# Identical concurrent requests (the same normalised config, see jobs.job_id) share one pipeline
+# run; different requests that write the same output file run one after the other. At most
+# max_concurrent merges run at once, and at most max_queued more wait for a slot; beyond that
+# the service answers 503 instead of piling up work.
+# run from project root: python -m src.server --port 8000
+
+# imports
+import json, asyncio, argparse
+from src import similarity, nli, batching, models
+from src.jobs import job_id
+from src.pipeline import run_pipeline
+from src.translate import get_translator
+from src.render import slugify, resolve_output_path
+
+DEFAULT_HOST = "127.0.0.1" # local only: there is no auth in front of this
+DEFAULT_PORT = 8000
+MAX_CONCURRENT_MERGES = 2 # each merge already uses several torch threads (see runtime.py)
+MAX_QUEUED_MERGES = 16
+MAX_BODY_BYTES = 64 * 1024
+
+# raised when both the running slots and the queue are full
+class ServiceBusy(Exception):
+    pass
+
+# the merge scheduler (HTTP-agnostic, so it can be driven directly from asyncio code)
+class MergeService:
+    def __init__(self, max_concurrent=MAX_CONCURRENT_MERGES, max_queued=MAX_QUEUED_MERGES, translator=None, backend="deepl"):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.translator = translator # shared, so its in-memory cache stays warm across merges
+        self.backend = backend # translation backend warm() creates when no translator was given
+        self._slots = None # asyncio.Semaphore, created on first use inside the running loop
+        self._inflight = {} # coalescing key -> asyncio.Task of the pipeline run
+        self._writing = {} # resolved output file -> the task currently allowed to write it
+        self.running = 0
+        self.queued = 0
+
+    # load both models and the translator up front, so the first request is as fast as the rest
+    def warm(self):
+        similarity.get_model()
+        nli.get_model()
+        if self.translator is None:
+            self.translator = get_translator(self.backend)
+
+    async def merge(self, config):
+        """
+        Input:
+            config (dict): run_pipeline config (url1, url2, title_out, outfile, ...)
+        Output:
+            dict: the run's metrics; a request identical to one already in flight waits
+                  for that run instead of starting its own
+        """
+        key = job_id(config) # every setting: a request with export must not join a run without it
+        task = self._inflight.get(key)
+        if task is None:
+            if self.running + self.queued >= self.max_concurrent + self.max_queued:
+                raise ServiceBusy("Too many merges in progress, try again later")
+            self.queued += 1 # counted right away, so a burst in one loop tick can't overshoot the queue
+            task = asyncio.ensure_future(self._run(config))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: a client that disconnects must not cancel a run other clients are waiting on
+        return await asyncio.shield(task)
+
+    async def _run(self, config):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        outfile = resolve_output_path(config.get("outfile", ""))
+        try:
+            # another run writing the same file (e.g. two titles with the same slug): wait for it
+            while outfile in self._writing:
+                await asyncio.wait([self._writing[outfile]])
+            self._writing[outfile] = asyncio.current_task()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                del self._writing[outfile]
+                raise
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            # the pipeline is blocking (network + torch, which releases the GIL), so run it on a thread
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, run_pipeline, config, self.translator)
+        finally:
+            self.running -= 1
+            self._slots.release()
+            del self._writing[outfile]
+
+# -- minimal HTTP/1.1 front end (stdlib only; one request per connection) -----------
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+async def _respond(writer, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        "HTTP/1.1 " + str(status) + " " + STATUS_TEXT[status] + "\r\n"
+        "Content-Type: application/json\r\n"
+        "Content-Length: " + str(len(body)) + "\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode("ascii") + body)
+    await writer.drain()
+
+# turn a /merge body into a run_pipeline config (ValueError -> 400)
+def _merge_config(body):
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise ValueError("Request body must be JSON")
+    if not isinstance(data, dict) or not data.get("url1") or not data.get("url2"):
+        raise ValueError("Request body must contain url1 and url2")
+    title_out = str(data.get("title_out") or "").strip()
+    return {
+        "url1": str(data["url1"]).strip(),
+        "url2": str(data["url2"]).strip(),
+        "title_out": title_out,
+        "outfile": slugify(title_out) + ".html",
+        "export": bool(data.get("export")),
+        "site": bool(data.get("site")),
+        "analysis_mode": str(data.get("analysis_mode") or "paragraph"),
+        "analysis_tier": str(data.get("analysis_tier") or "full"),
+        "deadline": float(data["deadline"]) if data.get("deadline") is not None else None
+    }
+
+# function: _content_length(headers: dict) -> int  (ValueError -> 400: not a number, or negative)
+def _content_length(headers):
+    value = headers.get("content-length", "0") or "0"
+    try:
+        length = int(value)
+    except ValueError:
+        raise ValueError("Invalid Content-Length: " + value)
+    if length < 0:
+        raise ValueError("Invalid Content-Length: " + value)
+    return length
+
+async def _handle(service, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) < 2:
+            return await _respond(writer, 400, {"error": "Malformed request line"})
+        method, path = request_line[0], request_line[1]
+
+        if method == "GET" and path == "/health":
+            return await _respond(writer, 200, {"status": "ok", "running": service.running, "queued": service.queued,
+                                                  "models": models.stats()})
+        if not (method == "POST" and path == "/merge"):
+            return await _respond(writer, 404, {"error": "Unknown endpoint " + method + " " + path})
+
+        try:
+            length = _content_length(headers)
+        except ValueError as e:
+            return await _respond(writer, 400, {"error": str(e)})
+        if length > MAX_BODY_BYTES:
+            return await _respond(writer, 413, {"error": "Request body too large"})
+        body = await reader.readexactly(length) if length else b""
+
+        try:
+            config = _merge_config(body)
+            metrics = await service.merge(config)
+        except ServiceBusy as e:
+            return await _respond(writer, 503, {"error": str(e)})
+        except ValueError as e:
+            # bad URL, missing article, unsupported language -> the caller's input
+            return await _respond(writer, 400, {"error": str(e)})
+        except Exception as e:
+            return await _respond(writer, 500, {"error": str(e)})
+        await _respond(writer, 200, {"outfile": resolve_output_path(config["outfile"]), "metrics": metrics})
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass # client went away mid-request; nothing to answer
+    finally:
+        writer.close()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None):
+    if service is None:
+        service = MergeService()
+        service.warm()
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port)
+    print("Wikimerge service listening on http://" + host + ":" + str(port))
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Wikimerge as a local HTTP service with warm models.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT_MERGES)
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED_MERGES)
+    parser.add_argument("--batch-wait-ms", type=float, default=batching.DEFAULT_MAX_WAIT_MS,
+                        help="how long inference requests from concurrent merges are gathered into one batch")
+    parser.add_argument("--batch-size", type=int, default=batching.DEFAULT_MAX_BATCH)
+    parser.add_argument("--no-batching", action="store_true", help="run every inference call on its own")
+    parser.add_argument("--translator", choices=["deepl", "local"], default="deepl",
+                        help="translation backend: DeepL API or offline MarianMT models")
+    args = parser.parse_args()
+
+    if not args.no_batching:
+        batching.enable(args.batch_size, args.batch_wait_ms)
+
+    merge_service = MergeService(args.max_concurrent, args.max_queued, backend=args.translator)
+    merge_service.warm()
+    asyncio.run(serve(args.host, args.port, merge_service))
@@ -1,20 +1,83 @@
 # imports
+import numpy as np
 from sentence_transformers import SentenceTransformer, util
+from src import metrics, profiling, runtime, models, bundle
 
 # embedding model (small, fast, CPU-friendly; built for symmetric semantic similarity)
 EMBED_MODEL = "all-MiniLM-L6-v2"
 
-# lazy singleton so the model is loaded once and reused (loading takes a few seconds)
-_model = None
+# loaded once on first use and shared by every thread (loading takes a few seconds); the
+# registry may unload it again when a memory budget is set and it sits idle. Comes from the
+# local model bundle when one was exported (no hub access), else from the hub
+def _load_model():
+    runtime.apply() # thread pools must be sized before the first model runs
+    return SentenceTransformer(bundle.resolve(EMBED_MODEL))
+models.register(EMBED_MODEL, _load_model, metric="embed_model_load_seconds")
+
 def get_model():
-    global _model
-    if _model is None:
-        _model = SentenceTransformer(EMBED_MODEL)
-    return _model
+    return models.get(EMBED_MODEL)
+
+# multilingual model (same architecture family, trained so a sentence and its translation land
+# close together): compares text across languages without translating it first
+MULTILINGUAL_EMBED_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+def _load_multilingual_model():
+    runtime.apply()
+    return SentenceTransformer(bundle.resolve(MULTILINGUAL_EMBED_MODEL))
+models.register(MULTILINGUAL_EMBED_MODEL, _load_multilingual_model, metric="multilingual_embed_model_load_seconds")
+
+def get_multilingual_model():
+    return models.get(MULTILINGUAL_EMBED_MODEL)
+
+# cross-request batcher in front of the model (None = call it directly); set by batching.enable()
+_batcher = None
+
+# the actual model call: list of texts -> array of vectors
+def _encode(texts):
+    with models.in_use(EMBED_MODEL): # not unloaded mid-call
+        return get_model().encode(texts, batch_size=runtime.settings()["encode_batch_size"])
 
 # embed a list of texts into vectors
 def embed(texts):
-    return get_model().encode(texts)
+    get_model() # outside the span, so a cold load is reported as load time, not embed time
+    metrics.incr("texts_embedded", len(texts))
+    with metrics.span("embed"), profiling.torch_trace("embed"):
+        if _batcher is not None:
+            return _batcher.submit(texts) # joins other merges' texts into one model call
+        return _encode(texts)
+
+# embed texts in any language with the multilingual model
+def embed_multilingual(texts):
+    get_multilingual_model()
+    metrics.incr("texts_embedded_multilingual", len(texts))
+    with metrics.span("embed_multilingual"), profiling.torch_trace("embed_multilingual"), models.in_use(MULTILINGUAL_EMBED_MODEL):
+        return get_multilingual_model().encode(texts, batch_size=runtime.settings()["encode_batch_size"])
+
+# cosine similarity matrix between two lists of texts in (possibly) different languages
+def multilingual_similarity_matrix(texts_a, texts_b):
+    return util.cos_sim(embed_multilingual(texts_a), embed_multilingual(texts_b))
+
+# function: embed_articles(articles: list[dict], embed_fn: callable | None) -> list[dict[str, np.ndarray]]
+# embed every paragraph of several translated articles in one batch; per article,
+# section -> (n_paragraphs, dim) array of its paragraphs' vectors (in paragraph order).
+# embed_fn defaults to embed (the English model); pass embed_multilingual for untranslated text
+def embed_articles(articles, embed_fn=None):
+    embed_fn = embed_fn or embed
+    texts = [r["translated"] for article in articles for records in article.values() for r in records]
+    vectors = np.asarray(embed_fn(texts)) if texts else np.zeros((0, 0))
+    out = []
+    pos = 0
+    for article in articles:
+        by_section = {}
+        for section, records in article.items():
+            by_section[section] = vectors[pos:pos + len(records)]
+            pos += len(records)
+        out.append(by_section)
+    return out
+
+# cosine similarity matrix between two sets of already-embedded vectors (shape: len(a) x len(b))
+def cos_sim(vectors_a, vectors_b):
+    return util.cos_sim(vectors_a, vectors_b)
 
 # cosine similarity matrix between two lists of texts (shape: len(texts_a) x len(texts_b))
 def similarity_matrix(texts_a, texts_b):
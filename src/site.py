@@ -0,0 +1,195 @@
+# static site generation: every finished merge rendered into one folder that any web server can
+# serve as-is, with an index page linking them all.
+#   cache/pages/<slug>.json   what a page is rendered from: pipeline runs with "site" set record
+#                             their merge here (record_page), and it stays until removed (remove_page)
+#   site/<slug>.html (+ .gz, + .br when the brotli package is installed)
+#   site/index.html, site/static/wikipedia-style.css (precompressed the same way)
+#   site/site.json   manifest: file -> digest of what it was rendered from
+# All pages come from the one compiled template (render.get_template). A rebuild only rewrites
+# the files whose input changed: a page's analysis, title or languages, or the template version.
+# Pages that are no longer part of the site are removed, and so are precompressed variants a build
+# no longer writes. Files are replaced atomically, so a server never sends half a page.
+# run from project root: python -m src.site   (python -m src.site --remove <slug> takes a page down)
+
+# imports
+import os, json, gzip, hashlib, tempfile, argparse
+from src import render
+from src.storage import atomic_write_json, read_json
+
+try:
+    import brotli # optional: smaller than gzip for text
+except ImportError:
+    brotli = None
+
+SITE_DIR = os.path.join(render.BASE_DIR, "site")
+PAGES_DIR = os.path.join(render.BASE_DIR, "cache", "pages")
+CSS_FILE = "wikipedia-style.css"
+VARIANTS = ("gz", "br")
+RESERVED_SLUGS = ("index", "site") # index.html and site.json belong to the site itself
+
+# function: _digest(*parts) -> str
+def _digest(*parts):
+    return hashlib.sha256(json.dumps([render.TEMPLATE_VERSION] + list(parts), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+# function: _write_atomic(path: str, data: bytes) -> None
+def _write_atomic(path, data):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+# function: _variants(compress: bool) -> list[str]  (the precompressed copies a build writes)
+def _variants(compress):
+    if not compress:
+        return []
+    return ["gz", "br"] if brotli is not None else ["gz"]
+
+# a file plus its precompressed variants (gzip level 9 with a fixed mtime: same input, same bytes);
+# a variant not written this time is removed, so a server never sends an outdated one
+def _write_file(path, data, variants):
+    _write_atomic(path, data)
+    for variant in VARIANTS:
+        if variant not in variants:
+            if os.path.exists(path + "." + variant):
+                os.remove(path + "." + variant)
+        elif variant == "gz":
+            _write_atomic(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        else:
+            _write_atomic(path + ".br", brotli.compress(data))
+
+def _remove_file(path):
+    for p in [path] + [path + "." + variant for variant in VARIANTS]:
+        if os.path.exists(p):
+            os.remove(p)
+
+# function: languages(analysis: dict) -> tuple[str, str]
+# both editions' language tags, read off the paragraph records (for pages recorded without them)
+def languages(analysis):
+    lang1 = lang2 = ""
+    for info in analysis.values():
+        for pair in info.get("agree", []) + info.get("contradict", []) + info.get("neutral", []):
+            lang1, lang2 = lang1 or pair["a1"]["lang"], lang2 or pair["a2"]["lang"]
+        for rec in info.get("unique_a1", []):
+            lang1 = lang1 or rec["lang"]
+        for rec in info.get("unique_a2", []):
+            lang2 = lang2 or rec["lang"]
+    return lang1, lang2
+
+# function: page_slug(slug: str) -> str
+# the page name a merge gets on the site: its output file's slug, unless that names one of the
+# site's own files (a merge titled "Index" becomes index-page.html, not index.html)
+def page_slug(slug):
+    return slug + "-page" if slug in RESERVED_SLUGS else slug
+
+# function: record_page(slug: str, title: str, analysis: dict, lang1: str, lang2: str, root: str) -> str
+# add a merge to the site's pages (or replace the page with this slug); returns the page's slug
+# (see page_slug). Called by pipeline runs with "site" set
+def record_page(slug, title, analysis, lang1, lang2, root=PAGES_DIR):
+    slug = page_slug(slug)
+    atomic_write_json(os.path.join(root, slug + ".json"), {"title": title, "analysis": analysis, "lang1": lang1, "lang2": lang2})
+    return slug
+
+# function: remove_page(slug: str, root: str) -> bool  (False if there was no such page)
+def remove_page(slug, root=PAGES_DIR):
+    path = os.path.join(root, slug + ".json")
+    if not os.path.exists(path):
+        return False
+    os.remove(path)
+    return True
+
+# function: load_pages(root: str) -> list[dict]
+# every recorded page, in index order (by title)
+def load_pages(root=PAGES_DIR):
+    if not os.path.isdir(root):
+        return []
+    pages = []
+    for name in os.listdir(root):
+        if not name.endswith(".json"):
+            continue
+        entry = read_json(os.path.join(root, name))
+        if entry is None:
+            continue
+        lang1, lang2 = (entry["lang1"], entry["lang2"]) if entry.get("lang1") and entry.get("lang2") else languages(entry["analysis"])
+        pages.append({"slug": page_slug(name[:-len(".json")]), "title": entry["title"], "analysis": entry["analysis"], "lang1": lang1, "lang2": lang2})
+    return sorted(pages, key=lambda page: page["title"].lower())
+
+def build_site(pages, out_dir=SITE_DIR, title="Wikimerge", compress=True):
+    """
+    Input:
+        pages (list[dict]): {"slug", "title", "analysis", "lang1", "lang2"} per page, in index order
+        out_dir (str): site folder
+        title (str): index page heading
+        compress (bool): also write .gz (and .br) next to every file
+    Output:
+        dict: {"written": n, "unchanged": n, "removed": n} (index and stylesheet included)
+    """
+    manifest_path = os.path.join(out_dir, "site.json")
+    old = read_json(manifest_path, {})
+    new = {}
+    stats = {"written": 0, "unchanged": 0, "removed": 0}
+
+    # the variants are part of every digest: installing or removing brotli, or turning compression
+    # off, rewrites the files (and drops the variants no longer wanted)
+    variants = _variants(compress)
+
+    def emit(name, digest, produce):
+        new[name] = digest
+        path = os.path.join(out_dir, name)
+        if old.get(name) == digest and all(os.path.exists(p) for p in [path] + [path + "." + v for v in variants]):
+            stats["unchanged"] += 1
+            return
+        _write_file(path, produce(), variants)
+        stats["written"] += 1
+
+    # stylesheet (pages link it relative to the site root)
+    with open(os.path.join(render.STATIC_DIR, CSS_FILE), "rb") as f:
+        css = f.read()
+    css_name = "static/" + CSS_FILE
+    emit(css_name, _digest(hashlib.sha256(css).hexdigest(), variants), lambda: css)
+
+    slugs = set()
+    entries = []
+    for page in pages:
+        if page["slug"] in slugs or page["slug"] in RESERVED_SLUGS:
+            raise ValueError("Duplicate or reserved page slug: " + page["slug"])
+        slugs.add(page["slug"])
+        emit(page["slug"] + ".html",
+             _digest(page["title"], page["analysis"], page["lang1"], page["lang2"], variants),
+             lambda page=page: render.render_page(page["title"], page["analysis"], css_name,
+                                                  page["lang1"], page["lang2"]).encode("utf-8"))
+        entries.append({"href": page["slug"] + ".html", "title": page["title"], "lang1": page["lang1"], "lang2": page["lang2"],
+                        "agree": sum(len(info["agree"]) for info in page["analysis"].values()),
+                        "contradict": sum(len(info["contradict"]) for info in page["analysis"].values())})
+
+    emit("index.html", _digest(title, entries, variants),
+         lambda: render.get_template("index_template.html").render(title=title, pages=entries, css_href=css_name).encode("utf-8"))
+
+    # pages dropped from the site since the last build
+    for name in old:
+        if name not in new:
+            _remove_file(os.path.join(out_dir, name))
+            stats["removed"] += 1
+
+    atomic_write_json(manifest_path, new)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every recorded merge into a static site.")
+    parser.add_argument("--pages", default=PAGES_DIR, help="recorded pages to build from (default: " + PAGES_DIR + ")")
+    parser.add_argument("--out", default=SITE_DIR)
+    parser.add_argument("--title", default="Wikimerge")
+    parser.add_argument("--no-compress", action="store_true", help="skip the .gz / .br files")
+    parser.add_argument("--remove", action="append", default=[], metavar="SLUG", help="take a page off the site first")
+    args = parser.parse_args()
+
+    for slug in args.remove:
+        if not remove_page(slug, args.pages):
+            print("No page " + slug)
+    site_stats = build_site(load_pages(args.pages), args.out, args.title, compress=not args.no_compress)
+    print("Site in " + args.out + ": " + ", ".join(str(n) + " " + k for k, n in site_stats.items()))
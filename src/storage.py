@@ -0,0 +1,27 @@
+# small on-disk helpers shared by the caches and stores under cache/
+# imports
+import os, json, tempfile
+
+# function: atomic_write_json(path: str, data) -> None
+# write to a temp file in the same folder, then rename over the target: readers (and a
+# crash mid-write) only ever see the old file or the complete new one, never half of one
+def atomic_write_json(path, data):
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+# function: read_json(path: str, default=None)
+# missing, corrupt or unreadable file -> default (callers treat that as "not stored yet")
+def read_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return default
@@ -1,24 +1,81 @@
 # imports
-import os, json, hashlib, requests
+import os, re, abc, json, hashlib, threading, requests
 from dotenv import load_dotenv
-
-# Translator
-class DeepLTranslator:
-    # initialiser
-    def __init__(self):
-        load_dotenv() # look for .env in project root
-        api_key = os.getenv("DEEPL_API_KEY") # get api key from .env
-        if not api_key: # check api_key is not empty
-            raise RuntimeError(
-                "DEEPL_API_KEY is missing. Add it to your .env file."
-            )
-        self.api_key = api_key # assign api key to translator
-
-        # set up translation cache (avoids re-calling DeepL for text already translated)
-        self.cache_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), "cache", "translations.json"
-        ) # project_root/cache/translations.json
+from src import metrics
+
+# DeepL rejects requests with more than 50 texts
+DEEPL_MAX_TEXTS = 50
+
+# candidate sentence boundaries: whitespace after . ! ? ... , or directly after CJK full stops
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?\u2026])\s+|(?<=[\u3002\uff01\uff1f])")
+
+# languages written without a space between sentences
+UNSPACED_LANGS = ("ZH", "JA")
+
+# function: split_with_separators(text: str) -> tuple[list[str], list[str]]
+# split a paragraph into sentences, keeping the whitespace that separated each sentence from the
+# next ("" after a CJK full stop; the last sentence's separator is ""). A boundary only counts if
+# the next piece starts like a sentence (not with a lower-case letter), so "e.g. the" or
+# "approx. ten" stay in one piece.
+def split_with_separators(text):
+    text = text.strip()
+    pieces, gaps, pos = [], [], 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        pieces.append(text[pos:match.start()])
+        gaps.append(match.group())
+        pos = match.end()
+    pieces.append(text[pos:])
+    gaps.append("")
+
+    sentences, separators = [], []
+    for piece, gap in zip(pieces, gaps):
+        if not piece:
+            continue
+        first = piece.lstrip("\"'([\u00ab\u201c\u00bf\u00a1")[:1]
+        if sentences and first.islower():
+            sentences[-1] += separators[-1] + piece # not a real boundary: glue back on
+            separators[-1] = gap
+        else:
+            sentences.append(piece)
+            separators.append(gap)
+    if separators:
+        separators[-1] = ""
+    return sentences, separators
+
+# function: split_sentences(text: str) -> list[str]
+def split_sentences(text):
+    return split_with_separators(text)[0]
+
+# function: join_sentences(sentences: list[str], separators: list[str], target_lang: str) -> str
+# reassemble translated sentences with the separators split_with_separators removed; a boundary
+# without one (after a CJK full stop) gets a space unless the target language goes without
+def join_sentences(sentences, separators, target_lang):
+    unspaced = target_lang.split("-")[0].upper() in UNSPACED_LANGS
+    out = []
+    for i, sentence in enumerate(sentences):
+        if i:
+            gap = separators[i - 1]
+            out.append(("\n" if "\n" in gap else "") if unspaced else (gap or " "))
+        out.append(sentence)
+    return "".join(out)
+
+# target language of every translation (the merged page is in English)
+TARGET_LANG = "EN-GB"
+
+# cache files live in project_root/cache/
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache")
+
+# Translator interface: what translate_article depends on (translate_batch, translate_text,
+# normalise_lang_code, save_cache). Holds the shared on-disk cache handling; a backend only
+# implements _translate_missing.
+class Translator(abc.ABC):
+    backend = None # name get_translator knows this backend by (part of the result cache key)
+
+    # set up translation cache (avoids re-translating text already translated); one file per backend
+    def _init_cache(self, filename):
+        self.cache_path = os.path.join(CACHE_DIR, filename)
         self.cache = self._load_cache() # load existing cache (empty dict if none)
+        self._save_lock = threading.Lock() # one translator may be shared by concurrent merges (see server.py)
 
     # build a unique cache key for a piece of text + its language pair
     def _cache_key(self, text, source_lang, target_lang):
@@ -38,64 +95,23 @@ class DeepLTranslator:
     # save the translation cache to disk as json
     def save_cache(self):
         os.makedirs(os.path.dirname(self.cache_path), exist_ok=True) # make sure cache/ folder exists
-        with open(self.cache_path, "w", encoding="utf-8") as f:
-            json.dump(self.cache, f, ensure_ascii=False, indent=2) # write dict out as readable json
+        with self._save_lock:
+            snapshot = dict(self.cache) # copy first: another merge may add entries while we write
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2) # write dict out as readable json
 
-    # translate text
+    # backend hook: translate texts that are not cached yet, in order (language codes already normalised)
+    @abc.abstractmethod
+    def _translate_missing(self, texts, source_lang, target_lang):
+        ...
+
+    # translate one text (through translate_batch, so it shares the cache and the backend's batching)
     def translate_text(self, text: str, source_lang: str, target_lang: str):
-        # check text is not empty
         if text is None or text == "":
             raise ValueError("Text to translate cannot be empty")
         if not text.strip():
             return ""
-        
-        # check length of text (DeepL free tier limit is 5000 characters)
-        if len(text) > 5000:
-            raise ValueError("Text to translate exceeds 5000 character limit")
-        
-        # normalise language codes
-        source_lang = self.normalise_lang_code(source_lang)
-        target_lang = self.normalise_lang_code(target_lang)
-
-        # check cache first (skip the API if we already translated this exact text)
-        key = self._cache_key(text, source_lang, target_lang)
-        if key in self.cache:
-            return self.cache[key]["translated"] # cache hit -> return saved translation
-
-        # choose DeepL endpoint (for now it is free)
-        endpoint = "https://api-free.deepl.com/v2/translate"
-
-        # build request data
-        data = {
-            "text": text,
-            "source_lang": source_lang,
-            "target_lang": target_lang,
-        }
-
-        # authenticate via header (DeepL no longer accepts auth_key in the body)
-        headers = {"Authorization": "DeepL-Auth-Key " + self.api_key}
-
-        # send request
-        try:
-            response = requests.post(endpoint, data=data, headers=headers)
-        except requests.RequestException as e:
-            raise RuntimeError("Error connecting to DeepL API: " + str(e))
-
-        # error handling
-        if response.status_code == 400 and "not supported" in response.text.lower():
-            raise ValueError("DeepL API error: Unsupported language code(s) " + source_lang + " or " + target_lang)
-        if response.status_code != 200:
-            raise RuntimeError("DeepL API error " + str(response.status_code) + ": " + response.text)
-
-        # parse response & return translated text as string
-        try:
-            data = response.json()
-            translated_text = data["translations"][0]["text"]
-            self.cache[key] = {"original": text, "translated": translated_text} # save to cache for next time
-            return translated_text
-        except ValueError:
-            # JSON decoding error
-            raise RuntimeError("Error decoding DeepL API response")
+        return self.translate_batch([text], source_lang, target_lang)[0]
 
     # translate list of text in batch
     def translate_batch(self, texts: list[str], source_lang: str, target_lang: str):
@@ -112,26 +128,107 @@ class DeepLTranslator:
         source_lang = self.normalise_lang_code(source_lang)
         target_lang = self.normalise_lang_code(target_lang)
 
-        # split texts into cache hits (already translated) and misses (need the API)
+        # split texts into cache hits (already translated) and misses (need the backend)
         keys = [self._cache_key(t, source_lang, target_lang) for t in texts] # one key per text
         results = [None] * len(texts) # final translations, filled by position
         missing_indices = [] # positions whose text is not cached yet
-        missing_texts = [] # the actual texts we still need to send to DeepL
+        missing_texts = [] # the actual texts we still need to send to the backend
         for i, key in enumerate(keys):
             if key in self.cache:
                 results[i] = self.cache[key]["translated"] # cache hit -> reuse saved translation
             else:
                 missing_indices.append(i) # remember where this text belongs
                 missing_texts.append(texts[i])
+        metrics.incr("translation_cache_hits", len(texts) - len(missing_texts))
+        metrics.incr("translation_cache_misses", len(missing_texts))
 
-        # only call DeepL if at least one text is uncached
+        # only call the backend if at least one text is uncached
         if missing_texts:
+            translated_texts = self._translate_missing(missing_texts, source_lang, target_lang)
+
+            # slot each new translation back into its original position + save to cache
+            for idx, translated in zip(missing_indices, translated_texts):
+                results[idx] = translated
+                self.cache[keys[idx]] = {"original": texts[idx], "translated": translated}
+
+        # return list of translated strings in the same order
+        return results
+    
+    # normalise text code (from wikipediaapi format to the translator's format)
+    def normalise_lang_code(self, lang:str):
+        code = lang.strip().upper() # strip whitespace and uppercase
+        if code == "SIMPLE": # simple english wikipedia -> treat as english for DeepL
+            return "EN"
+        return code
+
+# DeepL API backend
+class DeepLTranslator(Translator):
+    backend = "deepl"
+
+    # initialiser (sentence_memory: cache and send uncached paragraphs sentence by sentence, see
+    # _translate_by_sentence; off by default, since DeepL then translates each sentence without
+    # the rest of its paragraph as context)
+    def __init__(self, sentence_memory=False):
+        load_dotenv() # look for .env in project root
+        api_key = os.getenv("DEEPL_API_KEY") # get api key from .env
+        if not api_key: # check api_key is not empty
+            raise RuntimeError(
+                "DEEPL_API_KEY is missing. Add it to your .env file."
+            )
+        self.api_key = api_key # assign api key to translator
+        self._init_cache("translations.json") # project_root/cache/translations.json
+        self.sentence_memory = sentence_memory
+
+    # translate one text: the free tier's 5000-character limit, then the shared path (cache, sentence memory, request)
+    def translate_text(self, text: str, source_lang: str, target_lang: str):
+        if text is not None and len(text) > 5000:
+            raise ValueError("Text to translate exceeds 5000 character limit")
+        return super().translate_text(text, source_lang, target_lang)
+
+    def _translate_missing(self, texts, source_lang, target_lang):
+        if self.sentence_memory:
+            return self._translate_by_sentence(texts, source_lang, target_lang)
+        return self._request_translations(texts, source_lang, target_lang)
+
+    # sentence-level translation memory: split each (uncached) paragraph into sentences, look
+    # every sentence up in the cache on its own, send DeepL only the sentences it hasn't seen
+    # (deduplicated), then reassemble the paragraphs. A paragraph with one edited sentence
+    # thus costs one sentence of quota instead of the whole paragraph.
+    def _translate_by_sentence(self, texts, source_lang, target_lang):
+        split = [split_with_separators(t) for t in texts] # whitespace-only text -> no sentences -> ""
+        sentence_keys = [[self._cache_key(x, source_lang, target_lang) for x in sentences] for sentences, _ in split]
+
+        # unique sentences still missing from the memory (dict keeps first-seen order)
+        needed = {}
+        for (sentences, _), keys in zip(split, sentence_keys):
+            for sentence, key in zip(sentences, keys):
+                if key not in self.cache:
+                    needed.setdefault(key, sentence)
+        total = sum(len(keys) for keys in sentence_keys)
+        metrics.incr("translation_memory_sentence_hits", total - len(needed))
+        metrics.incr("translation_memory_sentence_misses", len(needed))
+
+        if needed:
+            translated = self._request_translations(list(needed.values()), source_lang, target_lang)
+            for (key, sentence), t in zip(needed.items(), translated):
+                self.cache[key] = {"original": sentence, "translated": t}
+
+        return [join_sentences([self.cache[key]["translated"] for key in keys], separators, target_lang)
+                for (_, separators), keys in zip(split, sentence_keys)]
+
+    # send texts to DeepL (uncached only; callers check the cache), in requests of at most
+    # DEEPL_MAX_TEXTS texts, and return the translations in the same order
+    def _request_translations(self, texts, source_lang, target_lang):
+        out = []
+        for pos in range(0, len(texts), DEEPL_MAX_TEXTS):
+            chunk = texts[pos:pos + DEEPL_MAX_TEXTS]
+
             # choose DeepL endpoint (for now it is free)
             endpoint = "https://api-free.deepl.com/v2/translate"
 
             # build request data (only the uncached texts)
             data = {
-                "text": missing_texts,
+                "text": chunk,
                 "source_lang": source_lang,
                 "target_lang": target_lang,
             }
@@ -140,8 +237,11 @@ class DeepLTranslator:
             headers = {"Authorization": "DeepL-Auth-Key " + self.api_key}
 
             # send request
+            metrics.incr("deepl_requests")
+            metrics.incr("deepl_chars_sent", sum(len(t) for t in chunk))
             try:
-                response = requests.post(endpoint, data=data, headers=headers)
+                with metrics.span("deepl_round_trip"):
+                    response = requests.post(endpoint, data=data, headers=headers)
             except requests.RequestException as e:
                 raise RuntimeError("Error connecting to DeepL API: " + str(e))
 
@@ -159,43 +259,103 @@ class DeepLTranslator:
                 # JSON decoding error
                 raise RuntimeError("Error decoding DeepL API response")
 
-            # guard against a short response: without this, zip() below would stop early and leave some results[idx] as None
-            if len(translated_texts) != len(missing_texts):
+            # guard against a short response: without this, callers zipping the result would stop early and leave some translations as None
+            if len(translated_texts) != len(chunk):
                 raise RuntimeError(
                     "DeepL API returned " + str(len(translated_texts)) +
-                    " translations for " + str(len(missing_texts)) + " requested texts"
+                    " translations for " + str(len(chunk)) + " requested texts"
                 )
+            out.extend(translated_texts)
+        return out
 
-            # slot each new translation back into its original position + save to cache
-            for idx, translated in zip(missing_indices, translated_texts):
-                results[idx] = translated
-                self.cache[keys[idx]] = {"original": texts[idx], "translated": translated}
-
-        # return list of translated strings in the same order
-        return results
-    
-    # normalise text code (from wikipediaapi format to DeepLTranslator format)
-    def normalise_lang_code(self, lang:str):
-        code = lang.strip().upper() # strip whitespace and uppercase
-        if code == "SIMPLE": # simple english wikipedia -> treat as english for DeepL
-            return "EN"
-        return code
-
+TRANSLATION_BACKENDS = ("deepl", "local")
+
+# function: get_translator(backend: str, sentence_memory: bool) -> Translator
+#   "deepl" -> DeepL API (needs DEEPL_API_KEY and network; best quality); sentence_memory opts in
+#              to DeepLTranslator's sentence-level translation memory
+#   "local" -> MarianMT running on this machine (no key, no quota; see local_translate.py)
+def get_translator(backend="deepl", sentence_memory=False):
+    if backend == "deepl":
+        return DeepLTranslator(sentence_memory=sentence_memory)
+    if backend == "local":
+        from src.local_translate import LocalTranslator # imported lazily: pulls in transformers
+        return LocalTranslator()
+    raise ValueError("Unknown translation backend: " + str(backend) + " (expected one of " + ", ".join(TRANSLATION_BACKENDS) + ")")
+
+# a translator created on first real use. Language checks (normalise_lang_code, is_target_language)
+# don't need the backend, so a run whose articles are all English never builds one (and never
+# needs DEEPL_API_KEY); anything else is handed to the real translator, built by get_translator
+class LazyTranslator:
+    def __init__(self, backend="deepl", sentence_memory=False):
+        self.backend = backend
+        self.sentence_memory = sentence_memory
+        self._translator = None
+        self._lock = threading.Lock() # the background display translation may ask from two threads at once
+
+    # function: get() -> Translator
+    def get(self):
+        if self._translator is None:
+            with self._lock:
+                if self._translator is None:
+                    self._translator = get_translator(self.backend, sentence_memory=self.sentence_memory)
+        return self._translator
+
+    def normalise_lang_code(self, lang):
+        return Translator.normalise_lang_code(self, lang) # the same for every backend
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
 
 # function to translate paragraph (use for testing)
 def translate_paragraph(paragraph, src_lang, translator):
     # return translated paragraph as string
-    return translator.translate_text(paragraph, src_lang, "EN-GB")
+    return translator.translate_text(paragraph, src_lang, TARGET_LANG)
 
 # translate a list of texts in chunks of batch_size, (because DeepL free tier rejects requests with >50 texts).
+# Repeated texts (e.g. the same heading in both articles) are translated once.
 # Translations are returned in the same order as items; an empty list is returned untouched (no API call).
-def _translate_in_batches(items, src_lang, translator, batch_size=50):
-    out = []
+def _translate_in_batches(items, src_lang, translator, batch_size=DEEPL_MAX_TEXTS):
+    unique = list(dict.fromkeys(items)) # first-seen order, so chunking stays deterministic
+    translated = []
     pos = 0
-    while pos < len(items):
-        chunk = items[pos:pos+batch_size]
-        out.extend(translator.translate_batch(chunk, src_lang, "EN-GB")) # translate chunk and append to out
+    while pos < len(unique):
+        chunk = unique[pos:pos+batch_size]
+        translated.extend(translator.translate_batch(chunk, src_lang, TARGET_LANG)) # translate chunk and append to translated
         pos += batch_size
+    mapping = dict(zip(unique, translated))
+    return [mapping[item] for item in items]
+
+# function: is_target_language(src_lang: str, translator: Translator) -> bool
+# True when src_lang already is the target language (en, simple), so there is nothing to translate
+def is_target_language(src_lang, translator):
+    target = translator.normalise_lang_code(TARGET_LANG).split("-")[0] # EN-GB -> EN: any English edition counts
+    return translator.normalise_lang_code(src_lang) == target
+
+# function: translate_texts(texts: list[str], src_lang: str, translator: Translator) -> list[str]
+# English text of loose texts, in order (deduplicated and chunked like the article passes; passed
+# through unchanged when the source already is English, blank texts stay blank without an API call)
+def translate_texts(texts, src_lang, translator):
+    if is_target_language(src_lang, translator):
+        return list(texts)
+    todo = [t for t in texts if t.strip()]
+    mapping = dict(zip(todo, _translate_in_batches(todo, src_lang, translator))) if todo else {}
+    return [mapping.get(t, t) for t in texts]
+
+# function: untranslated_article(article_dict: dict, src_lang: str) -> dict
+# same record layout as a translated article, with translated = original (and section titles/headings kept)
+def untranslated_article(article_dict, src_lang):
+    out = {}
+    for section, paragraphs in article_dict.items():
+        out[section] = []
+        for i, p in enumerate(paragraphs):
+            text = "" if p["text"] is None else str(p["text"])
+            out[section].append({
+                "lang": src_lang.upper(),
+                "original": text,
+                "translated": text,
+                "idx": i,
+                "heading": p.get("heading")
+            })
     return out
 
 # function to translate article
@@ -203,43 +363,45 @@ def translate_article(article_dict, src_lang, translator):
     # check inputs are valid types
     if not isinstance(article_dict, dict):
         raise ValueError("Article must be a dictionary of section -> list of paragraphs")
+    return translate_articles([article_dict], src_lang, translator)[0]
 
-    # empty article: nothing to translate or cache, so return early.
-    if not article_dict:
-        return {}
+# function: translate_articles(article_dicts: list[dict], src_lang: str, translator: Translator) -> list[dict]
+# translate several articles written in the same source language in one shared pass: section titles,
+# headings and paragraphs of all articles go out together (deduplicated), so text the articles have in
+# common is translated once and the batches are as full as possible.
+def translate_articles(article_dicts, src_lang, translator):
+    # check inputs are valid types
+    if not all(isinstance(a, dict) for a in article_dicts):
+        raise ValueError("Article must be a dictionary of section -> list of paragraphs")
+
+    # empty articles: nothing to translate or cache, so return early.
+    if not any(article_dicts):
+        return [{} for _ in article_dicts]
+
+    # already in the target language (en/simple): records are built directly, no API calls, no cache writes
+    if is_target_language(src_lang, translator):
+        metrics.incr("translation_skipped_paragraphs", sum(len(ps) for a in article_dicts for ps in a.values()))
+        return [untranslated_article(a, src_lang) for a in article_dicts]
 
     # wrap all translation work in try/finally so cache is written exactly once, (whether run completes or a batch raises partway through).
     try:
-        # translate section titles & make a mapping of old to new titles.
+        # translate section titles of every article in one pass.
         # "Lead" is a synthetic English-only key inserted by article.py an is used downstream, so exempt it from translation and re-insert it verbatim.
-        section_names = list(article_dict.keys())
-        non_lead_names = [s for s in section_names if s != "Lead"]
-        translated_non_lead = _translate_in_batches(non_lead_names, src_lang, translator)
-
-        # build original -> translated mapping. If two source titles translate to the same string
-        # suffix later ones with " (2)", " (3)", etc, so their paragraphs stay in separate sections instead of silently merging under one key.
-        translated_counts = {}
-        section_map = {}
-        for orig, translated in zip(non_lead_names, translated_non_lead):
-            translated_counts[translated] = translated_counts.get(translated, 0) + 1
-            n = translated_counts[translated]
-            section_map[orig] = translated if n == 1 else translated + " (" + str(n) + ")"
-        if "Lead" in article_dict:
-            section_map["Lead"] = "Lead" # edge case: a translated title could in theory collide with the literal "Lead"
-
-        # prepare output with translated section keys (from section_map, so keys match the append loop below)
-        out = {translated: [] for translated in section_map.values()}
-
-        # build flat list (each paragraph also carries the subsection heading it came from, if any, per article.py's collect_paragraphs)
-        flat_list = [] # {"section": "...", "idx": ..., "text": "...", "heading": "..." or None}
-        for section, paragraphs in article_dict.items():
-            for i, p in enumerate(paragraphs):
-                flat_list.append({
-                    "section": section,
-                    "idx": i,
-                    "text": ("" if p["text"] is None else str(p["text"])),
-                    "heading": p.get("heading")
-                })
+        non_lead_names = [[s for s in a.keys() if s != "Lead"] for a in article_dicts]
+        translated_names = _translate_in_batches([s for names in non_lead_names for s in names], src_lang, translator)
+
+        # build flat list over all articles (each paragraph also carries the subsection heading it came from, if any, per article.py's collect_paragraphs)
+        flat_list = [] # {"article": n, "section": "...", "idx": ..., "text": "...", "heading": "..." or None}
+        for n, article_dict in enumerate(article_dicts):
+            for section, paragraphs in article_dict.items():
+                for i, p in enumerate(paragraphs):
+                    flat_list.append({
+                        "article": n,
+                        "section": section,
+                        "idx": i,
+                        "text": ("" if p["text"] is None else str(p["text"])),
+                        "heading": p.get("heading")
+                    })
 
         # translate subsection headings too (deduplicated), so flattened paragraphs can still be labeled with the (translated) heading they came from
         unique_headings = sorted({item["heading"] for item in flat_list if item["heading"]})
@@ -248,6 +410,26 @@ def translate_article(article_dict, src_lang, translator):
         # translate every paragraph in one chunked pass
         # (_translate_in_batches preserves input order, so a single zip back onto flat_list is safe even across chunk boundaries)
         translated_texts = _translate_in_batches([item["text"] for item in flat_list], src_lang, translator)
+
+        # per article: build original -> translated section mapping. If two source titles translate to the same string
+        # suffix later ones with " (2)", " (3)", etc, so their paragraphs stay in separate sections instead of silently merging under one key.
+        section_maps = []
+        outs = []
+        pos = 0
+        for article_dict, names in zip(article_dicts, non_lead_names):
+            translated_counts = {}
+            section_map = {}
+            for orig, translated in zip(names, translated_names[pos:pos + len(names)]):
+                translated_counts[translated] = translated_counts.get(translated, 0) + 1
+                n = translated_counts[translated]
+                section_map[orig] = translated if n == 1 else translated + " (" + str(n) + ")"
+            pos += len(names)
+            if "Lead" in article_dict:
+                section_map["Lead"] = "Lead" # edge case: a translated title could in theory collide with the literal "Lead"
+            section_maps.append(section_map)
+            # prepare output with translated section keys (from section_map, so keys match the append loop below)
+            outs.append({translated: [] for translated in section_map.values()})
+
         for item, translated in zip(flat_list, translated_texts):
             record = {
                 "lang": src_lang.upper(), # source language code
@@ -257,10 +439,10 @@ def translate_article(article_dict, src_lang, translator):
                 "heading": heading_map.get(item["heading"]) if item["heading"] else None # (translated) subsection heading, if any
             }
             # append to correct section (need to use section map to get translated section name!)
-            out[section_map[item["section"]]].append(record)
+            outs[item["article"]][section_maps[item["article"]][item["section"]]].append(record)
 
-        # return translated article as dict[str, list[{"lang", "original", "translated", "idx", "heading"}]]
-        return out
+        # return translated articles, each as dict[str, list[{"lang", "original", "translated", "idx", "heading"}]]
+        return outs
     finally:
         # persist cache so future runs can reuse these translations
         # (even if exception is raised partway through, cache is still saved).
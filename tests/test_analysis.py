@@ -4,7 +4,7 @@
 # which label a candidate pair gets -- neither the real embedding nor NLI model loads here.
 import torch
 import pytest
-from src import analysis
+from src import analysis, metrics
 
 @pytest.fixture(autouse=True) # applies to all tests in this module
 def fake_similarity(monkeypatch):
@@ -92,6 +92,36 @@ def test_mixed_section_splits_matches_from_uniques(monkeypatch):
     assert result["unique_a1"] == [list1[1]] # the second paragraph in a1 is unique to a1
     assert result["unique_a2"] == [list2[1]] # the second paragraph in a2 is unique to a2
 
+# -- sentence mode ---------------------------------------------------------------
+
+def test_sentence_mode_finds_contradiction_inside_a_matching_paragraph(monkeypatch):
+    # the two paragraphs match as a whole; only their second sentences conflict
+    monkeypatch.setattr(analysis.similarity, "similarity_matrix", lambda a, b: torch.ones(len(a), len(b)))
+    # stand-in embedding: one axis per topic, so sentences only match their same-topic counterpart
+    monkeypatch.setattr(analysis.similarity, "embed",
+                        lambda texts: torch.tensor([[1.0, 0.0] if "mammals" in t else [0.0, 1.0] for t in texts]))
+    monkeypatch.setattr(analysis.similarity, "cos_sim", lambda a, b: a @ b.T)
+    calls = []
+    def fake_classify_pairs(pairs): # identical sentences agree, differing ones contradict
+        calls.append(pairs)
+        return ["entailment" if p == h else "contradiction" for p, h in pairs]
+    monkeypatch.setattr(analysis.nli, "classify_pairs", fake_classify_pairs)
+
+    list1 = [{"translated": "Cats are mammals. The breed was recognised in 1932.", "lang": "ES"}]
+    list2 = [{"translated": "Cats are mammals. The breed was recognised in 1965.", "lang": "FR"}]
+    result = analysis._analyse_section(list1, list2, mode="sentence")
+
+    assert len(result["contradict"]) == 1
+    evidence = result["contradict"][0]["evidence"]
+    assert evidence[0] == {"a1": "The breed was recognised in 1932.", "a2": "The breed was recognised in 1965.",
+                           "score": 1.0, "label": "contradiction"} # the conflicting sentences come first
+    assert len(evidence) == 2 # the agreeing sentence pair is kept as evidence too
+    assert len(calls) == 1 and len(calls[0]) == 4 # two sentence pairs, both directions, one batched call
+
+def test_analyze_articles_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        analysis.analyze_articles({}, {}, mode="word")
+
 # -- analyze_articles (wires pair_sections + _analyse_section together) -----------
 
 def test_analyze_articles_keys_output_by_section_title(monkeypatch):
@@ -103,3 +133,94 @@ def test_analyze_articles_keys_output_by_section_title(monkeypatch):
     assert len(result["Lead"]["agree"]) == 1 # the matched pair is in the "agree" bucket
     assert result["Lead"]["agree"][0]["a1"]["lang"] == "ES" # the a1 paragraph is in Spanish (the first one given)
     assert result["Lead"]["agree"][0]["a2"]["lang"] == "FR" # the a2 paragraph is in French (the second one given)
+
+def test_parallel_analysis_matches_serial_output_and_order(monkeypatch):
+    def fake_classify_bidirectional(a, b): # counted, to check worker threads report into the run's metrics
+        metrics.incr("fake_nli_calls")
+        return "entailment"
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", fake_classify_bidirectional)
+    # sections of growing size, so largest-first scheduling reorders them
+    a1 = {"S" + str(i): [{"translated": "s%d p%d" % (i, k), "lang": "ES"} for k in range(i + 1)] for i in range(6)}
+    a2 = {"S" + str(i): [{"translated": "s%d p%d" % (i, k), "lang": "FR"} for k in range(i + 1)] for i in range(6)}
+
+    serial = analysis.analyze_articles(a1, a2)
+    with metrics.collect() as m:
+        parallel = analysis.analyze_articles(a1, a2, workers=3)
+    assert list(parallel) == list(serial) # same section order
+    assert parallel == serial # same buckets
+    assert m.counters["fake_nli_calls"] == sum(range(1, 7)) # every pair's NLI call counted
+
+# -- tiers + deadline ----------------------------------------------------------
+
+def test_fast_tier_counts_candidates_as_shared_without_nli(monkeypatch):
+    def fail_if_called(a, b):
+        raise AssertionError("NLI should not run in the fast tier")
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", fail_if_called)
+    list1 = [{"translated": "Same text", "lang": "ES"}]
+    list2 = [{"translated": "Same text", "lang": "FR"}]
+    result = analysis._analyse_section(list1, list2, tier="fast")
+    assert len(result["agree"]) == 1
+    assert result["tier"] == "fast"
+
+def test_balanced_tier_checks_only_the_best_candidates(monkeypatch):
+    calls = []
+    def fake_classify_bidirectional(a, b):
+        calls.append(a)
+        return "contradiction"
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", fake_classify_bidirectional)
+    texts = ["p" + str(i) for i in range(analysis.BALANCED_NLI_PAIRS + 2)]
+    list1 = [{"translated": t, "lang": "ES"} for t in texts]
+    list2 = [{"translated": t, "lang": "FR"} for t in texts]
+    result = analysis._analyse_section(list1, list2, tier="balanced")
+    assert len(calls) == analysis.BALANCED_NLI_PAIRS
+    assert len(result["contradict"]) == analysis.BALANCED_NLI_PAIRS # checked
+    assert len(result["agree"]) == 2 # unchecked candidates count as shared
+
+def test_past_deadline_sections_degrade_to_fast_and_record_it(monkeypatch):
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", lambda a, b: "entailment")
+    a1 = {"Lead": [{"translated": "Cats are mammals.", "lang": "ES"}], "History": [{"translated": "Old.", "lang": "ES"}]}
+    a2 = {"Lead": [{"translated": "Cats are mammals.", "lang": "FR"}], "History": [{"translated": "Old.", "lang": "FR"}]}
+    result = analysis.analyze_articles(a1, a2, budget=0.0) # no time at all
+    assert list(result) == ["Lead", "History"] # pair order kept
+    assert {info["tier"] for info in result.values()} == {"fast"}
+
+def test_tier_at_steps_down_as_the_budget_runs_out(monkeypatch):
+    monkeypatch.setattr(analysis.time, "time", lambda: 100.0)
+    assert analysis.tier_at("full", None, None) == "full" # no deadline
+    assert analysis.tier_at("full", 109.0, 10.0) == "full" # 10% spent
+    assert analysis.tier_at("full", 103.0, 10.0) == "balanced" # 70% spent
+    assert analysis.tier_at("full", 99.0, 10.0) == "fast" # past the deadline
+
+# -- checkpoint ----------------------------------------------------------------
+
+def test_checkpointed_sections_are_reused_and_new_ones_saved(monkeypatch):
+    calls = []
+    def fake_classify_bidirectional(a, b):
+        calls.append(a)
+        return "entailment"
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", fake_classify_bidirectional)
+    class FakeCheckpoint: # stand-in for checkpoint.RunCheckpoint
+        def __init__(self):
+            self.sections = {"Lead": {"agree": [], "contradict": [], "neutral": [], "unique_a1": [], "unique_a2": [],
+                                      "tier": "full", "from_checkpoint": True}}
+        def section(self, title):
+            return self.sections.get(title)
+        def save_section(self, title, result):
+            self.sections[title] = result
+    a1 = {"Lead": [{"translated": "Cats are mammals.", "lang": "ES"}], "History": [{"translated": "Old.", "lang": "ES"}]}
+    a2 = {"Lead": [{"translated": "Cats are mammals.", "lang": "FR"}], "History": [{"translated": "Old.", "lang": "FR"}]}
+    checkpoint = FakeCheckpoint()
+    result = analysis.analyze_articles(a1, a2, checkpoint=checkpoint)
+    assert list(result) == ["Lead", "History"]
+    assert result["Lead"]["from_checkpoint"] # not analysed again
+    assert calls == ["Old."]
+    assert checkpoint.sections["History"] == result["History"] # saved as it finished
+
+def test_process_pool_is_created_once_and_reused():
+    try:
+        pool = analysis._process_pool(2)
+        assert analysis._process_pool(2) is pool # later runs reuse the warm workers
+        assert analysis._process_pool(3) is not pool # another worker count gets its own pool
+    finally:
+        analysis._shutdown_process_pools()
+    assert analysis._process_pools == {}
@@ -1,5 +1,7 @@
-# tests for src/article.py's pure URL-parsing functions (no network calls needed)
+# tests for src/article.py's pure URL-parsing and extract-parsing functions, and the
+# single-request fetch with requests.get mocked via article.requests.get (no network calls)
 import pytest
+from src import article
 from src.article import url_check, url_to_title, url_to_lang
 
 # -- url_check ----------------------------------------------------------------
@@ -59,3 +61,52 @@ def test_url_to_lang_rejects_www_prefix():
 def test_url_to_lang_rejects_missing_subdomain():
     with pytest.raises(ValueError):
         url_to_lang("https://wikipedia.org/wiki/Boina")
+
+# -- sections_from_extract + fetch_article ---------------------------------------
+
+EXTRACT = (
+    "Cats are small.\n\nThey purr.\n\n"
+    "== History ==\nDomesticated long ago.\n\n"
+    "=== Egypt ===\nRevered in Egypt.\n\n"
+    "== Behaviour ==\n\n"
+    "=== Sleep ===\nCats sleep a lot.\n"
+)
+
+def test_sections_from_extract_flattens_subsections_with_headings():
+    sections = article.sections_from_extract(EXTRACT)
+    assert list(sections) == ["Lead", "History", "Behaviour"]
+    assert sections["Lead"] == [{"heading": None, "text": "Cats are small."}, {"heading": None, "text": "They purr."}]
+    assert sections["History"] == [{"heading": None, "text": "Domesticated long ago."},
+                                   {"heading": "Egypt", "text": "Revered in Egypt."}]
+    assert sections["Behaviour"] == [{"heading": "Sleep", "text": "Cats sleep a lot."}] # no own prose, only its subsection's
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+    def raise_for_status(self):
+        pass
+    def json(self):
+        return self._payload
+
+def test_fetch_article_gets_text_revision_and_references_in_one_request(monkeypatch):
+    calls = []
+    def fake_get(url, params, headers, timeout): # first page of external links carries the extract; a continuation brings the rest
+        calls.append(dict(params))
+        if "elcontinue" not in params:
+            page = {"title": "Gato", "lastrevid": 42, "extract": EXTRACT, "extlinks": [{"url": "https://a.example"}]}
+            return FakeResponse({"query": {"pages": [page]}, "continue": {"elcontinue": "1", "continue": "||"}})
+        page = {"title": "Gato", "lastrevid": 42, "extlinks": [{"url": "https://b.example"}]}
+        return FakeResponse({"query": {"pages": [page]}})
+    monkeypatch.setattr(article.requests, "get", fake_get)
+
+    result = article.fetch_article("es", " Gato ")
+    assert result["revid"] == 42
+    assert result["references"] == ["https://a.example", "https://b.example"]
+    assert result["sections"] == article.sections_from_extract(EXTRACT)
+    assert calls[0]["titles"] == "Gato" and "extracts" in calls[0]["prop"] # everything asked for at once
+
+def test_fetch_article_raises_for_missing_page(monkeypatch):
+    monkeypatch.setattr(article.requests, "get",
+                        lambda url, params, headers, timeout: FakeResponse({"query": {"pages": [{"title": "Nada", "missing": True}]}}))
+    with pytest.raises(ValueError):
+        article.fetch_article("es", "Nada")
@@ -0,0 +1,59 @@
+# tests for src/batching.py's DynamicBatcher: concurrent submissions are gathered into
+# one call and every caller gets back exactly its own results. fn is a plain function
+# here (no model), recording the batches it was called with.
+import threading
+import pytest
+from src import batching
+
+def test_concurrent_submissions_share_one_call():
+    calls = []
+    def double(items):
+        calls.append(list(items))
+        return [x * 2 for x in items]
+    # the batch closes when all 8 items are in (max_batch), not when a timing window runs out
+    batcher = batching.DynamicBatcher(double, max_batch=8, max_wait_ms=60_000)
+
+    results = {}
+    def worker(n):
+        results[n] = batcher.submit([n, n + 100])
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1 # all four callers' items filled one batch
+    assert len(calls[0]) == 8 # every item from every caller
+    assert results == {n: [n * 2, (n + 100) * 2] for n in range(4)} # each caller got its own slice
+
+def test_max_batch_closes_a_batch_early():
+    calls = []
+    def identity(items):
+        calls.append(len(items))
+        return list(items)
+    batcher = batching.DynamicBatcher(identity, max_batch=2, max_wait_ms=10_000)
+    assert batcher.submit([1, 2]) == [1, 2] # already full: runs without waiting out the 10 s window
+    assert calls == [2]
+
+def test_errors_are_raised_in_every_caller():
+    def broken(items):
+        raise RuntimeError("model exploded")
+    batcher = batching.DynamicBatcher(broken, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.submit(["a"])
+    assert batcher.submit([]) == [] # empty submissions never reach fn
+
+def test_base_exceptions_fail_the_callers_and_the_batcher_keeps_running():
+    def interrupted(items):
+        if items == ["stop"]:
+            raise KeyboardInterrupt
+        return list(items)
+    batcher = batching.DynamicBatcher(interrupted, max_wait_ms=1)
+    with pytest.raises(KeyboardInterrupt):
+        batcher.submit(["stop"])
+    assert batcher.submit(["go"]) == ["go"] # the thread survived
+
+def test_a_result_of_the_wrong_length_is_an_error_not_a_misaligned_slice():
+    batcher = batching.DynamicBatcher(lambda items: list(items)[1:], max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="1 results for 2 items"):
+        batcher.submit(["a", "b"])
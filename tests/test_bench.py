@@ -0,0 +1,42 @@
+# tests for src/bench.py's building blocks (the synthetic data and the DeepL stand-in);
+# the timed runs themselves are not exercised here, they belong to `python -m src.bench`.
+import numpy as np
+import pytest
+from src import bench
+
+def test_synthetic_articles_are_deterministic_for_a_seed():
+    first = bench.synthetic_articles(4, 3, seed=7)
+    second = bench.synthetic_articles(4, 3, seed=7)
+    assert first == second # same seed -> identical articles
+
+def test_synthetic_articles_have_requested_shape():
+    a1, a2 = bench.synthetic_articles(5, 2, seed=1)
+    assert list(a1.keys())[0] == "Lead" and list(a2.keys())[0] == "Lead" # Lead always comes first
+    assert len(a1) == 5 and len(a2) == 5 # one entry per requested section
+    assert all(len(paragraphs) == 2 for paragraphs in a1.values()) # paragraphs per section
+
+def test_fake_deepl_counts_requests_and_characters():
+    deepl = bench.FakeDeepL()
+    response = deepl("endpoint", data={"text": ["Hola", "Mundo"], "source_lang": "ES", "target_lang": "EN-GB"})
+    assert [t["text"] for t in response.json()["translations"]] == ["EN:Hola", "EN:Mundo"]
+    assert deepl.requests == 1 and deepl.chars == 9
+
+def test_compare_to_baseline_flags_only_slower_stages():
+    baseline = {"5x4": {"render_html": {"p50_ms": 10.0}, "pair_sections": {"p50_ms": 10.0}}}
+    report = {"5x4": {"render_html": {"p50_ms": 13.0}, "pair_sections": {"p50_ms": 11.0}}}
+    regressions = bench.compare_to_baseline(report, baseline, tolerance=0.2)
+    assert len(regressions) == 1 and "render_html" in regressions[0] # 30% slower is flagged, 10% is within tolerance
+
+def test_synthetic_articles_keep_every_section_when_titles_repeat():
+    a1, a2 = bench.synthetic_articles(200, 1, seed=3) # 200 two-word titles from a small vocabulary repeat
+    assert len(a1) == 200 and len(a2) == 200 # a repeated title is renamed, never overwritten
+
+def test_measure_reports_a_stages_peak_even_when_it_frees_the_memory():
+    if not bench._reset_peak_rss():
+        pytest.skip("the peak resident set size can't be reset here")
+    timings, rss = {"stage": []}, {}
+    with bench._measure("stage", timings, rss):
+        block = np.ones(16 * 1024 * 1024) # 128 MB, touched
+        del block
+    current = int(next(line for line in open("/proc/self/status") if line.startswith("VmRSS:")).split()[1]) / 1024
+    assert rss["stage"] >= current + 100 # the peak, not what was left at the end
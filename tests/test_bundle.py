@@ -0,0 +1,46 @@
+# tests for src/bundle.py: exporting and resolving the local model bundle. The model class is a
+# stand-in that writes small files, so nothing is downloaded; bundles live in pytest's tmp_path.
+import os
+import pytest
+from src import bundle
+
+# stand-in for SentenceTransformer / CrossEncoder: "loads" by name and saves two small files
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+    def save(self, path, safe_serialization=True):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "config.json"), "w") as f:
+            f.write('{"name": "' + self.name + '"}')
+        with open(os.path.join(path, "model.safetensors" if safe_serialization else "pytorch_model.bin"), "wb") as f:
+            f.write(b"\0" * 64)
+
+def test_exported_models_resolve_to_their_local_folder(tmp_path):
+    root = str(tmp_path)
+    data = bundle.export_bundle(root, loaders={"org/model": FakeModel})
+    assert data["models"]["org/model"]["files"]["model.safetensors"] == 64
+
+    path = bundle.resolve("org/model", root)
+    assert path == os.path.join(root, "org--model")
+    assert os.path.exists(os.path.join(path, "model.safetensors"))
+    assert bundle.resolve("not/bundled", root) == "not/bundled" # falls back to the hub name
+
+def test_no_bundle_means_hub_names(tmp_path):
+    assert bundle.manifest(str(tmp_path)) is None
+    assert bundle.resolve("org/model", str(tmp_path)) == "org/model"
+
+def test_truncated_bundle_is_refused(tmp_path):
+    root = str(tmp_path)
+    bundle.export_bundle(root, loaders={"org/model": FakeModel})
+    with open(os.path.join(root, "org--model", "model.safetensors"), "wb") as f:
+        f.write(b"\0" * 10)
+    with pytest.raises(RuntimeError):
+        bundle.resolve("org/model", root)
+
+def test_export_without_safetensors_fails(tmp_path):
+    class PickleOnly(FakeModel):
+        def save(self, path, safe_serialization=True):
+            super().save(path, safe_serialization=False)
+    with pytest.raises(RuntimeError):
+        bundle.export_bundle(str(tmp_path), loaders={"org/model": PickleOnly})
+    assert bundle.manifest(str(tmp_path)) is None # no manifest for a failed export
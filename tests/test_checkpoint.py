@@ -0,0 +1,35 @@
+# tests for src/checkpoint.py: saving and resuming a run's stages, embeddings and sections.
+# Every checkpoint lives in pytest's tmp_path.
+import numpy as np
+import pytest
+from src.checkpoint import RunCheckpoint
+
+def test_resume_reads_back_what_the_crashed_run_saved(tmp_path):
+    first = RunCheckpoint("run", "fp", root=str(tmp_path))
+    first.save("fetch", [{"Lead": [{"heading": None, "text": "Hola."}]}, {}])
+    first.save_embeddings(({"Lead": np.ones((1, 3), dtype=np.float32)}, {"Historia": np.zeros((2, 3))}))
+    first.save_section("Lead", {"agree": [], "tier": "full"})
+
+    resumed = RunCheckpoint("run", "fp", root=str(tmp_path), resume=True)
+    assert resumed.load("fetch")[0]["Lead"][0]["text"] == "Hola."
+    assert resumed.load("translate") is None # not reached before the crash
+    embeddings = resumed.load_embeddings()
+    assert list(embeddings[1]) == ["Historia"]
+    assert np.array_equal(embeddings[0]["Lead"], np.ones((1, 3)))
+    assert resumed.section("Lead") == {"agree": [], "tier": "full"}
+    assert resumed.section("History") is None
+
+def test_a_fresh_run_discards_the_old_checkpoint(tmp_path):
+    RunCheckpoint("run", "fp", root=str(tmp_path)).save("fetch", [{}, {}])
+    assert RunCheckpoint("run", "fp", root=str(tmp_path)).load("fetch") is None
+
+def test_resuming_another_runs_checkpoint_is_refused(tmp_path):
+    RunCheckpoint("run", "fp", root=str(tmp_path))
+    with pytest.raises(ValueError):
+        RunCheckpoint("run", "other settings", root=str(tmp_path), resume=True)
+
+def test_clear_removes_the_checkpoint(tmp_path):
+    checkpoint = RunCheckpoint("run", "fp", root=str(tmp_path))
+    checkpoint.save_section("Lead", {})
+    checkpoint.clear()
+    assert not (tmp_path / "run").exists()
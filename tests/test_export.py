@@ -0,0 +1,49 @@
+# tests for src/export.py: the columnar analysis export round-trips through disk.
+# Everything is written into pytest's tmp_path, so the real output/ folder is never touched.
+import math
+import numpy as np
+from src import export
+
+# a small analysis with one row in every bucket except "neutral"
+ANALYSIS = {
+    "Lead": {
+        "agree": [{"a1": {"lang": "ES", "idx": 0}, "a2": {"lang": "FR", "idx": 2}, "score": 0.9}],
+        "contradict": [],
+        "neutral": [],
+        "unique_a1": [{"lang": "ES", "idx": 1}],
+        "unique_a2": []
+    },
+    "History": {
+        "agree": [],
+        "contradict": [{"a1": {"lang": "ES", "idx": 3}, "a2": {"lang": "FR", "idx": 0}, "score": 0.7}],
+        "neutral": [],
+        "unique_a1": [],
+        "unique_a2": [{"lang": "FR", "idx": 1}]
+    }
+}
+
+def test_export_round_trips_ids_labels_and_scores(tmp_path):
+    path = export.export_analysis(ANALYSIS, str(tmp_path / "demo.columns"), "Demo", "ES", "FR")
+    data = export.load_analysis(path)
+    labels = [export.LABELS[i] for i in data["label"]]
+    assert labels == ["agree", "unique_a1", "contradict", "unique_a2"] # one row per pair / unique paragraph, in section order
+    assert data["strings"]["sections"] == ["Lead", "History"] # section ids point into the string table
+    assert list(data["section"]) == [0, 0, 1, 1]
+    assert list(data["a1_idx"]) == [0, 1, 3, -1] # -1 where the row has no a1 paragraph
+    assert list(data["a2_idx"]) == [2, -1, 0, 1] # -1 where the row has no a2 paragraph
+    assert math.isclose(data["score"][0], 0.9, rel_tol=1e-6) # pair score kept
+    assert math.isnan(data["score"][1]) # unique rows have no score
+
+def test_load_analysis_memory_maps_columns_by_default(tmp_path):
+    path = export.export_analysis(ANALYSIS, str(tmp_path / "demo.columns"))
+    data = export.load_analysis(path)
+    assert isinstance(data["score"], np.memmap) # read lazily from disk, not copied into RAM
+
+def test_label_counts_aggregates_across_exports(tmp_path):
+    first = export.export_analysis(ANALYSIS, str(tmp_path / "a.columns"))
+    second = export.export_analysis(ANALYSIS, str(tmp_path / "b.columns"))
+    counts = export.label_counts([first, second])
+    assert counts == {"agree": 2, "contradict": 2, "neutral": 0, "unique_a1": 2, "unique_a2": 2}
+
+def test_export_dir_sits_next_to_the_html_page():
+    assert export.export_dir_for("output/giant-tortoise.html") == "output/giant-tortoise.columns"
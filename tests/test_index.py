@@ -0,0 +1,147 @@
+# tests for src/index.py: the on-disk paragraph index and the NLI verdict store.
+# Vectors are hand-made (no embedding model loads); every index lives in pytest's tmp_path.
+import os, json, multiprocessing
+import numpy as np
+import pytest
+from src import index
+
+def _records(*texts, section="History"):
+    return [{"section": section, "lang": "ES", "translated": t} for t in texts]
+
+# -- ParagraphIndex ------------------------------------------------------------
+
+def test_search_finds_the_merge_holding_the_claim(tmp_path):
+    idx = index.ParagraphIndex(str(tmp_path))
+    idx.add_merge("es:Gato|fr:Chat", _records("Cats purr.", "Cats sleep a lot."), [[1, 0, 0], [0, 1, 0]])
+    idx.add_merge("es:Perro|fr:Chien", _records("Dogs bark."), [[0, 0, 1]])
+
+    hits = idx.search([[0, 2, 0]], k=2)[0] # closest to "Cats sleep a lot." (queries need not be unit length)
+    assert hits[0]["merge"] == "es:Gato|fr:Chat"
+    assert hits[0]["text"] == "Cats sleep a lot."
+    assert hits[0]["score"] == 1.0
+    assert len(hits) == 2
+
+def test_search_blocks_give_the_same_answer(tmp_path, monkeypatch):
+    monkeypatch.setattr(index, "SEARCH_BLOCK_ROWS", 2) # force several blocks
+    idx = index.ParagraphIndex(str(tmp_path))
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(9, 4))
+    idx.add_merge("m", _records(*["p" + str(i) for i in range(9)]), vectors)
+
+    query = vectors[5] + 0.01
+    hits = idx.search([query], k=3)[0]
+    expected = np.argsort(-(vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ query)[:3]
+    assert [h["text"] for h in hits] == ["p" + str(i) for i in expected]
+
+@pytest.mark.parametrize("method", ["int8", "binary"])
+def test_quantised_search_matches_exact_search(tmp_path, monkeypatch, method):
+    monkeypatch.setattr(index, "SEARCH_BLOCK_ROWS", 16)
+    idx = index.ParagraphIndex(str(tmp_path))
+    vectors = np.random.default_rng(1).normal(size=(60, 32))
+    idx.add_merge("m", _records(*["p" + str(i) for i in range(60)]), vectors)
+    idx.add_merge("m", _records(*["q" + str(i) for i in range(60)]), vectors) # supersedes the p rows
+
+    queries = vectors[:4] + 0.01
+    assert idx.search(queries, k=3, method=method) == idx.search(queries, k=3)
+    assert all(h["text"].startswith("q") for hits in idx.search(queries, k=3, method=method) for h in hits)
+
+def test_codes_are_rebuilt_for_an_index_written_without_them(tmp_path):
+    idx = index.ParagraphIndex(str(tmp_path))
+    idx.add_merge("a", _records("Kept."), [[1, 0]])
+    for path in (idx.codes_path, idx.scales_path, idx.bits_path):
+        os.remove(path)
+    assert [h["text"] for h in idx.search([[1, 0]], k=1, method="int8")[0]] == ["Kept."]
+    assert os.path.getsize(idx.scales_path) == 4
+
+def test_reindexing_a_merge_replaces_its_rows(tmp_path):
+    idx = index.ParagraphIndex(str(tmp_path))
+    idx.add_merge("m", _records("Old text."), [[1, 0]], {"rev": [1, 1]})
+    idx.add_merge("m", _records("New text."), [[1, 0]], {"rev": [2, 1]})
+
+    hits = idx.search([[1, 0]], k=5)[0]
+    assert [h["text"] for h in hits] == ["New text."] # the superseded row is skipped
+    assert idx.has_merge("m", {"rev": [2, 1]})
+    assert not idx.has_merge("m", {"rev": [1, 1]})
+
+def test_search_can_exclude_the_current_merge(tmp_path):
+    idx = index.ParagraphIndex(str(tmp_path))
+    idx.add_merge("a", _records("Same claim."), [[1, 0]])
+    idx.add_merge("b", _records("Same claim."), [[1, 0]])
+    assert [h["merge"] for h in idx.search([[1, 0]], k=5, exclude_merge="a")[0]] == ["b"]
+
+def test_append_truncates_rows_left_by_a_crashed_append(tmp_path):
+    idx = index.ParagraphIndex(str(tmp_path))
+    idx.add_merge("a", _records("Kept."), [[1, 0]])
+    # a crash after writing rows but before the header: rows past "count" are garbage
+    with open(idx.vectors_path, "ab") as f:
+        f.write(np.zeros(2, dtype=np.float32).tobytes())
+    with open(idx.meta_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"merge": "lost", "section": "x", "lang": "ES", "text": "Lost."}) + "\n")
+
+    idx.add_merge("b", _records("Added."), [[0, 1]])
+    assert [h["text"] for h in idx.search([[0, 1]], k=1)[0]] == ["Added."]
+    assert idx.header()["count"] == 2
+
+def test_append_cuts_meta_at_the_stored_byte_offset(tmp_path):
+    idx = index.ParagraphIndex(str(tmp_path))
+    idx.add_merge("a", _records("Kept, ünïcode."), [[1, 0]])
+    assert idx.header()["meta_bytes"] == os.path.getsize(idx.meta_path)
+    with open(idx.meta_path, "ab") as f:
+        f.write(b'{"merge": "lost", "sec') # half a line from a crashed append
+    idx.add_merge("b", _records("Added."), [[0, 1]])
+    with open(idx.meta_path, encoding="utf-8") as f:
+        assert [json.loads(line)["merge"] for line in f] == ["a", "b"]
+
+def _append_many(root, worker, n):
+    idx = index.ParagraphIndex(root)
+    for i in range(n):
+        idx.add_merge(worker + str(i), _records(worker + str(i), worker + str(i)), [[1, 0], [0, 1]])
+
+def test_appends_from_several_processes_keep_rows_aligned(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_append_many, args=(str(tmp_path), worker, 15)) for worker in "abc"]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    assert all(p.exitcode == 0 for p in processes)
+
+    idx = index.ParagraphIndex(str(tmp_path))
+    header = idx.header()
+    assert header["count"] == 90 and len(header["merges"]) == 45
+    with open(idx.meta_path, encoding="utf-8") as f:
+        meta = [json.loads(line) for line in f]
+    for merge, entry in header["merges"].items(): # every range holds its own merge's rows
+        assert [row["merge"] for row in meta[entry["start"]:entry["end"]]] == [merge, merge]
+    assert os.path.getsize(idx.vectors_path) == 90 * 2 * 4
+
+def test_index_built_with_another_model_is_refused(tmp_path, monkeypatch):
+    idx = index.ParagraphIndex(str(tmp_path))
+    idx.add_merge("a", _records("Text."), [[1, 0]])
+    monkeypatch.setattr(index.similarity, "EMBED_MODEL", "another-model")
+    with pytest.raises(RuntimeError):
+        idx.search([[1, 0]])
+
+# -- VerdictStore --------------------------------------------------------------
+
+def test_verdicts_are_order_independent_and_persist(tmp_path):
+    store = index.VerdictStore(str(tmp_path))
+    store.put("A is B.", "B is A.", "entailment")
+    store.save()
+
+    reloaded = index.VerdictStore(str(tmp_path))
+    assert reloaded.get("B is A.", "A is B.") == "entailment" # bidirectional verdict: order doesn't matter
+    assert reloaded.get("A is B.", "C is D.") is None
+
+def test_concurrent_stores_keep_each_others_verdicts(tmp_path):
+    first = index.VerdictStore(str(tmp_path))
+    second = index.VerdictStore(str(tmp_path)) # both loaded before either saved
+    first.put("A is B.", "B is A.", "entailment")
+    second.put("C is D.", "D is not C.", "contradiction")
+    first.save()
+    second.save()
+
+    reloaded = index.VerdictStore(str(tmp_path))
+    assert reloaded.get("A is B.", "B is A.") == "entailment" # not dropped by the second save
+    assert reloaded.get("C is D.", "D is not C.") == "contradiction"
+    assert second.get("A is B.", "B is A.") == "entailment" # a save also picks up what others saved
@@ -0,0 +1,101 @@
+# tests for src/jobs.py: the SQLite broker (idempotent ids, leases, retries) and the worker loop.
+# Each queue is a file in pytest's tmp_path; the pipeline is a stand-in, so nothing is fetched.
+import pytest
+from src import jobs
+
+CONFIG = {"url1": "https://es.wikipedia.org/wiki/Gato", "url2": "https://fr.wikipedia.org/wiki/Chat", "title_out": "Cat"}
+
+@pytest.fixture
+def broker(tmp_path):
+    return jobs.SQLiteBroker(str(tmp_path / "jobs.sqlite"), max_attempts=2, retry_delay=0)
+
+@pytest.fixture(autouse=True)
+def no_translator(monkeypatch):
+    monkeypatch.setattr(jobs, "LazyTranslator", lambda *backend: None)
+
+def test_submitting_the_same_merge_twice_gives_one_job(broker):
+    first = broker.submit(CONFIG)
+    assert broker.submit(dict(CONFIG)) == first
+    assert broker.submit(dict(CONFIG, analysis_tier="fast")) != first # other settings, other job
+    assert broker.counts()["queued"] == 2
+
+def test_a_claimed_job_is_invisible_until_its_lease_expires(broker, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jobs.time, "time", lambda: now[0])
+    job = broker.submit(CONFIG)
+    claimed = broker.claim("w1", lease_seconds=60)
+    assert claimed["id"] == job and claimed["attempts"] == 1
+    assert broker.claim("w2", lease_seconds=60) is None
+
+    now[0] += 61 # w1 crashed: no heartbeat, the lease runs out
+    reclaimed = broker.claim("w2", lease_seconds=60)
+    assert reclaimed["id"] == job and reclaimed["worker"] == "w2"
+    assert not broker.complete(job, "w1", {}) # w1's late result is refused
+    assert broker.complete(job, "w2", {"spans": {}})
+    assert broker.get(job)["state"] == "done"
+
+def test_failed_job_is_retried_until_max_attempts(broker):
+    job = broker.submit(CONFIG)
+    broker.claim("w")
+    broker.fail(job, "w", "RuntimeError: DeepL timeout")
+    assert broker.get(job)["state"] == "queued"
+    broker.claim("w")
+    broker.fail(job, "w", "RuntimeError: DeepL timeout")
+    assert broker.get(job)["state"] == "failed"
+    assert broker.claim("w") is None
+
+def test_worker_runs_jobs_and_does_not_retry_bad_input(broker):
+    good = broker.submit(CONFIG)
+    bad = broker.submit(dict(CONFIG, url2="https://fr.wikipedia.org/wiki/Nope"))
+    def fake_run(config, translator, cancelled=None):
+        if config["url2"].endswith("Nope"):
+            raise jobs.InvalidInput("Article not found: Nope")
+        return {"spans": {"total": {"count": 1, "seconds": 0.1}}}
+
+    assert jobs.run_worker(broker, worker="w", stop_when_idle=True, run=fake_run) == 2
+    assert broker.get(good)["result"]["spans"]["total"]["count"] == 1
+    assert broker.get(bad)["state"] == "failed"
+    assert broker.get(bad)["attempts"] == 1 # InvalidInput: not retried
+
+def test_other_value_errors_are_retried(broker):
+    job = broker.submit(CONFIG)
+    def garbled_response(config, translator, cancelled=None):
+        raise ValueError("Expecting value: line 1 column 1 (char 0)") # e.g. a JSONDecodeError from a flaky API
+    jobs.run_worker(broker, worker="w", max_jobs=1, run=garbled_response)
+    assert broker.get(job)["state"] == "queued" # not the caller's input: tried again
+
+def test_a_broker_must_implement_the_whole_interface():
+    class Incomplete(jobs.Broker):
+        def submit(self, config, force=False):
+            return "id"
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_a_worker_that_lost_its_lease_drops_the_run(broker, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jobs.time, "time", lambda: now[0])
+    job = broker.submit(CONFIG)
+    def stalled_run(config, translator, cancelled=None):
+        now[0] += 61 # suspended past the lease...
+        assert broker.claim("w2", lease_seconds=60)["id"] == job # ...and another worker took the job over
+        assert not broker.heartbeat(job, "w1", 60)
+        return {"spans": {}}
+
+    assert jobs.run_worker(broker, worker="w1", lease_seconds=60, max_jobs=1, stop_when_idle=True, run=stalled_run) == 0
+    assert broker.get(job)["state"] == "running" and broker.get(job)["worker"] == "w2" # left to w2
+
+def test_the_run_is_cancelled_once_the_heartbeat_notices_the_lost_lease(broker, monkeypatch):
+    job = broker.submit(CONFIG)
+    seen = []
+    def run(config, translator, cancelled=None):
+        seen.append(cancelled())
+        with broker._connect() as db: # the lease moves to another worker
+            db.execute("UPDATE jobs SET worker = 'w2' WHERE id = ?", (job,))
+        for _ in range(100): # wait for a heartbeat (every lease_seconds / 3)
+            if cancelled():
+                raise RuntimeError("cancelled")
+            jobs.time.sleep(0.01)
+        return {}
+    jobs.run_worker(broker, worker="w1", lease_seconds=0.03, max_jobs=1, stop_when_idle=True, run=run)
+    assert seen == [False]
+    assert broker.get(job)["worker"] == "w2" and broker.get(job)["error"] is None # not failed by w1
@@ -0,0 +1,50 @@
+# tests for src/local_translate.py's LocalTranslator. The MarianMT tokenizer and model are
+# stand-ins (no transformers download), registered in a registry of the test's own.
+import pytest
+from src import local_translate, models, translate
+
+# stand-in MarianTokenizer: "encodes" to the texts themselves and decodes with an "EN:" prefix
+class FakeTokenizer:
+    def __call__(self, texts, **kwargs):
+        return {"texts": list(texts)}
+    def batch_decode(self, generated, skip_special_tokens=True):
+        return ["EN:" + t for t in generated]
+
+# stand-in MarianMTModel: records each generate() batch
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+    def generate(self, texts, max_new_tokens=None):
+        self.batches.append(texts)
+        return texts
+
+@pytest.fixture
+def marian(monkeypatch):
+    model = FakeModel()
+    loads = []
+    def fake_load(name, tgt):
+        loads.append(name)
+        return FakeTokenizer(), model
+    monkeypatch.setattr(models, "registry", models.ModelRegistry())
+    monkeypatch.setattr(local_translate, "_load_model", fake_load)
+    monkeypatch.setattr(local_translate.LocalTranslator, "_load_cache", lambda self: {})
+    return model, loads
+
+def test_translate_batch_translates_each_unique_sentence_once(marian):
+    model, loads = marian
+    translator = local_translate.LocalTranslator(batch_size=8)
+    result = translator.translate_batch(["Hola. Adios.", "Hola."], "es", "EN-GB")
+    assert result == ["EN:Hola. EN:Adios.", "EN:Hola."]
+    assert sorted(t for batch in model.batches for t in batch) == ["Adios.", "Hola."] # "Hola." once
+    assert loads == ["Helsinki-NLP/opus-mt-es-en"] # the pair model, loaded once
+
+def test_translate_text_goes_through_the_cache(marian):
+    model, _ = marian
+    translator = local_translate.LocalTranslator()
+    assert translator.translate_text("Hola.", "es", "EN-GB") == "EN:Hola."
+    assert translate.translate_paragraph("Hola.", "es", translator) == "EN:Hola." # second call: cache hit
+    assert len(model.batches) == 1
+
+def test_translator_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        translate.Translator()
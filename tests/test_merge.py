@@ -5,6 +5,7 @@
 # down in a unit test -- that belongs to similarity.py's own tests, not this one.
 
 import torch
+import numpy as np
 import pytest
 from src import merge
 
@@ -57,22 +58,40 @@ def test_content_sections_ordered_by_fractional_position():
     titles_in_order = [title for title, _, _ in merge.pair_sections(a1, a2)]
     assert titles_in_order.index("Diet") < titles_in_order.index("Habitat") # Diet comes before Habitat (because it sits proportionally earlier in a1 than Habitat does in a2)
 
-def test_section_matching_is_mutual_best_not_greedy(monkeypatch):
-    # Test for asymmetric similarities that a greedy vs. mutual match would resolve differently
+def test_section_matching_is_an_assignment_not_mutual_best(monkeypatch):
+    # Alpha's favourite is X, but X is also Beta's only good partner: the assignment with the highest
+    # total score gives Alpha its second choice instead of leaving Beta unmatched
     scores = {
-        ("Alpha", "X"): 0.90, ("Alpha", "Y"): 0.95,
-        ("Beta", "X"): 0.55, ("Beta", "Y"): 0.40,
+        ("Alpha", "X"): 0.90, ("Alpha", "Y"): 0.85,
+        ("Beta", "X"): 0.80, ("Beta", "Y"): 0.10,
+        ("Gamma", "Z"): 0.30,
     }
     def fake_similarity_matrix(texts_a, texts_b): # per-test override; defaults to 0.0 (so appendix matching sees no appendices)
         return torch.tensor([[scores.get((a, b), 0.0) for b in texts_b] for a in texts_a])
     monkeypatch.setattr(merge.similarity, "similarity_matrix", fake_similarity_matrix)
 
-    a1 = {"Alpha": [], "Beta": []}
-    a2 = {"X": [], "Y": []}
+    a1 = {"Alpha": [], "Beta": [], "Gamma": []}
+    a2 = {"X": [], "Y": [], "Z": []}
     by_title = {title: (a1_key, a2_key) for title, a1_key, a2_key in merge.pair_sections(a1, a2)}
-    assert by_title["Alpha"] == ("Alpha", "Y") # mutual best match pairs Alpha with Y (0.95), not greedy's X (0.90)
-    assert by_title["X"] == (None, "X") # X is left unmatched, because Alpha (its best) preferred Y
-    assert by_title["Beta"] == ("Beta", None) # Beta's only candidate X is not its mutual best, so Beta stays unmatched
+    assert by_title["Alpha"] == ("Alpha", "Y") # 0.85 + 0.80 beats mutual best's 0.90 + nothing
+    assert by_title["Beta"] == ("Beta", "X")
+    assert by_title["Gamma"] == ("Gamma", None) # assigned to Z, but 0.30 is below the threshold
+    assert by_title["Z"] == (None, "Z")
+
+def test_unmatched_a2_section_never_shares_a_title_with_an_a1_section(monkeypatch):
+    # content pulls a1 "History" to a2 "Historical background", leaving a2 "History" over
+    scores = {("History", "Historical background"): 0.9, ("History", "History"): 0.6}
+    def fake_similarity_matrix(texts_a, texts_b):
+        return torch.tensor([[scores.get((a, b), 0.0) for b in texts_b] for a in texts_a])
+    monkeypatch.setattr(merge.similarity, "similarity_matrix", fake_similarity_matrix)
+
+    a1 = {"History": []}
+    a2 = {"Historical background": [], "History": []}
+    pairs = merge.pair_sections(a1, a2)
+    titles = [title for title, _, _ in pairs]
+    assert len(titles) == len(set(titles)) # every section keeps its own key
+    assert ("History", "History", "Historical background") in pairs
+    assert ("History (2)", None, "History") in pairs
 
 def test_translated_appendix_title_is_pinned_last(monkeypatch):
     # Test for non-English article's appendix heading translating inexactly to canonical appendix section headers in English.
@@ -91,3 +110,17 @@ def test_translated_appendix_title_is_pinned_last(monkeypatch):
     titles_in_order = [title for title, _, _ in merge.pair_sections(a1, a2)]
     assert titles_in_order[-1] == "Individual evidence" # matched to "references" by similarity, so pinned last
     assert titles_in_order.index("History") < titles_in_order.index("Individual evidence") # after the content section
+
+def test_content_similarity_pairs_sections_whose_titles_differ():
+    # titles never match under the exact-title stand-in, but both sections hold the same content
+    a1 = {"Biology": [{"translated": "Cats have retractable claws."}], "History": [{"translated": "Egypt."}]}
+    a2 = {"Characteristics": [{"translated": "Cats have retractable claws."}], "History": [{"translated": "Egypt."}]}
+    vectors1 = {"Biology": np.array([[1.0, 0.0]]), "History": np.array([[0.0, 1.0]])}
+    vectors2 = {"Characteristics": np.array([[1.0, 0.0]]), "History": np.array([[0.0, 1.0]])}
+
+    assert ("Biology", "Biology", None) in merge.pair_sections(a1, a2) # title only: no match
+
+    by_title = {title: (a1_key, a2_key) for title, a1_key, a2_key in merge.pair_sections(a1, a2, embeddings=(vectors1, vectors2))}
+    assert by_title["Biology"] == ("Biology", "Characteristics") # 0.5 * title 0.0 + 0.5 * content 1.0 clears the threshold
+    assert by_title["History"] == ("History", "History") # same title and content still pair
+    assert "Characteristics" not in by_title # no longer listed on its own
@@ -0,0 +1,48 @@
+# tests for src/metrics.py: spans/counters only record inside collect(), and the
+# snapshot/export formats carry what run_pipeline reports.
+import json
+from src import metrics
+
+def test_helpers_are_noops_outside_collect():
+    metrics.incr("deepl_requests") # must not raise with no active Metrics
+    with metrics.span("fetch"):
+        pass
+    assert metrics.current() is None
+
+def test_collect_records_spans_counters_and_values():
+    with metrics.collect() as m:
+        with metrics.span("fetch"):
+            pass
+        with metrics.span("fetch"):
+            pass
+        metrics.incr("deepl_requests")
+        metrics.incr("deepl_chars_sent", 120)
+        metrics.set_value("nli_model_load_seconds", 1.5)
+    result = m.as_dict()
+    assert result["spans"]["fetch"]["count"] == 2 # repeated spans of one stage accumulate
+    assert result["counters"] == {"deepl_requests": 1, "deepl_chars_sent": 120}
+    assert result["values"]["nli_model_load_seconds"] == 1.5
+    assert metrics.current() is None # the previous (empty) context is restored afterwards
+
+def test_cache_hit_ratio_is_derived_from_hits_and_misses():
+    with metrics.collect() as m:
+        metrics.incr("translation_cache_hits", 3)
+        metrics.incr("translation_cache_misses", 1)
+    assert m.as_dict()["values"]["translation_cache_hit_ratio"] == 0.75
+
+def test_dump_writes_json_or_prometheus_text(tmp_path):
+    with metrics.collect() as m:
+        with metrics.span("render"):
+            pass
+        metrics.incr("nli_pairs", 4)
+    result = m.as_dict()
+
+    json_path = tmp_path / "run.json"
+    metrics.dump(result, str(json_path))
+    assert json.loads(json_path.read_text())["counters"]["nli_pairs"] == 4
+
+    prom_path = tmp_path / "run.prom"
+    metrics.dump(result, str(prom_path))
+    text = prom_path.read_text()
+    assert 'wikimerge_stage_seconds{stage="render"}' in text
+    assert "wikimerge_nli_pairs_total 4" in text
@@ -0,0 +1,82 @@
+# tests for src/models.py: the model registry. Loaders are stand-ins that count their calls;
+# every test uses its own ModelRegistry, so the process-wide one is untouched.
+import time, threading
+from src import models
+
+# stand-in model: reports a fixed resident size the way a torch module would
+class FakeTensor:
+    def __init__(self, n):
+        self.n = n
+    def numel(self):
+        return self.n
+    def element_size(self):
+        return 1
+
+class FakeModel:
+    def __init__(self, size):
+        self.size = size
+    def parameters(self):
+        return [FakeTensor(self.size)]
+    def buffers(self):
+        return []
+
+def _counting_loader(size, calls, delay=0.0):
+    def load():
+        calls.append(1)
+        time.sleep(delay)
+        return FakeModel(size)
+    return load
+
+def test_concurrent_first_calls_load_once():
+    registry = models.ModelRegistry()
+    calls = []
+    registry.register("m", _counting_loader(10, calls, delay=0.05))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("m"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+def test_least_recently_used_idle_model_is_unloaded_over_budget():
+    registry = models.ModelRegistry(budget_bytes=25)
+    calls = {"a": [], "b": [], "c": []}
+    for name in calls:
+        registry.register(name, _counting_loader(10, calls[name]))
+    registry.get("a")
+    registry.get("b")
+    registry.get("a") # b is now the least recently used
+    registry.get("c") # 30 bytes > 25: b goes
+
+    stats = registry.stats()
+    assert stats["a"]["loaded"] and stats["c"]["loaded"]
+    assert not stats["b"]["loaded"]
+    registry.get("b") # loaded again on next use
+    assert len(calls["b"]) == 2
+
+def test_model_in_use_is_never_unloaded():
+    registry = models.ModelRegistry(budget_bytes=15)
+    registry.register("a", _counting_loader(10, []))
+    registry.register("b", _counting_loader(10, []))
+    with registry.in_use("a"):
+        registry.get("a")
+        registry.get("b") # over budget, but a is running and b was just asked for
+        assert registry.stats()["a"]["loaded"]
+        assert registry.stats()["a"]["users"] == 1
+        assert not registry.unload("a")
+    assert registry.unload("a")
+    assert registry.stats()["a"]["users"] == 0
+
+def test_stats_report_load_time_and_resident_size():
+    registry = models.ModelRegistry()
+    registry.register("m", _counting_loader(1234, []))
+    assert registry.stats()["m"]["loaded"] is False
+    registry.get("m")
+    stats = registry.stats()["m"]
+    assert stats["bytes"] == 1234
+    assert stats["loads"] == 1
+    assert stats["load_seconds"] >= 0
+    # (tokenizer, model) tuples count their torch members only
+    assert models.model_bytes(("tokenizer", FakeModel(7))) == 7
@@ -0,0 +1,90 @@
+# tests for src/multilingual.py: analysis on the original text with translation off the critical path.
+# The multilingual embedding model, the NLI model and the translator are all replaced by
+# stand-ins (keyword vectors, a fixed title table, a prefixing translator) -- nothing loads or calls out.
+import numpy as np
+import torch
+import pytest
+from src import multilingual, analysis
+from src.checkpoint import RunCheckpoint
+
+# stand-in translator: "translates" by prefixing, and records what it was asked for
+class FakeTranslator:
+    def __init__(self):
+        self.sent = []
+    def normalise_lang_code(self, lang):
+        code = lang.strip().upper()
+        return "EN" if code == "SIMPLE" else code
+    def translate_batch(self, texts, source_lang, target_lang):
+        self.sent.extend(texts)
+        return ["EN:" + t for t in texts]
+    def save_cache(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def fake_models(monkeypatch):
+    # one axis per topic, whatever the language
+    def fake_embed_multilingual(texts):
+        return np.array([[1.0, 0.0] if "ronron" in t else [0.0, 1.0] for t in texts])
+    titles = {("Historia", "Histoire"): 1.0}
+    def fake_matrix(texts_a, texts_b): # cross-language title similarity from the table above
+        return torch.tensor([[titles.get((a, b), 0.0) for b in texts_b] for a in texts_a])
+    monkeypatch.setattr(multilingual.similarity, "embed_multilingual", fake_embed_multilingual)
+    monkeypatch.setattr(multilingual.similarity, "multilingual_similarity_matrix", fake_matrix)
+    monkeypatch.setattr(multilingual.similarity, "cos_sim", lambda a, b: torch.tensor(a) @ torch.tensor(b).T)
+
+def test_original_text_analysis_translates_candidates_for_nli_and_everything_for_display(monkeypatch):
+    nli_inputs = []
+    def fake_classify_bidirectional(a, b):
+        nli_inputs.append((a, b))
+        return "entailment"
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", fake_classify_bidirectional)
+
+    a1 = {"Lead": [{"heading": None, "text": "Los gatos ronronean."}],
+          "Historia": [{"heading": "Egipto", "text": "Venerados en Egipto."}]}
+    a2 = {"Lead": [{"heading": None, "text": "Les chats ronronnent."}],
+          "Histoire": [{"heading": None, "text": "Vénérés en Égypte."}]}
+    translator = FakeTranslator()
+    result = multilingual.analyse_original(a1, "es", a2, "fr", translator)
+
+    assert list(result) == ["Lead", "EN:Historia"] # sections aligned on the original titles, shown translated
+    assert ("EN:Los gatos ronronean.", "EN:Les chats ronronnent.") in nli_inputs # NLI sees English
+    pair = result["EN:Historia"]["agree"][0]
+    assert pair["a1"]["original"] == "Venerados en Egipto."
+    assert pair["a1"]["translated"] == "EN:Venerados en Egipto." # display translation filled in
+    assert pair["a1"]["heading"] == "EN:Egipto"
+    assert pair["a1"]["lang"] == "ES"
+
+def test_english_editions_are_never_sent_to_the_translator(monkeypatch):
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", lambda a, b: "neutral")
+    a1 = {"Lead": [{"heading": None, "text": "Cats purr (ronron)."}]}
+    a2 = {"Lead": [{"heading": None, "text": "Cats really purr (ronron)."}]}
+    translator = FakeTranslator()
+    result = multilingual.analyse_original(a1, "en", a2, "simple", translator)
+    assert translator.sent == []
+    assert result["Lead"]["neutral"][0]["a2"]["translated"] == "Cats really purr (ronron)."
+
+def test_no_text_is_sent_to_the_translator_twice(monkeypatch):
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", lambda a, b: "entailment")
+    a1 = {"Lead": [{"heading": None, "text": "Los gatos ronronean."}, {"heading": None, "text": "Otra cosa."}]}
+    a2 = {"Lead": [{"heading": None, "text": "Les chats ronronnent."}]}
+    translator = FakeTranslator()
+    multilingual.analyse_original(a1, "es", a2, "fr", translator)
+    assert sorted(translator.sent) == sorted(set(translator.sent)) # display pass and NLI shared each text
+    assert "Los gatos ronronean." in translator.sent
+
+def test_resumed_run_reuses_checkpointed_sections_and_still_translates_them(monkeypatch, tmp_path):
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", lambda a, b: "entailment")
+    a1 = {"Lead": [{"heading": None, "text": "Los gatos ronronean."}],
+          "Historia": [{"heading": "Egipto", "text": "Venerados en Egipto."}]}
+    a2 = {"Lead": [{"heading": None, "text": "Les chats ronronnent."}],
+          "Histoire": [{"heading": None, "text": "Vénérés en Égypte."}]}
+    first = multilingual.analyse_original(a1, "es", a2, "fr", FakeTranslator(),
+                                          checkpoint=RunCheckpoint("run", "fp", root=str(tmp_path)))
+
+    def fail_if_called(a, b):
+        raise AssertionError("checkpointed sections should not be analysed again")
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", fail_if_called)
+    resumed = multilingual.analyse_original(a1, "es", a2, "fr", FakeTranslator(),
+                                            checkpoint=RunCheckpoint("run", "fp", root=str(tmp_path), resume=True))
+    assert resumed == first
+    assert resumed["EN:Historia"]["agree"][0]["a1"]["heading"] == "EN:Egipto" # display translation filled in
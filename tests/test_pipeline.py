@@ -0,0 +1,114 @@
+# tests for src/pipeline.py: settings are checked up front, and the run deadline counts the stages
+# before the analysis.
+# Fetch, translate, section pairing, NLI and rendering are replaced by stand-ins, and the clock
+# is a plain counter the slow translate stage moves forward -- no network, model or real waiting.
+import numpy as np
+import pytest
+from src import pipeline, analysis, index, article
+
+ARTICLE = {"Lead": [{"translated": "Cats are mammals.", "lang": "ES"}],
+           "History": [{"translated": "Old.", "lang": "ES"}]}
+
+REAL_FETCH = pipeline._fetch # the clock fixture replaces it
+
+class FakeTranslator:
+    backend = "deepl"
+
+class EmptyCache:
+    def get(self, key):
+        return None
+    def put(self, key, entry):
+        pass
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pipeline.time, "time", lambda: now[0]) # the same time module analysis reads
+    monkeypatch.setattr(pipeline, "_fetch", lambda *args: [{}, {}])
+    monkeypatch.setattr(pipeline, "pair_sections", lambda a1, a2, embeddings=None: [("Lead", "Lead", "Lead"), ("History", "History", "History")])
+    monkeypatch.setattr(pipeline, "render_html", lambda *args: "")
+    monkeypatch.setattr(analysis.similarity, "similarity_matrix", lambda a, b: analysis.torch.ones(len(a), len(b)))
+    monkeypatch.setattr(analysis.nli, "classify_bidirectional", lambda a, b: "entailment")
+    return now
+
+def run(monkeypatch, clock, translate_seconds, **settings):
+    def slow_translate(*args):
+        clock[0] += translate_seconds
+        return [dict(ARTICLE), dict(ARTICLE)]
+    monkeypatch.setattr(pipeline, "_translate", slow_translate)
+    analysed = {}
+    def spy(*args, **kwargs):
+        analysed.update(analysis.analyze_articles(*args, **kwargs))
+        return analysed
+    monkeypatch.setattr(pipeline, "analyze_articles", spy)
+    pipeline._run_stages({"url1": "https://es.wikipedia.org/wiki/Gato", "url2": "https://es.wikipedia.org/wiki/Felis",
+                          "title_out": "Cat", "outfile": "cat.html", "result_cache": False,
+                          "section_alignment": "title", "deadline": 10, **settings}, translator=FakeTranslator())
+    return {info["tier"] for info in analysed.values()}
+
+def test_a_fast_translate_leaves_the_sections_their_tier(monkeypatch, clock):
+    assert run(monkeypatch, clock, translate_seconds=1) == {"full"}
+
+def test_a_slow_translate_uses_up_the_deadline_and_the_sections_degrade(monkeypatch, clock):
+    assert run(monkeypatch, clock, translate_seconds=7) == {"balanced"} # 70% of the run gone before the analysis
+    assert run(monkeypatch, clock, translate_seconds=11) == {"fast"} # past the deadline
+
+def test_unknown_settings_are_invalid_input_before_any_request(monkeypatch):
+    def no_requests(*args):
+        raise AssertionError("nothing should be fetched")
+    monkeypatch.setattr(pipeline, "get_revision_ids", no_requests)
+    config = {"url1": "https://es.wikipedia.org/wiki/Gato", "url2": "https://fr.wikipedia.org/wiki/Chat",
+              "title_out": "Cat", "analysis_tier": "fastest"}
+    with pytest.raises(pipeline.InvalidInput, match="analysis tier"):
+        pipeline._run_stages(config, translator=FakeTranslator())
+    with pytest.raises(pipeline.InvalidInput):
+        pipeline._run_stages(dict(config, analysis_tier="fast", url2="https://fr.wikipedia.org/Chat"), translator=FakeTranslator())
+
+def test_a_degraded_run_is_still_recorded_for_the_site_when_asked(monkeypatch, clock):
+    recorded = []
+    monkeypatch.setattr(pipeline, "record_page", lambda slug, title, analysis, lang1, lang2: recorded.append((slug, title)))
+    assert run(monkeypatch, clock, translate_seconds=1) == {"full"}
+    assert recorded == [] # opt-in
+    assert run(monkeypatch, clock, translate_seconds=11, site=True) == {"fast"}
+    assert recorded == [("cat", "Cat")]
+
+def test_a_merge_indexed_from_the_same_revisions_is_not_added_again(monkeypatch, clock, tmp_path):
+    monkeypatch.setattr(pipeline, "_translate", lambda *args: [dict(ARTICLE), dict(ARTICLE)])
+    monkeypatch.setattr(pipeline, "get_revision_ids", lambda lang, titles: {t: 7 for t in titles})
+    monkeypatch.setattr(pipeline, "embed_articles", lambda articles: [{s: np.ones((1, 2)) for s in a} for a in articles])
+    monkeypatch.setattr(pipeline, "ParagraphIndex", lambda: index.ParagraphIndex(str(tmp_path)))
+    monkeypatch.setattr(pipeline, "VerdictStore", lambda: index.VerdictStore(str(tmp_path)))
+    config = {"url1": "https://es.wikipedia.org/wiki/Gato", "url2": "https://es.wikipedia.org/wiki/Felis",
+              "title_out": "Cat", "outfile": "cat.html", "result_cache": False, "section_alignment": "title", "index": True}
+    pipeline._run_stages(config, translator=FakeTranslator())
+    pipeline._run_stages(config, translator=FakeTranslator())
+    assert index.ParagraphIndex(str(tmp_path)).header()["count"] == 4 # one copy of both articles' paragraphs
+
+    monkeypatch.setattr(pipeline, "get_revision_ids", lambda lang, titles: {t: 8 for t in titles}) # edited since
+    pipeline._run_stages(config, translator=FakeTranslator())
+    assert index.ParagraphIndex(str(tmp_path)).header()["count"] == 8
+
+def test_a_cancelled_run_stops_before_its_next_stage(monkeypatch, clock):
+    def no_fetch(*args):
+        raise AssertionError("the run should have stopped before fetching")
+    monkeypatch.setattr(pipeline, "_fetch", no_fetch)
+    config = {"url1": "https://es.wikipedia.org/wiki/Gato", "url2": "https://es.wikipedia.org/wiki/Felis",
+              "title_out": "Cat", "outfile": "cat.html", "result_cache": False}
+    with pytest.raises(pipeline.RunCancelled, match="fetch"):
+        pipeline.run_pipeline(config, translator=FakeTranslator(), cancelled=lambda: True)
+
+def test_a_same_language_pair_asks_for_its_revisions_once(monkeypatch, clock, tmp_path):
+    queries = []
+    def revisions(lang, titles):
+        queries.append(list(titles))
+        return {t.strip(): 7 for t in titles}
+    monkeypatch.setattr(pipeline, "get_revision_ids", revisions)
+    monkeypatch.setattr(article, "get_revision_ids", revisions)
+    monkeypatch.setattr(article, "fetch_article", lambda lang, title: {"sections": {}, "revid": 7})
+    monkeypatch.setattr(pipeline, "_fetch", REAL_FETCH)
+    monkeypatch.setattr(pipeline, "_translate", lambda *args: [dict(ARTICLE), dict(ARTICLE)])
+    monkeypatch.setattr(pipeline, "ResultCache", EmptyCache)
+    pipeline._run_stages({"url1": "https://es.wikipedia.org/wiki/Gato", "url2": "https://es.wikipedia.org/wiki/Felis",
+                          "title_out": "Cat", "outfile": str(tmp_path / "cat.html"), "section_alignment": "title"},
+                         translator=FakeTranslator())
+    assert queries == [["Gato", "Felis"]] # the fetch's existence check reuses the run's lookup
@@ -0,0 +1,61 @@
+# tests for src/profiling.py's cProfile stage hook (the torch profiler side needs a real
+# model call to be meaningful, so it is left to manual runs with config["profile_dir"]).
+import os, contextvars
+from concurrent.futures import ThreadPoolExecutor
+from src import profiling, metrics
+
+def test_stage_is_a_noop_without_a_session(monkeypatch):
+    created = []
+    monkeypatch.setattr(profiling.cProfile, "Profile", lambda *args: created.append(args))
+    with profiling.stage("fetch"):
+        sum(range(100))
+    assert created == [] # no profiler was ever started
+
+def test_stage_dumps_stats_and_summary_into_the_run_dir(tmp_path):
+    with profiling.session(str(tmp_path)) as run_dir:
+        with profiling.stage("analyse"):
+            sorted(range(1000), reverse=True)
+    assert os.path.dirname(run_dir) == str(tmp_path) # one timestamped folder per run
+    assert os.path.exists(os.path.join(run_dir, "analyse.prof")) # pstats-loadable dump
+    assert "cumulative" in open(os.path.join(run_dir, "analyse.txt")).read() # readable summary
+
+def test_repeated_stage_names_do_not_overwrite(tmp_path):
+    with profiling.session(str(tmp_path)) as run_dir:
+        for _ in range(2):
+            with profiling.stage("render"):
+                pass
+    assert os.path.exists(os.path.join(run_dir, "render.prof"))
+    assert os.path.exists(os.path.join(run_dir, "render-2.prof"))
+
+def test_a_stage_started_while_another_is_profiled_runs_unprofiled(tmp_path):
+    with metrics.collect() as m, profiling.session(str(tmp_path)) as run_dir:
+        with profiling.stage("outer"):
+            with profiling.stage("inner"): # e.g. a concurrent request's stage: no "already active" error
+                sum(range(100))
+    assert os.path.exists(os.path.join(run_dir, "outer.prof"))
+    assert not os.path.exists(os.path.join(run_dir, "inner.prof"))
+    assert m.counters["profile_stages_skipped"] == 1
+
+def _pool_only_work():
+    return sorted(range(1000), key=lambda x: -x)
+
+def test_thread_task_work_lands_in_the_stage_profile(tmp_path):
+    with profiling.session(str(tmp_path)) as run_dir:
+        with profiling.stage("analyse"):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, profiling.thread_task, _pool_only_work) for _ in range(2)]
+                [f.result() for f in futures]
+    assert "_pool_only_work" in open(os.path.join(run_dir, "analyse.txt")).read() # run on pool threads only
+
+def test_session_end_forgets_its_counters(tmp_path):
+    with profiling.session(str(tmp_path)) as run_dir:
+        with profiling.stage("render"):
+            pass
+    assert not any(key[0].startswith(run_dir) for key in profiling._counts) # no growth across server requests
+
+def test_sessions_started_in_the_same_second_get_their_own_folders(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling.time, "strftime", lambda fmt: "20240101-120000")
+    with profiling.session(str(tmp_path)) as first, profiling.session(str(tmp_path)) as second:
+        assert first != second
+        assert os.path.basename(first).startswith("20240101-120000-")
+        assert os.path.isdir(os.path.join(second, "torch"))
@@ -0,0 +1,33 @@
+# tests for src/quantize.py: the int8 / binary codecs and the search kernels, on seeded synthetic vectors.
+import numpy as np
+import pytest
+from src import quantize
+
+def test_int8_codes_keep_cosines_close():
+    vectors = quantize.synthetic_vectors(200, 64, seed=0)
+    codes, scales = quantize.quantize_int8(vectors)
+    assert codes.dtype == np.int8 and codes.nbytes == vectors.nbytes // 4
+    approx = quantize.int8_scores(vectors[:5], codes, scales)
+    assert np.abs(approx - vectors[:5] @ vectors.T).max() < 0.02
+
+def test_hamming_counts_differing_signs():
+    a = quantize.binary_codes([[1.0, -1.0, 1.0, -1.0, 1.0, 1.0, 1.0, 1.0, -1.0]])
+    b = quantize.binary_codes([[1.0, 1.0, 1.0, -1.0, -1.0, 1.0, 1.0, 1.0, 1.0]])
+    assert a.shape == (1, 2) # 9 signs -> 2 bytes
+    assert quantize.hamming(a, b).tolist() == [[3]]
+
+@pytest.mark.parametrize("method", ["int8", "binary"])
+def test_quantised_search_reranks_to_exact_scores(method):
+    vectors = quantize.synthetic_vectors(2000, 64, seed=1)
+    queries = vectors[:10] + 0.05
+    exact_rows, exact_scores = quantize.search(queries, vectors, k=5, method="exact")
+    rows, scores = quantize.search(queries, vectors, k=5, method=method)
+    recall = np.mean([len(set(r) & set(e)) / 5 for r, e in zip(rows, exact_rows)])
+    assert recall >= 0.9
+    # whatever was found carries its exact cosine
+    for r, s, query in zip(rows, scores, quantize.normalise(queries)):
+        assert np.allclose(s, vectors[r] @ query, atol=1e-5)
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        quantize.search([[1.0, 0.0]], np.eye(2), method="pq")
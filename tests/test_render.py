@@ -1,5 +1,5 @@
-# tests for src/render.py's resolve_output_path: pure path logic (no Jinja/model needed).
-# The guarantee under test is that every resolved path stays inside render.OUTPUT_DIR, so
+# tests for src/render.py: resolve_output_path (pure path logic) and the section fragment cache.
+# For the paths, the guarantee under test is that every resolved path stays inside render.OUTPUT_DIR, so
 # render_html() can never be steered into overwriting a file elsewhere on disk.
 import os
 from src import render
@@ -28,3 +28,43 @@ def test_absolute_path_with_dotdot_escape_is_not_confined():
     sneaky = os.path.join(render.OUTPUT_DIR, "..", "secret.html")
     result = render.resolve_output_path(sneaky)
     assert result == os.path.join(render.OUTPUT_DIR, "secret.html") # ".." escape is redirected back into OUTPUT_DIR
+
+# -- fragment cache ------------------------------------------------------------
+
+def _section(text):
+    return {"agree": [], "contradict": [], "neutral": [], "unique_a1": [{"lang": "ES", "translated": text}], "unique_a2": []}
+
+def test_unchanged_sections_come_from_the_fragment_cache():
+    from src import metrics
+    render.fragment_cache.clear()
+    analysis = {"Lead": _section("Cats purr."), "History": _section("Old.")}
+    first = render.render_page("Cat", analysis, "style.css", "ES", "FR")
+
+    analysis["History"] = _section("Older.")
+    with metrics.collect() as m:
+        second = render.render_page("Cat", analysis, "style.css", "ES", "FR")
+    assert m.counters["fragment_cache_hits"] == 1 # Lead
+    assert m.counters["fragment_cache_misses"] == 1 # the changed section only
+    assert "Older." in second and "Old." not in second
+    assert first.split('id="History"')[0] == second.split('id="History"')[0]
+
+def test_fragment_key_covers_languages_and_title():
+    info = _section("Text.")
+    assert render.fragment_key("Lead", info, "ES", "FR") != render.fragment_key("Lead", info, "DE", "FR") # counts line names the languages
+    assert render.fragment_key("Lead", info) != render.fragment_key("History", info)
+
+def test_fragment_cache_drops_least_recently_used_over_budget():
+    cache = render.FragmentCache(max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    cache.get("a") # b is now the least recently used
+    cache.put("c", "12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345" and cache.get("c") == "12345"
+
+def test_fragment_cache_counts_utf8_bytes():
+    cache = render.FragmentCache(max_bytes=10)
+    cache.put("a", "日本語") # 3 characters, 9 bytes
+    assert cache.bytes == 9
+    cache.put("b", "ab") # 11 bytes: a is dropped
+    assert cache.get("a") is None and cache.bytes == 2
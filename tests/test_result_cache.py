@@ -0,0 +1,41 @@
+# tests for src/result_cache.py: keys change with anything that changes the result, and
+# the on-disk store evicts least recently used entries. Everything lives in tmp_path.
+import os
+import pytest
+from src import result_cache, merge, analysis, similarity
+
+def test_key_changes_with_revision_and_options():
+    base = result_cache.result_key(("es", "Gato", 100), ("fr", "Chat", 200))
+    assert base == result_cache.result_key(("es", "Gato", 100), ("fr", "Chat", 200)) # stable
+    assert base != result_cache.result_key(("es", "Gato", 101), ("fr", "Chat", 200)) # article edited
+    assert base != result_cache.result_key(("es", "Gato", 100), ("fr", "Chat", 200), {"mode": "sentence"})
+
+@pytest.mark.parametrize("module, name, value", [
+    (merge, "CONTENT_WEIGHT", 0.3),
+    (analysis, "SENTENCE_MATCH_THRESHOLD", 0.6),
+    (analysis, "SENTENCE_TOP_K", 3),
+    (analysis, "BALANCED_NLI_PAIRS", 5),
+    (similarity, "MULTILINGUAL_EMBED_MODEL", "another-model"),
+])
+def test_key_changes_when_a_tuning_constant_does(monkeypatch, module, name, value):
+    base = result_cache.result_key(("es", "Gato", 100), ("fr", "Chat", 200))
+    monkeypatch.setattr(module, name, value)
+    assert base != result_cache.result_key(("es", "Gato", 100), ("fr", "Chat", 200)) # a retune invalidates old entries
+
+def test_put_then_get_round_trips(tmp_path):
+    cache = result_cache.ResultCache(root=str(tmp_path))
+    cache.put("k", {"analysis": {"Lead": {}}, "html": "<p>hi</p>"})
+    assert cache.get("k")["html"] == "<p>hi</p>"
+    assert cache.get("missing") is None
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = result_cache.ResultCache(root=str(tmp_path), max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    # make "a" older than "b", then touch it with a hit so "b" becomes the least recently used
+    os.utime(tmp_path / "a.json", (1, 1))
+    os.utime(tmp_path / "b.json", (2, 2))
+    cache.get("a")
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None # evicted
+    assert cache.get("a") is not None and cache.get("c") is not None
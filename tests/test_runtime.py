@@ -0,0 +1,46 @@
+# tests for src/runtime.py's settings resolution (defaults -> autotuned file -> env vars);
+# apply() and autotune() touch torch and the real models, so they are not exercised here.
+import json
+import pytest
+from src import runtime
+
+@pytest.fixture(autouse=True) # applies to all tests in this module
+def fresh_settings(monkeypatch, tmp_path):
+    # every test resolves settings from scratch, against a runtime.json of its own
+    monkeypatch.setattr(runtime, "_settings", None)
+    monkeypatch.setattr(runtime, "RUNTIME_PATH", str(tmp_path / "runtime.json"))
+    for var in list(runtime.ENV_VARS.values()) + ["WIKIMERGE_WORKERS"]:
+        monkeypatch.delenv(var, raising=False)
+
+def test_workers_split_the_cores(monkeypatch):
+    monkeypatch.setattr(runtime.os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("WIKIMERGE_WORKERS", "4")
+    assert runtime.settings()["torch_threads"] == 2 # 8 cores shared by 4 workers -> 2 threads each
+
+def test_autotuned_file_overrides_defaults(monkeypatch):
+    monkeypatch.setattr(runtime.os, "cpu_count", lambda: 8)
+    with open(runtime.RUNTIME_PATH, "w") as f:
+        json.dump({"encode_batch_size": 64, "cpu_count": 8}, f)
+    assert runtime.settings()["encode_batch_size"] == 64
+
+def test_autotuned_file_for_another_host_is_ignored(monkeypatch):
+    monkeypatch.setattr(runtime.os, "cpu_count", lambda: 8)
+    with open(runtime.RUNTIME_PATH, "w") as f:
+        json.dump({"encode_batch_size": 64, "cpu_count": 32}, f) # tuned on a bigger box
+    assert runtime.settings()["encode_batch_size"] == runtime.default_settings()["encode_batch_size"]
+
+def test_env_vars_override_everything(monkeypatch):
+    monkeypatch.setattr(runtime.os, "cpu_count", lambda: 8)
+    with open(runtime.RUNTIME_PATH, "w") as f:
+        json.dump({"torch_threads": 8, "cpu_count": 8}, f)
+    monkeypatch.setenv("WIKIMERGE_TORCH_THREADS", "3")
+    assert runtime.settings()["torch_threads"] == 3
+
+def test_tuned_thread_counts_are_ignored_for_another_worker_count(monkeypatch):
+    monkeypatch.setattr(runtime.os, "cpu_count", lambda: 8)
+    with open(runtime.RUNTIME_PATH, "w") as f:
+        json.dump({"torch_threads": 8, "encode_batch_size": 64, "cpu_count": 8, "workers": 1}, f) # tuned as the only process
+    monkeypatch.setenv("WIKIMERGE_WORKERS", "4")
+    resolved = runtime.settings()
+    assert resolved["torch_threads"] == 2 # this worker's share, not the 8 tuned for a lone process
+    assert resolved["encode_batch_size"] == 64 # batch sizes don't depend on the core share
@@ -0,0 +1,96 @@
+# tests for src/server.py's MergeService: request coalescing and the bounded queue.
+# server.run_pipeline is replaced by a slow fake, so no model, network or DeepL is involved.
+import time
+import asyncio
+import pytest
+from src import server
+
+CONFIG = {"url1": "https://es.wikipedia.org/wiki/Gato", "url2": "https://fr.wikipedia.org/wiki/Chat",
+          "title_out": "Cat", "outfile": "cat.html"}
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = [] # one entry per real pipeline run
+    def fake_run_pipeline(config, translator=None):
+        calls.append(config["outfile"])
+        time.sleep(0.05) # long enough for concurrent requests to overlap
+        return {"spans": {}, "counters": {}, "values": {}}
+    monkeypatch.setattr(server, "run_pipeline", fake_run_pipeline)
+    return calls
+
+def test_identical_concurrent_requests_share_one_run(calls):
+    service = server.MergeService(translator=object())
+    async def go():
+        return await asyncio.gather(*[service.merge(dict(CONFIG)) for _ in range(3)])
+    results = asyncio.run(go())
+    assert calls == ["cat.html"] # three requests, one pipeline run
+    assert len(results) == 3 # ...but every caller gets the result
+
+def test_different_requests_run_separately(calls):
+    service = server.MergeService(translator=object())
+    async def go():
+        await asyncio.gather(service.merge(dict(CONFIG)), service.merge(dict(CONFIG, outfile="dog.html")))
+    asyncio.run(go())
+    assert sorted(calls) == ["cat.html", "dog.html"]
+
+def test_full_queue_is_rejected(calls):
+    service = server.MergeService(max_concurrent=1, max_queued=0, translator=object())
+    async def go():
+        first = asyncio.ensure_future(service.merge(dict(CONFIG)))
+        await asyncio.sleep(0) # let the first merge claim the only slot
+        with pytest.raises(server.ServiceBusy):
+            await service.merge(dict(CONFIG, outfile="dog.html"))
+        await first
+    asyncio.run(go())
+
+def test_merge_config_requires_both_urls():
+    with pytest.raises(ValueError):
+        server._merge_config(b'{"url1": "https://es.wikipedia.org/wiki/Gato"}')
+
+def test_requests_differing_only_in_export_run_separately(calls):
+    service = server.MergeService(translator=object())
+    async def go():
+        await asyncio.gather(service.merge(dict(CONFIG)), service.merge(dict(CONFIG, export=True)))
+    asyncio.run(go())
+    assert calls == ["cat.html", "cat.html"] # the export request did not join the run without export
+
+def test_runs_writing_the_same_outfile_do_not_overlap(monkeypatch):
+    active, overlaps = [], []
+    def fake_run_pipeline(config, translator=None):
+        if active:
+            overlaps.append(config["title_out"])
+        active.append(config["title_out"])
+        time.sleep(0.05)
+        active.remove(config["title_out"])
+        return {}
+    monkeypatch.setattr(server, "run_pipeline", fake_run_pipeline)
+    service = server.MergeService(max_concurrent=2, translator=object())
+    async def go():
+        # two titles with the same slug
+        await asyncio.gather(service.merge(dict(CONFIG, title_out="Cat")), service.merge(dict(CONFIG, title_out="cat")))
+    asyncio.run(go())
+    assert overlaps == [] # the second run waited for the first instead of writing cat.html at the same time
+
+class FakeWriter: # collects what _handle answers
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+    def write(self, data):
+        self.data += data
+    async def drain(self):
+        pass
+    def close(self):
+        self.closed = True
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_a_bad_content_length_is_answered_with_400(calls, length):
+    async def go():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"POST /merge HTTP/1.1\r\nContent-Length: " + length.encode() + b"\r\n\r\n")
+        reader.feed_eof()
+        writer = FakeWriter()
+        await server._handle(server.MergeService(translator=object()), reader, writer)
+        return writer
+    writer = asyncio.run(go())
+    assert writer.data.startswith(b"HTTP/1.1 400") and b"Invalid Content-Length" in writer.data
+    assert writer.closed and calls == []
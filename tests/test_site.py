@@ -0,0 +1,86 @@
+# tests for src/site.py: recorded pages and static site builds (pages, index, precompression,
+# incremental rebuilds). Pages are rendered with the real templates into pytest's tmp_path; no
+# models are involved.
+import os, gzip
+from src import site
+
+def _page(slug, text, lang1="ES", lang2="FR"):
+    analysis = {"Lead": {"agree": [{"a1": {"lang": lang1, "translated": text}, "a2": {"lang": lang2, "translated": text}, "score": 1.0}],
+                         "contradict": [], "neutral": [], "unique_a1": [], "unique_a2": []}}
+    return {"slug": slug, "title": slug.title(), "analysis": analysis, "lang1": lang1, "lang2": lang2}
+
+def test_build_writes_pages_index_and_compressed_copies(tmp_path):
+    out = str(tmp_path)
+    stats = site.build_site([_page("cat", "Cats purr."), _page("dog", "Dogs bark.")], out)
+    assert stats == {"written": 4, "unchanged": 0, "removed": 0} # css, two pages, index
+
+    with open(os.path.join(out, "cat.html"), "rb") as f:
+        html = f.read()
+    assert b"Cats purr." in html and b"style=" not in html # styles live in the stylesheet
+    with open(os.path.join(out, "cat.html.gz"), "rb") as f:
+        assert gzip.decompress(f.read()) == html
+    with open(os.path.join(out, "index.html"), encoding="utf-8") as f:
+        index = f.read()
+    assert 'href="cat.html"' in index and 'href="dog.html"' in index
+
+def test_rebuild_rewrites_only_changed_pages_and_removes_dropped_ones(tmp_path):
+    out = str(tmp_path)
+    site.build_site([_page("cat", "Cats purr."), _page("dog", "Dogs bark.")], out)
+    assert site.build_site([_page("cat", "Cats purr."), _page("dog", "Dogs bark.")], out)["written"] == 0
+
+    before = os.path.getmtime(os.path.join(out, "cat.html"))
+    stats = site.build_site([_page("cat", "Cats purr."), _page("cow", "Cows moo.")], out)
+    assert stats == {"written": 2, "unchanged": 2, "removed": 1} # cow + index; css + cat; dog
+    assert os.path.getmtime(os.path.join(out, "cat.html")) == before
+    assert not os.path.exists(os.path.join(out, "dog.html"))
+    assert not os.path.exists(os.path.join(out, "dog.html.gz"))
+
+def test_languages_are_read_off_the_records():
+    assert site.languages(_page("cat", "Cats purr.", "DE", "IT")["analysis"]) == ("DE", "IT")
+
+def test_recorded_pages_stay_until_removed(tmp_path):
+    root = str(tmp_path / "pages")
+    for slug in ("dog", "cat"):
+        page = _page(slug, slug + "s")
+        site.record_page(slug, page["title"], page["analysis"], "ES", "FR", root)
+    site.record_page("cat", "Cat", _page("cat", "Cats purr.")["analysis"], "ES", "FR", root) # a re-merge replaces it
+    pages = site.load_pages(root)
+    assert [page["slug"] for page in pages] == ["cat", "dog"] # index order: by title
+    assert pages[0]["analysis"]["Lead"]["agree"][0]["a1"]["translated"] == "Cats purr."
+
+    assert site.remove_page("dog", root)
+    assert not site.remove_page("dog", root)
+    assert [page["slug"] for page in site.load_pages(root)] == ["cat"]
+
+def test_variants_no_longer_written_are_removed(tmp_path, monkeypatch):
+    out = str(tmp_path)
+    monkeypatch.setattr(site, "brotli", None)
+    site.build_site([_page("cat", "Cats purr.")], out)
+    stale = os.path.join(out, "cat.html.br")
+    with open(stale, "wb") as f: # left over from a build when brotli was installed
+        f.write(b"old")
+    stats = site.build_site([_page("cat", "Cats purr.")], out, compress=False)
+    assert stats["written"] == 3 and stats["unchanged"] == 0 # other variants, other digests
+    assert not os.path.exists(stale)
+    assert not os.path.exists(os.path.join(out, "cat.html.gz"))
+
+def test_brotli_availability_is_part_of_the_digest(tmp_path, monkeypatch):
+    out = str(tmp_path)
+    monkeypatch.setattr(site, "brotli", None)
+    site.build_site([_page("cat", "Cats purr.")], out)
+    class FakeBrotli:
+        @staticmethod
+        def compress(data):
+            return b"br:" + data
+    monkeypatch.setattr(site, "brotli", FakeBrotli)
+    assert site.build_site([_page("cat", "Cats purr.")], out)["written"] == 3 # css, cat, index get their .br
+    assert os.path.exists(os.path.join(out, "cat.html.br"))
+
+def test_reserved_slugs_are_renamed_not_fatal_to_the_build(tmp_path):
+    root = str(tmp_path / "pages")
+    page = _page("index", "Index pages.")
+    assert site.record_page("index", "Index", page["analysis"], "ES", "FR", root) == "index-page"
+    pages = site.load_pages(root)
+    assert [p["slug"] for p in pages] == ["index-page"]
+    site.build_site(pages, str(tmp_path / "site"))
+    assert os.path.exists(str(tmp_path / "site" / "index-page.html"))
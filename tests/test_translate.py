@@ -33,7 +33,7 @@ def test_init_raises_when_api_key_missing(monkeypatch):
 
 def test_translate_text_happy_path(monkeypatch):
     def fake_post(endpoint, data, headers): # stands in for requests.post; check args and return a fake response
-        assert data["text"] == "Hola mundo"
+        assert data["text"] == ["Hola mundo"] # sent through the batch request, like every other text
         assert headers["Authorization"] == "DeepL-Auth-Key test-key-not-real"
         return FakeResponse(200, {"translations": [{"text": "Hello world"}]})
     monkeypatch.setattr(translate.requests, "post", fake_post)
@@ -53,6 +53,18 @@ def test_translate_text_uses_cache_on_second_call(monkeypatch):
     assert first == second == "Hello" # the translated text is returned both times
     assert len(calls) == 1  # second call was a cache hit, no second HTTP request
 
+def test_translate_text_uses_sentence_memory(monkeypatch):
+    calls = []
+    def fake_post(*args, data, **kwargs):
+        calls.append(list(data["text"]))
+        return FakeResponse(200, {"translations": [{"text": "EN:" + t} for t in data["text"]]})
+    monkeypatch.setattr(translate.requests, "post", fake_post)
+
+    translator = translate.DeepLTranslator(sentence_memory=True)
+    translator.translate_text("Hola. Adiós.", "es", "EN-GB")
+    assert translator.translate_text("Hola. Otra.", "es", "EN-GB") == "EN:Hola. EN:Otra."
+    assert calls == [["Hola.", "Adiós."], ["Otra."]] # the known sentence was not sent again
+
 def test_translate_text_raises_on_empty_string():
     translator = translate.DeepLTranslator()
     with pytest.raises(ValueError): # DeepLTranslator.translate_text should raise ValueError on empty string
@@ -110,6 +122,18 @@ def test_translate_batch_only_requests_uncached_texts(monkeypatch):
     assert results == ["Hello", "World"] # the returned list has the correct translations
     assert calls == [["Mundo"]]  # only the uncached text was actually sent to DeepL
 
+def test_translate_batch_counts_cache_hits_and_deepl_traffic(monkeypatch):
+    monkeypatch.setattr(translate.requests, "post", lambda *a, **kw: FakeResponse(200, {"translations": [{"text": "World"}]}))
+    translator = translate.DeepLTranslator()
+    translator.cache[translator._cache_key("Hola", "ES", "EN-GB")] = {"original": "Hola", "translated": "Hello"}
+
+    with translate.metrics.collect() as m:
+        translator.translate_batch(["Hola", "Mundo"], "es", "EN-GB")
+    counters = m.as_dict()["counters"]
+    assert counters["translation_cache_hits"] == 1 and counters["translation_cache_misses"] == 1
+    assert counters["deepl_requests"] == 1 # one round trip for the single uncached text
+    assert counters["deepl_chars_sent"] == len("Mundo") # only uncached text is sent
+
 def test_translate_batch_raises_on_empty_list():
     translator = translate.DeepLTranslator()
     with pytest.raises(ValueError): # DeepLTranslator.translate_batch should raise ValueError on empty list
@@ -129,6 +153,77 @@ def test_translate_batch_raises_when_response_shorter_than_request(monkeypatch):
     with pytest.raises(RuntimeError): # a response-length mismatch should raise, not silently leave a None translation
         translator.translate_batch(["Hola", "Mundo"], "es", "EN-GB")
 
+def test_translate_batch_only_sends_edited_sentences(monkeypatch):
+    calls = []
+    def fake_post(*args, data, **kwargs): # stands in for requests.post; "translate" by prefixing
+        calls.append(list(data["text"]))
+        return FakeResponse(200, {"translations": [{"text": "EN:" + t} for t in data["text"]]})
+    monkeypatch.setattr(translate.requests, "post", fake_post)
+
+    translator = translate.DeepLTranslator(sentence_memory=True)
+    translator.translate_batch(["Uno. Dos. Tres."], "es", "EN-GB") # first run: every sentence is new
+    result = translator.translate_batch(["Uno. Dos editado. Tres."], "es", "EN-GB") # one sentence edited
+    assert calls[-1] == ["Dos editado."] # only the edited sentence goes to DeepL the second time
+    assert result == ["EN:Uno. EN:Dos editado. EN:Tres."] # reassembled in order
+
+def test_translate_batch_sends_repeated_sentences_once(monkeypatch):
+    calls = []
+    def fake_post(*args, data, **kwargs): # stands in for requests.post; "translate" by prefixing
+        calls.append(list(data["text"]))
+        return FakeResponse(200, {"translations": [{"text": "EN:" + t} for t in data["text"]]})
+    monkeypatch.setattr(translate.requests, "post", fake_post)
+
+    translator = translate.DeepLTranslator(sentence_memory=True)
+    result = translator.translate_batch(["Hola. Adios.", "Hola. Gracias."], "es", "EN-GB")
+    assert calls == [["Hola.", "Adios.", "Gracias."]] # "Hola." is shared by both paragraphs, sent once
+    assert result == ["EN:Hola. EN:Adios.", "EN:Hola. EN:Gracias."]
+
+def test_sentence_memory_is_off_by_default(monkeypatch):
+    calls = []
+    def fake_post(*args, data, **kwargs):
+        calls.append(list(data["text"]))
+        return FakeResponse(200, {"translations": [{"text": "EN:" + t} for t in data["text"]]})
+    monkeypatch.setattr(translate.requests, "post", fake_post)
+    translate.DeepLTranslator().translate_batch(["Uno. Dos."], "es", "EN-GB")
+    assert calls == [["Uno. Dos."]] # the whole paragraph, with its context
+
+def test_sentence_memory_rejoins_with_the_original_separators(monkeypatch):
+    def fake_post(*args, data, **kwargs): # identity "translation"
+        return FakeResponse(200, {"translations": [{"text": t} for t in data["text"]]})
+    monkeypatch.setattr(translate.requests, "post", fake_post)
+    translator = translate.DeepLTranslator(sentence_memory=True)
+    assert translator.translate_batch(["猫です。犬です。"], "ja", "JA") == ["猫です。犬です。"] # no space inserted
+    assert translator.translate_batch(["Uno.\nDos."], "es", "EN-GB") == ["Uno.\nDos."] # line break kept
+
+def test_split_sentences_keeps_abbreviations_together():
+    assert translate.split_sentences("Es, p. ej. una prueba. Otra frase.") == ["Es, p. ej. una prueba.", "Otra frase."]
+
+def test_split_with_separators_returns_what_was_removed():
+    assert translate.split_with_separators("Uno.  Dos.\nTres") == (["Uno.", "Dos.", "Tres"], ["  ", "\n", ""])
+    assert translate.split_with_separators("猫です。犬です。") == (["猫です。", "犬です。"], ["", ""])
+
+def test_join_sentences_spaces_cjk_boundaries_in_spaced_languages():
+    assert translate.join_sentences(["It is a cat.", "It is a dog."], ["", ""], "EN-GB") == "It is a cat. It is a dog."
+
+# -- get_translator ------------------------------------------------------------------
+
+def test_get_translator_defaults_to_deepl():
+    assert isinstance(translate.get_translator(), translate.DeepLTranslator)
+
+def test_lazy_translator_needs_no_key_for_english(monkeypatch):
+    monkeypatch.delenv("DEEPL_API_KEY", raising=False)
+    monkeypatch.setattr(translate, "load_dotenv", lambda: None)
+    translator = translate.LazyTranslator("deepl")
+    article = {"Lead": [{"heading": None, "text": "Hello."}]}
+    assert translate.translate_article(article, "simple", translator)["Lead"][0]["translated"] == "Hello."
+    assert translator._translator is None # no DeepLTranslator was built
+    with pytest.raises(RuntimeError): # a language that needs translating builds it (and needs the key)
+        translate.translate_article({"Lead": [{"heading": None, "text": "Hola."}]}, "es", translator)
+
+def test_get_translator_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        translate.get_translator("babelfish")
+
 # -- normalise_lang_code + _cache_key ---------------------------------------------
 
 def test_normalise_lang_code_uppercases():
@@ -254,6 +349,40 @@ def test_translate_article_chunks_paragraphs_to_deepl_batch_limit(monkeypatch):
     assert sum(size for size in batch_sizes if size > 1) == 120 # every paragraph was sent exactly once
     assert translations == ["EN:p" + str(i) for i in range(120)] # order is preserved across chunk boundaries
 
+def test_translate_article_passes_english_editions_through(monkeypatch):
+    def fail_if_called(*args, **kwargs): # English needs no translation: no API call at all
+        raise AssertionError("translate_batch should not be called for an English article")
+    monkeypatch.setattr(translate.DeepLTranslator, "translate_batch", fail_if_called)
+    saves = []
+    monkeypatch.setattr(translate.DeepLTranslator, "save_cache", lambda self: saves.append(1))
+
+    translator = translate.DeepLTranslator()
+    article = {"History": [{"heading": "Origins", "text": "Some text"}]}
+    for lang in ["en", "simple"]:
+        result = translate.translate_article(article, lang, translator)
+        record = result["History"][0] # section title kept as-is
+        assert record["translated"] == record["original"] == "Some text"
+        assert record["heading"] == "Origins"
+        assert record["lang"] == lang.upper()
+    assert saves == [] # nothing new to persist
+
+def test_translate_articles_shares_one_pass_for_same_language(monkeypatch):
+    seen_texts = [] # every text handed to translate_batch
+    def fake_batch(self, texts, *args, **kwargs):
+        seen_texts.extend(texts)
+        return ["EN:" + t for t in texts]
+    monkeypatch.setattr(translate.DeepLTranslator, "translate_batch", fake_batch)
+
+    translator = translate.DeepLTranslator()
+    a1 = {"Historia": [{"heading": None, "text": "Compartido"}, {"heading": None, "text": "Solo uno"}]}
+    a2 = {"Historia": [{"heading": None, "text": "Compartido"}], "Notas": [{"heading": None, "text": "Solo dos"}]}
+    r1, r2 = translate.translate_articles([a1, a2], "es", translator)
+
+    assert sorted(seen_texts) == sorted(["Historia", "Notas", "Compartido", "Solo uno", "Solo dos"]) # shared text sent once
+    assert [r["translated"] for r in r1["EN:Historia"]] == ["EN:Compartido", "EN:Solo uno"]
+    assert r2["EN:Historia"][0]["translated"] == "EN:Compartido"
+    assert r2["EN:Notas"][0]["translated"] == "EN:Solo dos"
+
 def test_translate_article_saves_cache_even_when_a_batch_fails(monkeypatch):
     saves = [] # records each save_cache call
     monkeypatch.setattr(translate.DeepLTranslator, "save_cache", lambda self: saves.append(1))